@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+BENCHMARKS OF THE HOT PATHS
+
+    python Benchmark.py                        # full suite, written in benchmark.json
+    python Benchmark.py --quick --out new.json --compare benchmark.json
+
+Measured, for each model of MODELS and each Nx of NX :
+*    rhs      : one call of SYS.f and of the fused RHS
+*    rk4      : one rk4 step, allocating or with the stage buffers (inplace)
+*    loop     : Miscfunc.TemporalLoop for each Tmax of TMAX (runs of more than
+                MAXWORK column-steps are skipped)
+*    expand   : expandY_simple and the calculation of every intermediary
+*    periods  : Miscfunc.getperiods
+*    plotprep : VariableDictionnary and the arrays the plots read (nothing drawn)
+Every entry has the best time over the repeats ('time', s), the speed
+('steps_per_s', 'column_steps_per_s' when it makes sense) and the peak of
+traced memory ('peak_MB', tracemalloc, measured in a separate run so that it
+does not slow the timings). The report also holds the machine, the versions
+and the code hash, so that two reports can be compared (compare, --compare).
+"""
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+import numpy as np
+import Parameters as Par
+import ClassesGoodwin as CG
+import Miscfunc as M
+import VariableDictionnary as VarD
+import Experiments as Exp
+
+MODELS  = ('GK_Reduced','GK_FULL','GEMMES')
+NX      = (1,10**2,10**4,10**5)
+TMAX    = (1,10,100)
+MAXWORK = 10**8                 # column-steps of the longest TemporalLoop
+MINTIME = 0.2                   # s, minimal duration of a timing
+
+
+###############################################################################
+### MEASUREMENTS ##############################################################
+###############################################################################
+def timing(fn,repeat=3,mintime=MINTIME):
+    '''Best time of one call of fn, over repeat series lasting at least mintime'''
+    n,t = 1,0
+    while True :                                     # calls per series
+        t0 = time.perf_counter()
+        for _ in range(n) : fn()
+        t  = time.perf_counter()-t0
+        if t>=mintime or n>=10**6 : break
+        n *= max(2,min(10,int(mintime/max(t,1e-9))+1))
+    best = t/n
+    for _ in range(repeat-1) :
+        t0 = time.perf_counter()
+        for _ in range(n) : fn()
+        best = min(best,(time.perf_counter()-t0)/n)
+    return best
+
+def peakMemory(fn):
+    '''Peak of the memory allocated by fn (MB)'''
+    tracemalloc.start()
+    try :
+        fn()
+        return tracemalloc.get_traced_memory()[1]/2**20
+    finally :
+        tracemalloc.stop()
+
+def setup(model,Nx,Tmax=1):
+    '''SYS, params, parNum, y and operators of a run of Nx columns'''
+    SYS = getattr(CG,model)()
+    p   = Par.BasicParameters()
+    pN  = Par.parnum()
+    pN.update(Nx=Nx,Tmax=Tmax,Tstore=0.1)
+    pN['Nt'] = int(round(Tmax/pN['dt']))
+    pN['Ns'] = int(round(Tmax/pN['Tstore']))+1
+    p['k2']  = np.linspace(15,25,Nx)                 # a sweep, so that the columns differ
+    ic       = Par.initCond(p,pN)
+    ic['N']  = ic['Y']/ic['lambda']                  # extensive state with the same lambda
+    p['dt']  = pN['dt']
+    return SYS,p,pN,SYS.initializeY(ic,pN),M.prepareOperators(pN)
+
+def entry(bench,model,Nx,t,steps=None,peak=None,**kw):
+    '''One line of the report, t being the time (s)'''
+    e = dict(bench=bench,model=model,Nx=Nx,time=t,**kw)
+    if steps is not None :
+        e['steps_per_s']        = steps/t
+        e['column_steps_per_s'] = steps*Nx/t
+    if peak is not None : e['peak_MB'] = peak
+    return e
+
+
+###############################################################################
+### BENCHMARKS ################################################################
+###############################################################################
+def benchRHS(model,Nx):
+    SYS,p,pN,y,op = setup(model,Nx)
+    out = []
+    for name,f in (('rhs dict',SYS.f),('rhs fused',SYS.fusedRHS(p))) :
+        out.append(entry(name,model,Nx,timing(lambda : f(y,op,p)),steps=1))
+    return out
+
+def benchRK4(model,Nx):
+    SYS,p,pN,y,op = setup(model,Nx)
+    f   = M.getRHS(SYS,pN,p)
+    buf = M.rk4Buffers(SYS,pN,y)
+    return [entry(name,model,Nx,timing(lambda : M.rk4(f,y,op,p,b)),steps=1,
+                  peak=peakMemory(lambda : M.rk4(f,y,op,p,b)))
+            for name,b in (('rk4',None),('rk4 inplace',buf))]
+
+def benchLoop(model,Nx,Tmax):
+    SYS,p,pN,y,op = setup(model,Nx,Tmax)
+    info = {}
+    def run() : M.TemporalLoop(y.copy(),SYS,op,pN,p,info)
+    return [entry('loop',model,Nx,timing(run,repeat=2,mintime=0),steps=pN['Nt'],
+                  peak=peakMemory(run),Tmax=Tmax,backend=info.get('backend'))]
+
+def benchPost(model,Nx,Tmax):
+    SYS,p,pN,y,op = setup(model,Nx,Tmax)
+    Y_s,t_s = M.TemporalLoop(y,SYS,op,pN,p,{})
+    def expand() :
+        return SYS.expandY_simple(Y_s,t_s,op,p).compute()
+    def periods() :
+        M.getperiods(SYS.expandY_simple(Y_s,t_s,op,p),pN,op)
+    def plotprep() :
+        r = SYS.expandY_simple(Y_s,t_s,op,p)
+        Useful,Organised = VarD.VariableDictionnary(r)
+        for key in Useful : np.asarray(r[key])
+    return [entry(name,model,Nx,timing(fn,repeat=2,mintime=0),peak=peakMemory(fn),Tmax=Tmax)
+            for name,fn in (('expand',expand),('periods',periods),('plotprep',plotprep))]
+
+def run(models=MODELS,NX=NX,TMAX=TMAX,maxwork=MAXWORK,verbose=True):
+    '''Whole suite, returns the report (dictionnary)'''
+    report = {'meta'    : {'date'     : time.strftime('%Y-%m-%d %H:%M:%S'),
+                           'machine'  : platform.platform(),
+                           'processor': platform.processor(),
+                           'python'   : platform.python_version(),
+                           'numpy'    : np.__version__,
+                           'codehash' : Exp.codeHash()},
+              'results' : []}
+    for model in models :
+        for Nx in NX :
+            res = benchRHS(model,Nx)+benchRK4(model,Nx)
+            for Tmax in TMAX :
+                if Nx*Tmax/Par.parnum()['dt'] <= maxwork : res += benchLoop(model,Nx,Tmax)
+            Tpost = max([T for T in TMAX if Nx*T/Par.parnum()['dt'] <= maxwork] or [min(TMAX)])
+            res += benchPost(model,Nx,Tpost)
+            if verbose :
+                for e in res : print(line(e))
+            report['results'] += res
+    return report
+
+
+###############################################################################
+### REPORTS ###################################################################
+###############################################################################
+def key(e):
+    return (e['bench'],e['model'],e['Nx'],e.get('Tmax'))
+
+def line(e):
+    '''Readable line of an entry'''
+    s = '%-10s %-10s Nx=%-7d' % (e['bench'],e['model'],e['Nx'])
+    s+= ' Tmax=%-4g' % e['Tmax'] if 'Tmax' in e else 10*' '
+    s+= ' %10.3e s' % e['time']
+    if 'column_steps_per_s' in e : s+= ' %10.3e col-steps/s' % e['column_steps_per_s']
+    if 'peak_MB' in e : s+= ' %8.1f MB' % e['peak_MB']
+    return s
+
+def save(report,path):
+    with open(path,'w') as f : json.dump(report,f,indent=1)
+
+def load(path):
+    with open(path) as f : return json.load(f)
+
+def compare(new,old):
+    '''{key : time(new)/time(old)} of the entries of both reports, printed'''
+    old    = {key(e) : e for e in old['results']}
+    ratios = {}
+    for e in new['results'] :
+        if key(e) in old :
+            ratios[key(e)] = e['time']/old[key(e)]['time']
+            print(line(e),' x%.2f' % ratios[key(e)])
+    return ratios
+
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks of the hot paths')
+    parser.add_argument('--out'    ,default='benchmark.json',help='JSON report')
+    parser.add_argument('--compare',default=None,help='previous JSON report')
+    parser.add_argument('--quick'  ,action='store_true',help='small sizes only (Nx<=1e4, 1e6 column-steps)')
+    parser.add_argument('--models' ,nargs='+',default=list(MODELS))
+    a = parser.parse_args()
+    if a.quick : report = run(a.models,NX[:3],TMAX[:2],10**6)
+    else       : report = run(a.models)
+    save(report,a.out)
+    if a.compare : compare(report,load(a.compare))
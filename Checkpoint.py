@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+CHECKPOINT, RESUME AND CONTINUATION OF LONG RUNS
+
+With parNum['Checkpoint'] = folder, the rk4/imex loop of Miscfunc saves its
+whole state (y, t, step, store, events, diagnostics, parameters) in
+folder/checkpoint.pkl every parNum['CheckpointEvery'] steps. The file is a
+binary pickle, replaced atomically, so a killed run always leaves a usable
+checkpoint. The model itself is not saved : it is given back when loading.
+The trajectory is not in the pickle either, so that a checkpoint costs the
+same at the end of a long run as at its start : the states stored in memory
+since the previous checkpoint are appended to folder/Y_s.rows, and the file
+stores (memmap, hdf5) only save their position in their file.
+
+    Y_s, t_s = Ckp.Resume('Checkpoint',SYS,op,info)    # after an interruption
+
+gives the same result, bit for bit, as the uninterrupted run. The compiled
+loop (JIT) and the compaction cannot be checkpointed (ValueError), nor can
+the adaptive methods.
+
+    Y_s, t_s = Ckp.Continue(Y_s,t_s,SYS,op,parNum,params,Tmore,info)
+
+extends a finished run ('full' storage) by Tmore, starting from its last
+stored state, and returns the whole trajectory ; a trajectory streamed with
+Output='memmap' is extended in its file.
+"""
+import os
+import pickle
+import numpy as np
+import Miscfunc as M
+import Storage as S
+
+FILENAME = 'checkpoint.pkl'
+ROWSNAME = 'Y_s.rows'                  # states of the MemoryStore, one (Nvar,Nx) block per stored time
+
+
+class _Pickler(pickle.Pickler):
+    '''
+    Pickler saving a reference to the model instead of the model, and the
+    MemoryStore without its trajectory, whose new states go to the rows file
+    '''
+    def __init__(self,file,SYS,folder):
+        pickle.Pickler.__init__(self,file,protocol=5)
+        self.SYS,self.folder = SYS,folder
+
+    def persistent_id(self,obj):
+        if obj is self.SYS : return 'SYS'
+        if isinstance(obj,S.MemoryStore) :
+            saveRows(self.folder,obj)
+            return ('MemoryStore',obj.Y_s.shape,obj.Y_s.dtype.str,obj.Ns,obj.t_s)
+        return None
+
+class _Unpickler(pickle.Unpickler):
+    '''Unpickler putting the given model and the MemoryStore back'''
+    def __init__(self,file,SYS,folder):
+        pickle.Unpickler.__init__(self,file)
+        self.SYS,self.folder = SYS,folder
+
+    def persistent_load(self,pid):
+        if pid=='SYS' : return self.SYS
+        _,shape,dtype,Ns,t_s = pid
+        return loadRows(self.folder,shape,dtype,Ns,t_s)
+
+
+def saveRows(folder,store):
+    '''
+    Write the states of store not in the rows file yet (store.rows : states
+    already there). The file is cut after them, so that the states written
+    by a checkpoint that did not complete are overwritten
+    '''
+    k0   = getattr(store,'rows',0)
+    Nvar,_,Nx = store.Y_s.shape
+    size = Nvar*Nx*store.Y_s.itemsize
+    path = os.path.join(folder,ROWSNAME)
+    with open(path,'r+b' if k0 and os.path.exists(path) else 'wb') as fi :
+        fi.seek(k0*size)
+        fi.write(np.ascontiguousarray(store.Y_s[:,k0:store.Ns,:].transpose(1,0,2)).tobytes())
+        fi.truncate()
+        fi.flush()
+        os.fsync(fi.fileno())
+    store.rows = store.Ns
+
+def loadRows(folder,shape,dtype,Ns,t_s):
+    '''MemoryStore of shape whose Ns first states are read from the rows file'''
+    store     = S.MemoryStore(shape[0],shape[1],shape[2],dtype)
+    rows      = np.fromfile(os.path.join(folder,ROWSNAME),dtype=dtype,count=Ns*shape[0]*shape[2])
+    store.Y_s[:,:Ns,:] = rows.reshape(Ns,shape[0],shape[2]).transpose(1,0,2)
+    store.t_s[:] = t_s
+    store.Ns     = store.rows = Ns
+    return store
+
+
+def save(folder,SYS,state):
+    '''Save the loop state (dictionnary) in folder, atomically'''
+    if state['pN'].get('method','rk4') not in ('rk4','imex') :
+        raise ValueError('Only the rk4 and imex loops can be checkpointed')
+    store = getattr(state['store'],'store',state['store'])          # under the observers
+    if isinstance(store,S.ColumnStore) :
+        raise ValueError('A run writing in a shared array (ensemble, continuation) cannot be checkpointed')
+    os.makedirs(folder,exist_ok=True)
+    path = os.path.join(folder,FILENAME)
+    with open(path+'.tmp','wb') as fi :
+        _Pickler(fi,SYS,folder).dump(dict(state,model=type(SYS).__name__))
+        fi.flush()
+        os.fsync(fi.fileno())
+    os.replace(path+'.tmp',path)
+
+def load(folder,SYS):
+    '''Loop state saved in folder, SYS being the model of the run'''
+    with open(os.path.join(folder,FILENAME),'rb') as fi :
+        state = _Unpickler(fi,SYS,folder).load()
+    if state['model']!=type(SYS).__name__ :
+        raise ValueError('The checkpoint is a '+state['model']+' run, not '+type(SYS).__name__)
+    return state
+
+def Resume(folder,SYS,op,info=None):
+    '''
+    Continue the run checkpointed in folder until its pN['Nt'] steps.
+    Returns Y_s, t_s ; info (optional) receives the diagnostics of the run
+    '''
+    st = load(folder,SYS)
+    if info is not None :
+        info.update(st['info'])
+        if hasattr(st['store'],'info') : st['store'].info = info   # Observers and stats write there
+        st['info'] = info
+    return M.FixedStepLoop(st['y'],SYS,op,st['pN'],st['p'],st['store'],st['info'],
+                           st['events'],st['i'],st['t'],st['tstart'])
+
+def Continue(Y_s,t_s,SYS,op,pN,p,Tmore,info=None):
+    '''
+    Integrate Tmore more from the last state of (Y_s,t_s), obtained with pN
+    and 'full' storage. Returns the whole trajectory (old and new states)
+    '''
+    if pN.get('StorageMode','full')!='full' :
+        raise ValueError("Only a 'full' trajectory can be continued")
+    if pN.get('Checkpoint') is not None :
+        raise ValueError('A continuation cannot be checkpointed, set parNum Checkpoint to None')
+    pN = dict(pN,Tmax=Tmore)
+    pN['Nt'] = int(round(Tmore/pN['dt']))
+    pN['Ns'] = int(round(Tmore/pN['Tstore']))+1
+    K0       = len(t_s)-1                                  # the last state is the first of the new part
+    shape    = (Y_s.shape[0],K0+pN['Ns'],Y_s.shape[2])
+    y        = np.array(Y_s[:,-1,:])
+
+    memmap = pN.get('Output','memory')=='memmap'
+    if memmap :
+        path  = os.path.join(pN['OutputPath'],'Y_s.npy')
+        Y_new = np.lib.format.open_memmap(path+'.new',mode='w+',dtype=Y_s.dtype,shape=shape)
+        for k in range(0,K0+1,256) : Y_new[:,k:min(k+256,K0+1)] = Y_s[:,k:min(k+256,K0+1)]
+    else :
+        Y_new = np.empty(shape,dtype=Y_s.dtype)
+        Y_new[:,:K0+1] = Y_s
+    store = S.ColumnStore(Y_new,0,shape[2],k0=K0)
+    store.t_s[:K0+1] = t_s
+    Y_out,t_out = M.TemporalLoop(y,SYS,op,pN,p,info,store=store,t0=t_s[-1])
+    if not memmap : return Y_out,t_out
+
+    Y_new.flush()
+    del Y_new,Y_out,store
+    os.replace(path+'.new',path)
+    np.save(os.path.join(pN['OutputPath'],'t_s.npy'),t_out)
+    return S.loadTrajectory(pN['OutputPath'])
@@ -1,11 +1,50 @@
 # -*- coding: utf-8 -*-
 import numpy as np
+from scipy.sparse import diags
 import plots as plts          # Already written plot functions
+import Results as Res         # Lazy result dictionnary
+
+LN2 = float(np.log(2))        # python float : keeps the precision of the arrays (float32)
 
 """
 Class version of GEMMES
 """
-class GK_FULL():
+class Model():
+    """
+    Methods shared by all the models : the models only define variables,
+    parameters, f, fusedRHS and their intermediary functions
+    """
+    ##### THIS SECTION SHOULD NEED NO CHANGES !
+    def initializeY(self,ic,pN):
+        '''Rewrite the initial conditions in a machine-friendly style'''
+        y= np.zeros((self.Nvar,pN['Nx']),dtype=pN.get('dtype',float))
+        for i,ids in enumerate(self.variables): y[i,:] = ic[ids]
+        return(y)
+
+    def expandY_simple(self,Y_s,t_s,op,p):
+        ''' Get all relevant instant variables that one can extract from the system'''
+        return Res.Results(self,Y_s,t_s,p)   # intermediary variables calculated on first access
+
+    def printParameters(self,p):
+        '''Print all physical parameters that are in the system'''
+        print('#################################')
+        print("Physical parameters value ######")
+        for name in self.parameters:
+            print(name+(15-len(name))*' ',p[name])
+        print(33*'#')
+
+    def keepUsefulParams(self,p):
+        '''Clean all parameters values'''
+        newParams = {}
+        for key in self.parameters:
+            newParams[key] = p[key]
+        return newParams
+
+
+###############################################################################
+###############################################################################
+
+class GK_FULL(Model):
     """
     Extensive variable dynamics of a simple GoodwinKeen model. 
     Should give the same result as GK_Reduced. 
@@ -92,9 +131,141 @@ class GK_FULL():
         
         #IV## RETURN ITERATED VECTOR 
         return np.array([dy[j]*p['dt'] for j in self.variables])
-        
+
+    def fusedRHS(self,p):
+        '''
+        Fused version of f, to build once per run : parameters are read once,
+        intermediary values live in preallocated buffers and every NumPy
+        operation is done in-place. The operations are the same as in f and
+        in the same order, so the trajectories are bit-identical.
+        Returns a function with the signature of f, plus an optional out buffer
+        '''
+        r,alpha,delta1,beta,nu,etaP,muP,gammaP,k0,k1,k2,phi1,dt = [
+            p[k] for k in ('r','alpha','delta1','beta','nu','etaP','muP',
+                           'gammaP','k0','k1','k2','phi1','dt')]
+        mphi0  = -p['phi0']
+        par    = (r,alpha,delta1,beta,nu,etaP,muP,gammaP,k0,k1,k2,phi1,mphi0,dt)
+        scalar = all(np.ndim(v)==0 for v in par)   # Nx=1 fast path allowed (float64 only)
+        if scalar : r,alpha,delta1,beta,nu,etaP,muP,gammaP,k0,k1,k2,phi1,mphi0,dt = [float(v) for v in par]
+        tmp = {'shape':None}
+
+        def f(inputt,op,p,out=None):
+            if out is None : out = np.empty_like(inputt)
+
+            #I#### NX=1 : PYTHON FLOATS, ONLY EXP GOES THROUGH NUMPY
+            if scalar and inputt.shape[1]==1 and inputt.dtype==np.float64 :
+                try:
+                    a,N,K,W,D = inputt[:,0].tolist()
+                    Y    = K / nu
+                    L    = K / (a * nu)
+                    Pi   = Y - W*L - r*D
+                    lamb = L / N
+                    om   = W * L / Y
+                    d    = D / Y
+                    pi   = 1 - om - r*d
+                    i    = etaP * (om*muP-1)
+                    phil = mphi0 + phi1/ ((1-lamb)*(1-lamb))
+                    e    = tmp['e'] ; e[0] = k2*pi ; np.exp(e,out=e)
+                    I    = Y * (k0 + k1*e.item())
+                    out[:,0] = (alpha*a*dt,
+                                beta*N*dt,
+                                (I - K*delta1)*dt,
+                                W * ( phil + gammaP * i )*dt,
+                                (I - Pi)*dt)
+                    return out
+                except ZeroDivisionError : pass  # numpy path gives inf/nan
+
+            #II### PREALLOCATED BUFFERS
+            if tmp['shape'] != inputt.shape :
+                tmp['shape'] = inputt.shape
+                tmp['buf']   = np.empty((12,inputt.shape[1]),dtype=inputt.dtype)
+            a,N,K,W,D = inputt
+            Y,L,Pi,lamb,om,d,pi,i,phil,kap,I,s = tmp['buf']
+
+            #III## INTERMEDIATE VALUES, IN-PLACE
+            np.divide  (K,nu,out=Y)
+            np.multiply(a,nu,out=s)   ; np.divide(K,s,out=L)
+            np.multiply(W,L,out=s)    ; np.subtract(Y,s,out=Pi)
+            np.multiply(r,D,out=s)    ; np.subtract(Pi,s,out=Pi)
+            np.divide  (L,N,out=lamb)
+            np.multiply(W,L,out=om)   ; np.divide(om,Y,out=om)
+            np.divide  (D,Y,out=d)
+            np.subtract(1,om,out=pi)  ; np.multiply(r,d,out=s) ; np.subtract(pi,s,out=pi)
+            np.multiply(om,muP,out=i) ; np.subtract(i,1,out=i) ; np.multiply(etaP,i,out=i)
+            np.subtract(1,lamb,out=phil) ; np.multiply(phil,phil,out=phil)
+            np.divide  (phi1,phil,out=phil) ; np.add(mphi0,phil,out=phil)
+            np.multiply(k2,pi,out=kap) ; np.exp(kap,out=kap)
+            np.multiply(k1,kap,out=kap); np.add(k0,kap,out=kap)
+            np.multiply(Y,kap,out=I)
+
+            #IV## EVOLUTION OF DYNAMIC VARIABLES, IN-PLACE
+            np.multiply(alpha,a,out=out[0])
+            np.multiply(beta ,N,out=out[1])
+            np.multiply(K,delta1,out=out[2]) ; np.subtract(I,out[2],out=out[2])
+            np.multiply(gammaP,i,out=s)      ; np.add(phil,s,out=s) ; np.multiply(W,s,out=out[3])
+            np.subtract(I,Pi,out=out[4])
+            np.multiply(out,dt,out=out)
+            return out
+
+        tmp['e'] = np.empty(1)
+        return f
+
     
     
+    ### INTENSIVE DYNAMICS AND EQUILIBRIA (used by Stability)
+    def intensive(self,inputt,p):
+        '''Intensive state (omega,lambda,d) of a state of the system'''
+        r = {ids : inputt[i] for i,ids in enumerate(self.variables)}
+        for name in ('Y','L','lambda','omega','d') : r[name] = self.intermediaryfuncs[name](r,p)
+        return np.array([r['omega'],r['lambda'],r['d']],dtype=float)
+
+    def intensiveRHS(self,x,p):
+        '''
+        Time derivative of the intensive state x, (3,Nx), as implied by f :
+        omega = w/a, lambda = K/(a nu N), d = D/Y
+        '''
+        y = {'omega':x[0],'lambda':x[1],'d':x[2]}
+        for name in ('pi','i','philips','kappa') : y[name] = self.intermediaryfuncs[name](y,p)
+        gK = y['kappa']/p['nu'] - p['delta1']                # growth rate of K
+        return np.array([y['omega'] *(y['philips'] + p['gammaP']*y['i'] - p['alpha']),
+                         y['lambda']*(gK - p['alpha'] - p['beta']),
+                         y['kappa'] - y['pi'] - y['d']*gK])
+
+    def jacobian(self,x,p):
+        '''Analytic jacobian of intensiveRHS, one matrix per column (Nx,3,3)'''
+        y     = {'omega':x[0],'lambda':x[1],'d':x[2]}
+        om,lamb,d = x
+        y['pi'] = pi = self.pi(y,p)
+        i,phil,kap   = self.i(y,p),self.philips(y,p),self.kappa(y,p)
+        dphil = 2*p['phi1']/(1-lamb)**3                     # dphilips/dlambda
+        dkap  = p['k1']*p['k2']*np.exp(p['k2']*pi)           # dkappa/dpi
+        di    = p['etaP']*p['muP']                           # di/domega
+        gK    = kap/p['nu'] - p['delta1']
+        return _matrix([[phil+p['gammaP']*i-p['alpha'] + om*p['gammaP']*di, om*dphil, 0],
+                        [-lamb*dkap/p['nu'], gK-p['alpha']-p['beta'], -p['r']*lamb*dkap/p['nu']],
+                        [1-dkap+d*dkap/p['nu'], 0, p['r']-p['r']*dkap-gK+p['r']*d*dkap/p['nu']]])
+
+    def equilibria(self,p):
+        '''
+        Equilibria of the intensive dynamics, for every parameter set :
+        {name : {'x' : (3,Nx) state (NaN where it does not exist)}}, plus
+        'eigenvalues' (Nx,3) for the ones at infinity
+        *    solow : kappa(pi) = nu(alpha+beta+delta1), d = (kappa-pi)/(alpha+beta)
+                     and lambda from the Philips curve
+        *    bad   : omega=lambda=0, d infinite, eigenvalues in (omega,lambda,1/d)
+        '''
+        with np.errstate(all='ignore'):
+            kap  = p['nu']*(p['alpha']+p['beta']+p['delta1'])
+            pi   = np.log((kap-p['k0'])/p['k1'])/p['k2']
+            d    = (kap-pi)/(p['alpha']+p['beta'])
+            om   = 1 - pi - p['r']*d
+            i    = p['etaP']*(om*p['muP']-1)
+            lamb = 1 - np.sqrt(p['phi1']/(p['phi0']+p['alpha']-p['gammaP']*i))
+            bad  = [-p['phi0']+p['phi1']-p['alpha']-p['gammaP']*p['etaP'],
+                    p['k0']/p['nu']-p['delta1']-p['alpha']-p['beta'],
+                    p['k0']/p['nu']-p['delta1']-p['r']]
+        return _equilibria(om,lamb,d,bad)
+
     ### SPECIFIC FUNCTIONS INSIDE 
     def pi     (self, y, p): return 1 - y['omega'] - p['r']*y['d']
     def Pi     (self, y, p): return y['Y'] - y['W']*y['L'] - p['r']*y['D']
@@ -117,40 +288,11 @@ class GK_FULL():
         plts.GraphesExtensive  (r, p) 
 
 
-    ##### THIS SECTION SHOULD NEED NO CHANGES !
-    def initializeY(self,ic,pN):
-        '''Rewrite the initial conditions in a machine-friendly style'''
-        y= np.zeros((self.Nvar,pN['Nx']))
-        for i,ids in enumerate(self.variables): y[i,:] = ic[ids]
-        return(y)
-    
-    def expandY_simple(self,Y_s,t_s,op,p):
-        ''' Get all relevant instant variables that one can extract from the system'''
-        r={'t' : t_s}    
-        for i,ids in enumerate(self.variables): r[ids] = Y_s[i,:,:]     # Expand calculated variables
-        for name,fs in self.intermediaryfuncs.items() : r[name]=fs(r,p) # Back to intermediary variables
-        return r
-
-    def printParameters(self,p):
-        '''Print all physical parameters that are in the system'''
-        print('#################################')
-        print("Physical parameters value ######")
-        for name in self.parameters:
-            print(name+(15-len(name))*' ',p[name])   
-        print(33*'#')
-
-    def keepUsefulParams(self,p):
-        '''Clean all parameters values'''
-        newParams = {}
-        for key in self.parameters:
-            newParams[key] = p[key]
-        return newParams
-
 
 ###############################################################################
 ###############################################################################
 
-class GK_Reduced():    
+class GK_Reduced(Model):
     """
     3 intensive variable dynamic of simple GoodwinKeen model. Ingredients :
             * Leontiev Function
@@ -216,6 +358,117 @@ class GK_Reduced():
         #IV## RETURN ITERATED VECTOR 
         return np.array([dy[j]*p['dt'] for j in self.variables])
 
+    def fusedRHS(self,p):
+        '''
+        Fused version of f, to build once per run : parameters are read once,
+        intermediary values live in preallocated buffers and every NumPy
+        operation is done in-place. The operations are the same as in f and
+        in the same order, so the trajectories are bit-identical.
+        Returns a function with the signature of f, plus an optional out buffer
+        '''
+        r,alpha,delta1,beta,nu,etaP,muP,gammaP,k0,k1,k2,phi1,dt = [
+            p[k] for k in ('r','alpha','delta1','beta','nu','etaP','muP',
+                           'gammaP','k0','k1','k2','phi1','dt')]
+        mphi0  = -p['phi0']
+        par    = (r,alpha,delta1,beta,nu,etaP,muP,gammaP,k0,k1,k2,phi1,mphi0,dt)
+        scalar = all(np.ndim(v)==0 for v in par)   # Nx=1 fast path allowed (float64 only)
+        if scalar : r,alpha,delta1,beta,nu,etaP,muP,gammaP,k0,k1,k2,phi1,mphi0,dt = [float(v) for v in par]
+        tmp = {'shape':None}
+
+        def f(inputt,op,p,out=None):
+            if out is None : out = np.empty_like(inputt)
+
+            #I#### NX=1 : PYTHON FLOATS, ONLY EXP GOES THROUGH NUMPY
+            if scalar and inputt.shape[1]==1 and inputt.dtype==np.float64 :
+                try:
+                    om,lamb,d = inputt[:,0].tolist()
+                    pi   = 1 - om - r*d
+                    i    = etaP*(om*muP-1)
+                    phil = mphi0 + phi1/ ((1-lamb)*(1-lamb))
+                    e    = tmp['e'] ; e[0] = k2*pi ; np.exp(e,out=e)
+                    kap  = k0 + k1*e.item()
+                    out[:,0] = (om   * (phil-alpha-gammaP*i)*dt,
+                                lamb * (kap/nu - alpha - alpha - beta )*dt,
+                                (kap - pi - d*  (kap/nu - delta1 + i))*dt)
+                    return out
+                except ZeroDivisionError : pass  # numpy path gives inf/nan
+
+            #II### PREALLOCATED BUFFERS
+            if tmp['shape'] != inputt.shape :
+                tmp['shape'] = inputt.shape
+                tmp['buf']   = np.empty((6,inputt.shape[1]),dtype=inputt.dtype)
+            om,lamb,d = inputt
+            pi,i,phil,kap,kn,s = tmp['buf']
+
+            #III## INTERMEDIATE VALUES, IN-PLACE
+            np.subtract(1,om,out=pi)  ; np.multiply(r,d,out=s) ; np.subtract(pi,s,out=pi)
+            np.multiply(om,muP,out=i) ; np.subtract(i,1,out=i) ; np.multiply(etaP,i,out=i)
+            np.subtract(1,lamb,out=phil) ; np.multiply(phil,phil,out=phil)
+            np.divide  (phi1,phil,out=phil) ; np.add(mphi0,phil,out=phil)
+            np.multiply(k2,pi,out=kap) ; np.exp(kap,out=kap)
+            np.multiply(k1,kap,out=kap); np.add(k0,kap,out=kap)
+            np.divide  (kap,nu,out=kn)
+
+            #IV## EVOLUTION OF DYNAMIC VARIABLES, IN-PLACE
+            np.subtract(phil,alpha,out=out[0]) ; np.multiply(gammaP,i,out=s)
+            np.subtract(out[0],s,out=out[0])   ; np.multiply(om,out[0],out=out[0])
+            np.subtract(kn,alpha,out=out[1])   ; np.subtract(out[1],alpha,out=out[1])
+            np.subtract(out[1],beta,out=out[1]); np.multiply(lamb,out[1],out=out[1])
+            np.subtract(kn,delta1,out=s)       ; np.add(s,i,out=s) ; np.multiply(d,s,out=s)
+            np.subtract(kap,pi,out=out[2])     ; np.subtract(out[2],s,out=out[2])
+            np.multiply(out,dt,out=out)
+            return out
+
+        tmp['e'] = np.empty(1)
+        return f
+
+    ### INTENSIVE DYNAMICS AND EQUILIBRIA (used by Stability)
+    def intensive(self,inputt,p):
+        '''Intensive state (omega,lambda,d) of a state of the system'''
+        return np.array(inputt[:3],dtype=float)
+
+    def intensiveRHS(self,x,p):
+        '''Time derivative of the intensive state x, (3,Nx)'''
+        q = dict(p) ; q['dt'] = 1
+        return GK_Reduced.f(self,x,{},q)
+
+    def jacobian(self,x,p):
+        '''Analytic jacobian of intensiveRHS, one matrix per column (Nx,3,3)'''
+        y     = {'omega':x[0],'lambda':x[1],'d':x[2]}
+        om,lamb,d = x
+        y['pi'] = pi = self.pi(y,p)
+        i,phil,kap   = self.i(y,p),self.philips(y,p),self.kappa(y,p)
+        dphil = 2*p['phi1']/(1-lamb)**3                     # dphilips/dlambda
+        dkap  = p['k1']*p['k2']*np.exp(p['k2']*pi)           # dkappa/dpi
+        di    = p['etaP']*p['muP']                           # di/domega
+        G     = kap/p['nu'] - p['delta1'] + i
+        return _matrix([[phil-p['alpha']-p['gammaP']*i - om*p['gammaP']*di, om*dphil, 0],
+                        [-lamb*dkap/p['nu'], kap/p['nu']-p['alpha']-p['alpha']-p['beta'], -p['r']*lamb*dkap/p['nu']],
+                        [1-dkap+d*dkap/p['nu']-d*di, 0, p['r']-p['r']*dkap-G+p['r']*d*dkap/p['nu']]])
+
+    def equilibria(self,p):
+        '''
+        Equilibria of the intensive dynamics, for every parameter set :
+        {name : {'x' : (3,Nx) state (NaN where it does not exist)}}, plus
+        'eigenvalues' (Nx,3) for the ones at infinity
+        *    solow : kappa(pi) = nu(2 alpha+beta), then d solves
+                     etaP muP r d**2 - c d + kappa-pi = 0 and lambda the Philips curve
+        *    bad   : omega=lambda=0, d infinite, eigenvalues in (omega,lambda,1/d)
+        '''
+        with np.errstate(all='ignore'):
+            kap  = p['nu']*(p['alpha']+p['alpha']+p['beta'])
+            pi   = np.log((kap-p['k0'])/p['k1'])/p['k2']
+            c    = kap/p['nu'] - p['delta1'] + p['etaP']*(p['muP']*(1-pi)-1)
+            a    = p['etaP']*p['muP']*p['r']
+            d    = 2*(kap-pi)/(c+np.sqrt(c**2-4*a*(kap-pi)))  # root continuous in a=0
+            om   = 1 - pi - p['r']*d
+            i    = p['etaP']*(om*p['muP']-1)
+            lamb = 1 - np.sqrt(p['phi1']/(p['phi0']+p['alpha']+p['gammaP']*i))
+            bad  = [-p['phi0']+p['phi1']-p['alpha']+p['gammaP']*p['etaP'],
+                    p['k0']/p['nu']-p['alpha']-p['alpha']-p['beta'],
+                    p['k0']/p['nu']-p['delta1']-p['etaP']-p['r']]
+        return _equilibria(om,lamb,d,bad)
+
     def pi(     self,y,p): return 1 - y['omega'] - p['r']*y['d']
     def i(      self,y,p): return p['etaP']*(y['omega']*p['muP']-1)
     def g(      self,y,p): return (1-y['omega'])/p['nu'] - p['delta1']
@@ -228,31 +481,273 @@ class GK_Reduced():
         plts.omegalambdacycles (r, p,)       # 2-D omega-lambda phase portrait
         plts.GraphesIntensive  (r, p)      
         plts.PhasewithG        (r, p,[],)        
-    ##### THIS SECTION SHOULD NEED NO CHANGES !
-    def initializeY(self,ic,pN):
-        '''Rewrite the initial conditions in a machine-friendly style'''
-        y= np.zeros((self.Nvar,pN['Nx']))
-        for i,ids in enumerate(self.variables): y[i,:] = ic[ids]
-        return(y)
-    
-    def expandY_simple(self,Y_s,t_s,op,p):
-        ''' Get all relevant instant variables that one can extract from the system'''
-        r={'t' : t_s}    
-        for i,ids in enumerate(self.variables): r[ids] = Y_s[i,:,:]     # Expand calculated variables
-        for name,fs in self.intermediaryfuncs.items() : r[name]=fs(r,p) # Back to intermediary variables
-        return r
 
-    def printParameters(self,p):
-        '''Print all physical parameters that are in the system'''
-        print('#################################')
-        print("Physical parameters value ######")
-        for name in self.parameters:
-            print(name+(15-len(name))*' ',p[name])   
-        print(33*'#')
+###############################################################################
+###############################################################################
 
-    def keepUsefulParams(self,p):
-        '''Clean all parameters values'''
-        newParams = {}
-        for key in self.parameters:
-            newParams[key] = p[key]
-        return newParams
\ No newline at end of file
+class GK_Reduced_Coupled(GK_Reduced):
+    """
+    GK_Reduced on parNum['Nx'] sites of a periodic ring, coupled through the
+    employement rate. Ingredients :
+            * Every ingredient of GK_Reduced on each site
+            * Mean-field coupling : lambda relaxes toward the mean of all sites (g1)
+            * Nearest-neighbour coupling : diffusion of lambda (g2)
+    The operators are the ones of Miscfunc.prepareOperators : the laplacian
+    is a CSR matrix and the mean a O(Nx) reduction.
+    """
+    coupled = True
+
+    def __init__(self):
+        GK_Reduced.__init__(self)
+        self.parameters = self.parameters + ['g1','g2']
+        self.description = ("GK_Reduced on a periodic ring, coupled through lambda. Ingredients :" +'\n'+
+            "* Every ingredient of GK_Reduced on each site"+'\n'+
+            "* Mean-field coupling : lambda relaxes toward the mean of all sites (g1)"+'\n'+
+            "* Nearest-neighbour coupling : diffusion of lambda (g2)")
+
+    def coupling(self,lamb,op,p):
+        '''Evolution of lambda due to the other sites'''
+        dl = 0*lamb
+        if np.any(p['g1']) : dl = dl + p['g1']*(op['Mean'](lamb) - lamb)
+        if np.any(p['g2']) : dl = dl + p['g2']*(op['laplacian'] @ lamb)
+        return dl
+
+    def implicitPart(self,op,p):
+        '''
+        Stiff part for the 'imex' method : the diffusion g2*laplacian of lambda
+        is solved implicitly, the rest (parameters with g2=0) explicitly
+        '''
+        pe       = dict(p)
+        pe['g2'] = 0
+        if not np.any(p['g2']) : return pe,{}
+        g2 = p['g2']*np.ones(op['laplacian'].shape[0])
+        return pe,{1 : diags(g2) @ op['laplacian']}
+
+    def f(self,inputt,op,p):
+        '''
+        Dynamic core of the system, makes the step for y between t and t+dt
+        '''
+        dy     = GK_Reduced.f(self,inputt,op,p)
+        dy[1] += self.coupling(inputt[1],op,p)*p['dt']
+        return dy
+
+    def fusedRHS(self,p):
+        '''
+        Fused version of f : the local dynamics of GK_Reduced.fusedRHS, plus
+        the coupling applied with sparse products and the mean reduction
+        '''
+        local  = GK_Reduced.fusedRHS(self,p)
+        g1,g2,dt = p['g1'],p['g2'],p['dt']
+        mean,diff = np.any(g1),np.any(g2)
+
+        def f(inputt,op,p,out=None):
+            out  = local(inputt,op,p,out)
+            lamb = inputt[1]
+            if not (mean or diff) : return out
+            dl   = g1*(np.mean(lamb) - lamb) if mean else 0*lamb
+            if diff : dl += g2*(op['laplacian'] @ lamb)
+            out[1] += dl*dt
+            return out
+        return f
+
+
+###############################################################################
+###############################################################################
+
+class GEMMES(Model):
+    """
+    GK_FULL coupled to a climate : the economy emits CO2, the temperature
+    damages output and capital. Ingredients :
+        * Every ingredient of GK_FULL, on the output net of damages and abatement
+        * Damage function of the temperature, a fraction fk on the capital
+        * Abatement of a fraction n of the emissions, at a cost convex in n (theta)
+        * Emission intensity with a decreasing growth rate, exogeneous land-use emissions
+        * Three-box carbon cycle (atmosphere, upper ocean and biosphere, lower ocean)
+        * Two-layer temperature (atmosphere and upper ocean, deep ocean)
+        * Backstop technology price decreasing exponentially
+    """
+    def __init__(self):
+        self.variables  = ['a','N','K','W','D',
+                           'CO2at','CO2up','CO2lo',
+                           'T','T0',
+                           'sigma','gsigma','Eland','pbs']
+        self.Nvar       = len(self.variables)
+        self.parameters = ['r',
+                           'alpha','delta1','beta',
+                           'nu',
+                           'etaP','muP','gammaP',
+                           'k0','k1','k2',
+                           'phi0','phi1',
+                           'pi1','pi2','pi3','zeta','fk',
+                           'n','theta','dPBS',
+                           'dsigma','dEland',
+                           'Phi12','Phi23','CAT_eq','CUP_eq','CLO_eq',
+                           'C','C0','gamma','Tsens','F2CO2','FexoMax']
+
+        self.intermediaryfuncs = {  'Y0'     : self.GDP0   ,   # Potential GDP Leontiev
+                                    'L'      : self.worker ,   # Workers
+                                    'DT'     : self.damage ,   # Damage of the temperature
+                                    'DK'     : self.damageK,   # Part of the damage on capital
+                                    'DY'     : self.damageY,   # Part of the damage on output
+                                    'A'      : self.abatecost, # Abatement cost (part of output)
+                                    'Y'      : self.GDP    ,   # GDP, net of damages and abatement
+                                    'Pi'     : self.Pi     ,   # Extensive profit
+                                    'lambda' : self.lambd  ,   # employement rate
+                                    'omega'  : self.omega  ,   # wage share in GDP
+                                    'd'      : self.d      ,   # relative debt
+                                    'pi'     : self.pi     ,   # Relative profit
+                                    'i'      : self.i      ,   # Rate of Inflation
+                                    'philips': self.philips,   # Rate of salary growth
+                                    'kappa'  : self.kappa  ,   # percent of production going into investment
+                                    'I'      : self.invest ,   # Investment in new capital
+                                    'g'      : self.g      ,   # Growth rate of capital
+                                    'E'      : self.emission,  # Total CO2 emissions
+                                    'F'      : self.forcing,   # Radiative forcing
+                                }
+
+        self.description =  (
+        "GK_FULL coupled to a climate : the economy emits CO2, the temperature" +'\n'+
+        "damages output and capital. Ingredients :" +'\n'+
+            "* Every ingredient of GK_FULL, on the output net of damages and abatement"+'\n'+
+            "* Damage function of the temperature, a fraction fk on the capital"+'\n'+
+            "* Abatement of a fraction n of the emissions, at a cost convex in n (theta)"+'\n'+
+            "* Emission intensity with a decreasing growth rate, exogeneous land-use emissions"+'\n'+
+            "* Three-box carbon cycle (atmosphere, upper ocean and biosphere, lower ocean)"+'\n'+
+            "* Two-layer temperature (atmosphere and upper ocean, deep ocean)"+'\n'+
+            "* Backstop technology price decreasing exponentially")
+
+    def f(self,inputt,op,p):
+        '''
+        Dynamic core of the system, makes the step for y between t and t+dt
+        '''
+        #I#### GET VARIABLES FROM Y AS A DIC SO THAT IT'S MORE PRACTICAL
+        y  = {}
+        dy = {}
+        for i,ids in enumerate(self.variables): y[ids] = inputt[i]
+
+        #II### CALCULATE SOME INTERMEDIATE VALUE
+        for name in ('Y0','L','DT','DK','DY','A','Y','Pi','lambda','omega','d',
+                     'pi','i','philips','kappa','I','E','F') :
+            y[name] = self.intermediaryfuncs[name](y,p)
+
+        #III## CALCULATE EVOLUTION OF DYNAMIC VARIABLES
+        dy['a']      = p['alpha']*y['a']
+        dy['N']      = p['beta'] *y['N']
+        dy['K']      = y['I'] - y['K']*(p['delta1']+y['DK'])
+        dy['W']      = y['W'] * ( y['philips'] + p['gammaP'] * y['i'] )
+        dy['D']      = y['I'] - y['Pi']
+        dy['CO2at']  = y['E'] - p['Phi12']*y['CO2at'] + p['Phi12']*p['CAT_eq']/p['CUP_eq']*y['CO2up']
+        dy['CO2up']  = ( p['Phi12']*y['CO2at'] - (p['Phi12']*p['CAT_eq']/p['CUP_eq']+p['Phi23'])*y['CO2up']
+                       + p['Phi23']*p['CUP_eq']/p['CLO_eq']*y['CO2lo'] )
+        dy['CO2lo']  = p['Phi23']*y['CO2up'] - p['Phi23']*p['CUP_eq']/p['CLO_eq']*y['CO2lo']
+        dy['T']      = ( y['F'] - p['F2CO2']/p['Tsens']*y['T'] - p['gamma']*(y['T']-y['T0']) )/p['C']
+        dy['T0']     = p['gamma']*(y['T']-y['T0'])/p['C0']
+        dy['sigma']  = y['gsigma']*y['sigma']
+        dy['gsigma'] = p['dsigma']*y['gsigma']
+        dy['Eland']  = p['dEland']*y['Eland']
+        dy['pbs']    = p['dPBS']*y['pbs']
+
+        #IV## RETURN ITERATED VECTOR
+        return np.array([dy[j]*p['dt'] for j in self.variables])
+
+    def fusedRHS(self,p):
+        '''
+        Fused version of f, to build once per run : parameters and their
+        combinations are read once, intermediary values are not stored in a
+        dictionnary. Same operations as f in the same order (bit-identical).
+        Returns a function with the signature of f, plus an optional out buffer
+        '''
+        r,alpha,delta1,beta,nu,etaP,muP,gammaP,k0,k1,k2,phi0,phi1 = [p[k] for k in self.parameters[:13]]
+        pi1,pi2,pi3,zeta,fk,n,theta,dPBS,dsigma,dEland = [p[k] for k in self.parameters[13:23]]
+        Phi12,Phi23,C,C0,gamma,F2CO2,FexoMax,dt = [p[k] for k in ('Phi12','Phi23','C','C0','gamma','F2CO2','FexoMax','dt')]
+        P21   = p['Phi12']*p['CAT_eq']/p['CUP_eq']
+        P32   = p['Phi23']*p['CUP_eq']/p['CLO_eq']
+        rho   = p['F2CO2']/p['Tsens']
+        CATeq = p['CAT_eq']
+        nt    = n**theta
+
+        def f(inputt,op,p,out=None):
+            if out is None : out = np.empty_like(inputt)
+            a,N,K,W,D,CO2at,CO2up,CO2lo,T,T0,sigma,gsigma,Eland,pbs = inputt
+            Y0   = K / nu
+            L    = K / (a * nu)
+            DT   = 1 - 1/(1 + pi1*T + pi2*T**2 + pi3*T**zeta)
+            DK   = fk*DT
+            DY   = 1 - (1-DT)/(1-DK)
+            A    = sigma*pbs*nt/theta
+            Y    = (1-DY)*(1-A)*Y0
+            Pi   = Y - W*L - r*D
+            lamb = L / N
+            om   = W * L / Y
+            d    = D / Y
+            pi   = 1 - om - r*d
+            i    = etaP * (om*muP-1)
+            phil = - phi0 + phi1/ (1-lamb)**2
+            I    = Y * (k0 + k1 * np.exp(k2*pi))
+            E    = sigma*(1-n)*Y0 + Eland
+            F    = F2CO2*np.log(CO2at/CATeq)/LN2 + FexoMax
+            out[0]  = alpha*a
+            out[1]  = beta *N
+            out[2]  = I - K*(delta1+DK)
+            out[3]  = W * ( phil + gammaP * i )
+            out[4]  = I - Pi
+            out[5]  = E - Phi12*CO2at + P21*CO2up
+            out[6]  = Phi12*CO2at - (P21+Phi23)*CO2up + P32*CO2lo
+            out[7]  = Phi23*CO2up - P32*CO2lo
+            out[8]  = ( F - rho*T - gamma*(T-T0) )/C
+            out[9]  = gamma*(T-T0)/C0
+            out[10] = gsigma*sigma
+            out[11] = dsigma*gsigma
+            out[12] = dEland*Eland
+            out[13] = dPBS*pbs
+            np.multiply(out,dt,out=out)
+            return out
+        return f
+
+    ### SPECIFIC FUNCTIONS INSIDE
+    def GDP0     (self, y, p): return y['K'] / p['nu']
+    def worker   (self, y, p): return y['K'] / (y['a'] * p['nu'])
+    def damage   (self, y, p): return 1 - 1/(1 + p['pi1']*y['T'] + p['pi2']*y['T']**2 + p['pi3']*y['T']**p['zeta'])
+    def damageK  (self, y, p): return p['fk']*y['DT']
+    def damageY  (self, y, p): return 1 - (1-y['DT'])/(1-y['DK'])
+    def abatecost(self, y, p): return y['sigma']*y['pbs']*p['n']**p['theta']/p['theta']
+    def GDP      (self, y, p): return (1-y['DY'])*(1-y['A'])*y['Y0']
+    def Pi       (self, y, p): return y['Y'] - y['W']*y['L'] - p['r']*y['D']
+    def lambd    (self, y, p): return y['L'] / y['N']
+    def omega    (self, y, p): return y['W'] * y['L'] / y['Y']
+    def d        (self, y, p): return y['D'] / y['Y']
+    def pi       (self, y, p): return 1 - y['omega'] - p['r']*y['d']
+    def i        (self, y, p): return p['etaP'] * (y['omega']*p['muP']-1)
+    def philips  (self, y, p): return - p['phi0'] + p['phi1']/ (1-y['lambda'])**2
+    def kappa    (self, y, p): return p['k0'] + p['k1'] * np.exp(p['k2']*y['pi'])
+    def invest   (self, y, p): return y['Y'] * y['kappa']
+    def g        (self, y, p): return y['I']/y['K'] - p['delta1'] - y['DK']
+    def emission (self, y, p): return y['sigma']*(1-p['n'])*y['Y0'] + y['Eland']
+    def forcing  (self, y, p): return p['F2CO2']*np.log(y['CO2at']/p['CAT_eq'])/LN2 + p['FexoMax']
+
+    def plotlitst_simple(self,r,p):
+        '''Launch all plots that don't need further understanding'''
+        plts.GoodwinKeenTypical(r, p,)      # Typical 3-Dimension phase-plot
+        plts.omegalambdacycles (r, p,)       # 2-D omega-lambda phase portrait
+        plts.GraphesIntensive  (r, p)
+        plts.GraphesExtensive  (r, p)
+
+
+###############################################################################
+###############################################################################
+
+def _matrix(rows):
+    '''(Nx,n,n) array from a n*n nested list of scalars or length-Nx arrays'''
+    flat = np.broadcast_arrays(*[np.asarray(c,dtype=float) for row in rows for c in row])
+    return np.stack(flat,axis=-1).reshape(flat[0].shape[-1:]+(len(rows),len(rows)))
+
+def _equilibria(om,lamb,d,bad):
+    '''Solow equilibrium (NaN where not admissible) and bad equilibrium in the format of equilibria'''
+    x   = np.array(np.broadcast_arrays(om,lamb,d),dtype=float).reshape(3,-1)
+    ok  = np.isfinite(x).all(axis=0) & (x[0]>0) & (x[1]>0) & (x[1]<1)
+    x[:,~ok] = np.nan
+    Nx  = x.shape[1]
+    eig = np.array([np.broadcast_to(np.asarray(e,dtype=float),(Nx,)) for e in bad]).T
+    return {'solow' : {'x' : x},
+            'bad'   : {'x' : np.array([np.zeros(Nx),np.zeros(Nx),np.full(Nx,np.inf)]),
+                       'eigenvalues' : eig.astype(complex)}}
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+ENSEMBLE RUNNER ON SEVERAL CORES
+
+The Nx columns (initial conditions and parameter sets) of uncoupled models
+are independent : they are split in contiguous shards, each integrated by
+Miscfunc.TemporalLoop in its own process. In the 'full' storage mode the
+shards write directly in one shared output (shared memory, or the
+memory-mapped file when parNum['Output']='memmap'), so the result is one
+Y_s, identical to the serial run for the fixed-step 'rk4' method.
+With adaptive methods each shard chooses its own timesteps.
+
+Models coupling the columns through the operators (SYS.coupled) are refused.
+"""
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import Miscfunc   as M
+import Parameters as Par
+import Storage    as S
+
+
+def ParallelTemporalLoop(y,SYS,op,pN,p,info=None,Nworkers=None,Nshards=None):
+    '''
+    Same inputs and outputs as Miscfunc.TemporalLoop, the columns being
+    integrated in Nworkers processes (default : all cores), split in Nshards
+    (default : Nworkers) shards.
+    info receives the diagnostics of each shard in info['shards'], and the
+    ones of the serial run reassembled on the columns : backend, events,
+    Tend (every column terminated), compaction and the running statistics
+    of the 'stats' mode.
+    '''
+    if info is None : info = {}
+    if getattr(SYS,'coupled',False) :
+        raise ValueError(type(SYS).__name__+' couples the columns : it cannot be split in shards, use TemporalLoop')
+    Nworkers = Nworkers or os.cpu_count()
+    Nshards  = min(Nshards or Nworkers, pN['Nx'])
+    bounds   = np.linspace(0,pN['Nx'],Nshards+1).astype(int)
+    full     = pN.get('StorageMode','full')=='full'
+    output   = pN.get('Output','memory')
+    shape    = (SYS.Nvar,pN['Ns'],pN['Nx'])
+
+    #I#### ONE OUTPUT FOR ALL SHARDS
+    shm = None
+    if full and output=='memmap' :
+        os.makedirs(pN['OutputPath'],exist_ok=True)
+        target = ('memmap',os.path.join(pN['OutputPath'],'Y_s.npy'))
+        np.lib.format.open_memmap(target[1],mode='w+',dtype=y.dtype,shape=shape).flush()
+    elif full and output=='memory' :
+        shm    = shared_memory.SharedMemory(create=True,size=int(np.prod(shape))*y.itemsize)
+        target = ('shared',shm.name,shape)
+    elif full :
+        raise ValueError("ParallelTemporalLoop supports Output='memory' or 'memmap'")
+    else :
+        target = None                                # 'last','stats' : small outputs
+
+    #II### INTEGRATION OF THE SHARDS
+    try :
+        with ProcessPoolExecutor(max_workers=Nworkers) as pool :
+            futures = [pool.submit(_runShard,SYS,y[:,c0:c1].copy(),pN,
+                                   Par.sliceParams(p,slice(c0,c1),pN['Nx']),c0,c1,target)
+                       for c0,c1 in zip(bounds[:-1],bounds[1:])]
+            shards  = [fut.result() for fut in futures]
+
+        #III## REASSEMBLY
+        t_s = shards[0][1]
+        y[...] = np.concatenate([sh[2] for sh in shards],axis=1)
+        if target is None :
+            Y_s = np.concatenate([sh[0] for sh in shards],axis=2)
+        elif target[0]=='shared' :
+            Y_s = np.ndarray(shape,dtype=y.dtype,buffer=shm.buf)[:,:len(t_s),:].copy()
+        else :
+            np.save(os.path.join(pN['OutputPath'],'t_s.npy'),t_s)
+            Y_s,t_s = S.loadTrajectory(pN['OutputPath'])
+            Y_s     = Y_s[:,:len(t_s),:]
+    finally :
+        if shm is not None :
+            shm.close()
+            shm.unlink()
+
+    info['shards'] = [sh[3] for sh in shards]
+    info.update(_mergeInfo(info['shards'],np.diff(bounds)))
+    return Y_s, t_s
+
+
+def _runShard(SYS,y,pN,p,c0,c1,target):
+    '''Integration of the columns c0:c1, run in a worker process'''
+    pN       = dict(pN)
+    pN['Nx'] = c1-c0
+    info,store,shm = {},None,None
+    if target is not None and target[0]=='shared' :
+        shm   = shared_memory.SharedMemory(name=target[1])
+        store = S.ColumnStore(np.ndarray(target[2],dtype=y.dtype,buffer=shm.buf),c0,c1)
+    elif target is not None :
+        store = S.ColumnStore(np.load(target[1],mmap_mode='r+'),c0,c1)
+
+    Y_s,t_s = M.TemporalLoop(y,SYS,{},pN,p,info,store=store)
+    if target is not None :
+        if target[0]=='memmap' : store.Y_s.flush()
+        del Y_s,store
+        Y_s = None
+    if shm is not None : shm.close()
+    return Y_s, t_s, y, info
+
+
+def _mergeInfo(infos,sizes):
+    '''Diagnostics of the serial run from the ones of the shards (of sizes columns)'''
+    merged = {}
+    if all('backend' in i for i in infos) and len({i['backend'] for i in infos})==1 :
+        merged['backend'] = infos[0]['backend']
+    if 'events' in infos[0] :
+        ev = [i['events'] for i in infos]
+        merged['events'] = {'names' : ev[0]['names']}
+        for k in ('time','code','type','alive') : merged['events'][k] = np.concatenate([e[k] for e in ev])
+    if all('Tend' in i for i in infos) :             # the last column terminated
+        merged['Tend'] = max(i['Tend'] for i in infos)
+    if 'compaction' in infos[0] :
+        merged['compaction'] = _mergeCompaction([i['compaction'] for i in infos],sizes)
+    if 'stats' in infos[0] :
+        merged['stats'] = _mergeStats([i['stats'] for i in infos])
+    return merged
+
+def _mergeCompaction(comp,sizes):
+    '''Active fraction of all the columns at each compaction of any shard'''
+    t    = np.unique(np.concatenate([c['t'] for c in comp]))
+    nact = sum(np.rint(n*c['active_fraction'][np.searchsorted(c['t'],t,side='right')-1]) for c,n in zip(comp,sizes))
+    keep = np.concatenate(([True],np.diff(nact)!=0))
+    return {'t'               : t[keep],
+            'active_fraction' : nact[keep]/np.sum(sizes),
+            'converged_time'  : np.concatenate([c['converged_time'] for c in comp])}
+
+def _mergeStats(stats):
+    '''Concatenate on the columns the running statistics of each shard'''
+    merged = {'Nsamples' : stats[0]['Nsamples']}
+    for name,st in stats[0].items():
+        if name=='Nsamples' : continue
+        merged[name] = {k : np.concatenate([s[name][k] for s in stats]) for k in st}
+    return merged
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+EVENTS : TERMINATION OF DIVERGING COLUMNS
+
+parNum['Events'] is a list of threshold crossings, for instance
+    {'name':'debt crisis', 'var':'d', 'threshold':50, 'direction':+1}
+meaning "d goes above 50" (direction -1 : goes below). 'var' is any
+variable of the system or of its intermediaryfuncs. A column producing
+NaN/inf is always terminated, with the event 'nonfinite'. With adaptive
+methods, a column forcing the timestep below parNum['dtmin'] is terminated
+with the event 'stalled'.
+
+When an event happens, its time is localized inside the step (linear
+interpolation of the crossing) and the column is frozen : it keeps its
+state until the end of the run. When every column is frozen the
+integration stops. The results are in info['events'].
+Parameters.CrisisEvents gives the usual Goodwin-Keen crises.
+"""
+import numpy as np
+import Observers as Obs
+
+
+class EventMonitor():
+    '''Follows the events of parNum['Events'] on every column'''
+    def __init__(self,SYS,p,events,y):
+        self.SYS,self.p = SYS,p
+        self.events = events
+        self.names  = ['nonfinite','stalled']+[e['name'] for e in events]
+        Nx          = y.shape[1]
+        self.alive  = np.ones(Nx,dtype=bool)
+        self.time   = np.full(Nx,np.nan)
+        self.code   = np.full(Nx,-1)
+        self.frozen = np.array(y,dtype=float)
+        self.all    = np.arange(Nx)
+        self.g0     = self.g(y)
+
+    def g(self,y,p=None):
+        '''Event functions, an event happens when one goes from <0 to >=0'''
+        s = Obs.Sample(self.SYS,self.p if p is None else p,y)
+        with np.errstate(all='ignore'):
+            return [ e.get('direction',1)*(s[e['var']]-e['threshold']) for e in self.events ]
+
+    def check(self,t0,y0,t1,y1,cols=None,p=None):
+        '''
+        Called after each step from (t0,y0) to (t1,y1) : records the events,
+        freezes the terminated columns in y1 (in-place).
+        y0,y1 may hold only the columns cols (indices), of parameters p.
+        Returns False when all the columns are terminated
+        '''
+        idx   = self.all if cols is None else cols
+        alive = self.alive[idx]
+        g1    = self.g(y1,p)
+        bad   = alive & ~np.isfinite(y1).all(axis=0)
+        self.time[idx[bad]] = t1
+        self.code[idx[bad]] = 0
+        self.frozen[:,idx[bad]] = y0[:,bad]
+        new   = bad.copy()
+        for k,gb in enumerate(g1):
+            ga  = self.g0[k][idx]
+            hit = alive & ~new & (ga<0) & (gb>=0)
+            if hit.any():
+                self.time[idx[hit]] = t0 + ga[hit]/(ga[hit]-gb[hit])*(t1-t0)
+                self.code[idx[hit]] = k+2
+                self.frozen[:,idx[hit]] = y1[:,hit]
+                new |= hit
+            self.g0[k][idx] = gb
+        self.alive[idx[new]] = False
+        dead = ~self.alive[idx]
+        if dead.any() : y1[:,dead] = self.frozen[:,idx[dead]]
+        return self.alive.any()
+
+    def terminate(self,cols,t,y,name):
+        '''Terminates the columns cols (boolean mask) at time t, frozen at state y'''
+        cols = cols & self.alive
+        self.time[cols] = t
+        self.code[cols] = self.names.index(name)
+        self.frozen[:,cols] = y[:,cols]
+        self.alive &= ~cols
+
+    def result(self):
+        return {'names' : self.names,
+                'time'  : self.time,
+                'code'  : self.code,
+                'type'  : np.array(['']+self.names,dtype=object)[self.code+1],
+                'alive' : self.alive}
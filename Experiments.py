@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+EXPERIMENT STORE
+
+Saved runs are kept in one folder, with a sqlite index to find them :
+
+    store = Exp.ExperimentStore('Experiments')
+    run   = store.save(SYS,Y_s,t_s,params,parNum,tag='k2 sweep',dtype=np.float32)
+    runs  = store.find(model='GK_Reduced',k2=20)          # runs whose k2 range contains 20
+    runs  = store.find(tag='k2 sweep',r=(0.02,0.04))     # ranges overlapping [0.02,0.04]
+    Y_s,t_s = store.load(run,variables=['lambda'],cols=slice(0,10))
+    results = store.results(run,SYS,cols=[3,7])          # expandY_simple of these columns
+
+Each run is the folder run_<id> :
+*    <variable>.npz : the (Ns,Nx) trajectory of the variable, zlib-compressed
+                      by chunks of parNum['SaveChunk'] columns, so loading a few
+                      columns of a few variables only reads and inflates those
+*    t_s.npy        : the stored times
+*    meta.pkl       : params, parNum, model name, code hash, description
+The index holds, for each run, the model, code hash, date, sizes and tag, and
+for each numerical parameter its min and max over the columns.
+The code hash is the sha1 of the python files of this folder (and of the
+generated source of declarative models) : runs of the same code share it.
+"""
+import os
+import glob
+import pickle
+import sqlite3
+import contextlib
+import hashlib
+import shutil
+from datetime import datetime
+import numpy as np
+import Parameters as Par
+
+CODEFOLDER = os.path.dirname(os.path.abspath(__file__))
+
+
+def codeHash(SYS=None):
+    '''sha1 of the python files of the code (and of the source of SYS if generated)'''
+    h = hashlib.sha1()
+    for fi in sorted(glob.glob(os.path.join(CODEFOLDER,'*.py'))) :
+        h.update(os.path.basename(fi).encode())
+        with open(fi,'rb') as f : h.update(f.read())
+    for src in getattr(SYS,'source',{}).values() : h.update(src.encode())
+    return h.hexdigest()[:16]
+
+def columnChunks(cols,Nx,chunk):
+    '''{chunk index : (columns of the chunk to read, position in the result)} for cols'''
+    cols = np.arange(Nx)[cols if cols is not None else slice(None)]
+    cols = np.atleast_1d(cols)
+    out  = {}
+    for pos,(c,j) in enumerate(zip(cols//chunk,cols%chunk)) :
+        out.setdefault(int(c),([],[]))
+        out[int(c)][0].append(j)
+        out[int(c)][1].append(pos)
+    return out,len(cols)
+
+
+class ExperimentStore():
+    '''Folder of saved runs with its sqlite index, see the module doc'''
+    def __init__(self,root):
+        self.root = root
+        os.makedirs(root,exist_ok=True)
+        with self._connect() as db :
+            db.execute('''CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                          model TEXT, codehash TEXT, date TEXT, tag TEXT,
+                          Nvar INTEGER, Ns INTEGER, Nx INTEGER, Tmax REAL, dtype TEXT, chunk INTEGER)''')
+            db.execute('''CREATE TABLE IF NOT EXISTS params (run INTEGER, name TEXT, vmin REAL, vmax REAL)''')
+            db.execute('CREATE INDEX IF NOT EXISTS params_name ON params (name,vmin,vmax)')
+            db.execute('CREATE INDEX IF NOT EXISTS runs_model ON runs (model,tag)')
+
+    @contextlib.contextmanager
+    def _connect(self):
+        '''Connection to the index : committed (rolled back on error) then closed'''
+        db = sqlite3.connect(os.path.join(self.root,'index.sqlite'))
+        try :
+            with db : yield db
+        finally :
+            db.close()
+
+    def folder(self,run):
+        return os.path.join(self.root,'run_%06d' % run)
+
+    ### WRITING
+    def save(self,SYS,Y_s,t_s,p,pN,tag='',dtype=None,chunk=None):
+        '''
+        Save the trajectory (Y_s,t_s) of SYS run with p and pN. dtype
+        (default pN['SaveDtype'], else the one of Y_s) can be np.float32 to
+        halve the size. Returns the id of the run
+        '''
+        Nvar,Ns,Nx = Y_s.shape
+        dtype = np.dtype(dtype or pN.get('SaveDtype') or Y_s.dtype)
+        chunk = int(chunk or pN.get('SaveChunk',1024))
+        model = type(SYS).__name__ if not hasattr(SYS,'spec') else SYS.name
+        h     = codeHash(SYS)
+        with self._connect() as db :
+            run = db.execute('INSERT INTO runs (model,codehash,date,tag,Nvar,Ns,Nx,Tmax,dtype,chunk) VALUES (?,?,?,?,?,?,?,?,?,?)',
+                             (model,h,datetime.now().isoformat(timespec='seconds'),tag,
+                              Nvar,Ns,Nx,float(t_s[-1]-t_s[0]),dtype.name,chunk)).lastrowid
+            fold = self.folder(run)
+            try :
+                os.makedirs(fold)
+                for i,name in enumerate(SYS.variables) :
+                    np.savez_compressed(os.path.join(fold,name+'.npz'),
+                        **{'c%d' % c : np.asarray(Y_s[i,:,c*chunk:(c+1)*chunk],dtype=dtype)
+                           for c in range(-(-Nx//chunk))})
+                np.save(os.path.join(fold,'t_s.npy'),np.asarray(t_s))
+                with open(os.path.join(fold,'meta.pkl'),'wb') as f :
+                    pickle.dump({'model'     : model,  'codehash' : h,
+                                 'variables' : list(SYS.variables),
+                                 'description' : getattr(SYS,'description',''),
+                                 'params'    : p,      'parNum'   : pN,
+                                 'tag'       : tag},f,protocol=5)
+                db.executemany('INSERT INTO params VALUES (?,?,?,?)',
+                               [(run,name)+r for name,r in numericalRanges(p).items()])
+            except BaseException :
+                db.rollback()
+                shutil.rmtree(fold,ignore_errors=True)
+                raise
+        return run
+
+    def delete(self,run):
+        '''Remove a run and its index entries'''
+        with self._connect() as db :
+            db.execute('DELETE FROM runs WHERE id=?',(run,))
+            db.execute('DELETE FROM params WHERE run=?',(run,))
+        shutil.rmtree(self.folder(run),ignore_errors=True)
+
+    ### LOOKUP
+    def find(self,model=None,tag=None,codehash=None,**params):
+        '''
+        Ids of the runs matching every criterion. A parameter value v selects
+        the runs where min<=v<=max over the columns, a tuple (lo,hi) the runs
+        whose range overlaps [lo,hi]
+        '''
+        query,args = 'SELECT id FROM runs WHERE 1',[]
+        for col,val in (('model',model),('tag',tag),('codehash',codehash)) :
+            if val is not None :
+                query += ' AND %s=?' % col
+                args.append(val)
+        for name,val in params.items() :
+            lo,hi = val if isinstance(val,tuple) else (val,val)
+            query += ' AND id IN (SELECT run FROM params WHERE name=? AND vmin<=? AND vmax>=?)'
+            args  += [name,float(hi),float(lo)]
+        with self._connect() as db :
+            return [r[0] for r in db.execute(query+' ORDER BY id',args)]
+
+    def info(self,run):
+        '''Index entry of a run, as a dictionnary'''
+        with self._connect() as db :
+            cur = db.execute('SELECT * FROM runs WHERE id=?',(run,))
+            row = cur.fetchone()
+            if row is None : raise KeyError('No run '+str(run)+' in '+self.root)
+            return dict(zip([c[0] for c in cur.description],row))
+
+    ### READING
+    def meta(self,run):
+        '''Metadata of a run : params, parNum, model, codehash, variables...'''
+        with open(os.path.join(self.folder(run),'meta.pkl'),'rb') as f :
+            return pickle.load(f)
+
+    def load(self,run,variables=None,cols=None):
+        '''
+        Y_s (len(variables),Ns,Ncols) and t_s of a run ; variables default to
+        all of them, cols (slice, indices or boolean mask) to every column.
+        Only the chunks holding these columns are read
+        '''
+        inf   = self.info(run)
+        fold  = self.folder(run)
+        if variables is None : variables = self.meta(run)['variables']
+        chunks,Nc = columnChunks(cols,inf['Nx'],inf['chunk'])
+        Y_s   = np.empty((len(variables),inf['Ns'],Nc),dtype=inf['dtype'])
+        for i,name in enumerate(variables) :
+            with np.load(os.path.join(fold,name+'.npz')) as z :
+                for c,(j,pos) in chunks.items() : Y_s[i][:,pos] = z['c%d' % c][:,j]
+        return Y_s, np.load(os.path.join(fold,'t_s.npy'))
+
+    def results(self,run,SYS,cols=None,op=None):
+        '''SYS.expandY_simple of the columns cols of a run, with their parameters'''
+        m = self.meta(run)
+        Y_s,t_s = self.load(run,SYS.variables,cols)
+        p = m['params'] if cols is None else Par.sliceParams(m['params'],np.arange(m['parNum']['Nx'])[cols],m['parNum']['Nx'])
+        return SYS.expandY_simple(Y_s,t_s,op,p)
+
+
+def numericalRanges(p):
+    '''{name : (min,max)} of the numerical parameters (scalars or per-column arrays)'''
+    out = {}
+    for name,v in p.items() :
+        try : a = np.asarray(v,dtype=float)
+        except (TypeError,ValueError) : continue
+        if a.size and np.isfinite(a).any() : out[name] = (float(np.nanmin(a)),float(np.nanmax(a)))
+    return out
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+ADAPTIVE-STEP AND IMPLICIT-EXPLICIT INTEGRATORS
+
+Embedded Runge-Kutta pairs with per-step error control, used by
+Miscfunc.TemporalLoop when parNum['method'] is not 'rk4'.
+The whole ensemble (the Nx columns) shares the same timestep : the error of
+a step is the worst error among the columns that are still finite.
+The trajectory is written on the regular storage grid t_s through a cubic
+Hermite dense output, so quiet phases use large steps and crises small ones.
+
+The 'imex' method (fixed dt) splits coupled models (Strang splitting,
+second order) : the stiff linear part given by SYS.implicitPart (typically
+the diffusion on the laplacian) is solved implicitly over a half step with
+a sparse LU factorized once, before and after the explicit rk4 step of the
+rest of the dynamics.
+"""
+import warnings
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu
+
+###############################################################################
+### BUTCHER TABLEAUX ##########################################################
+###############################################################################
+TABLEAUX = {
+    'dopri5' : {   # Dormand-Prince 5(4), first same as last
+        'c' : [0, 1/5, 3/10, 4/5, 8/9, 1, 1],
+        'a' : [[],
+               [1/5],
+               [3/40       ,  9/40],
+               [44/45      , -56/15      , 32/9],
+               [19372/6561 , -25360/2187 , 64448/6561 , -212/729],
+               [9017/3168  , -355/33     , 46732/5247 ,  49/176  , -5103/18656],
+               [35/384     ,  0          , 500/1113   ,  125/192 , -2187/6784  , 11/84]],
+        'b' : [35/384     , 0, 500/1113  , 125/192, -2187/6784    , 11/84   , 0   ],
+        'bh': [5179/57600 , 0, 7571/16695, 393/640, -92097/339200 , 187/2100, 1/40],
+        'fsal' : True,
+        },
+    'cashkarp' : { # Cash-Karp 5(4)
+        'c' : [0, 1/5, 3/10, 3/5, 1, 7/8],
+        'a' : [[],
+               [1/5],
+               [3/40       , 9/40],
+               [3/10       , -9/10  , 6/5],
+               [-11/54     , 5/2    , -70/27   , 35/27],
+               [1631/55296 , 175/512, 575/13824, 44275/110592, 253/4096]],
+        'b' : [37/378     , 0, 250/621    , 125/594    , 0        , 512/1771],
+        'bh': [2825/27648 , 0, 18575/48384, 13525/55296, 277/14336, 1/4     ],
+        'fsal' : False,
+        },
+    }
+
+
+###############################################################################
+### ONE STEP ##################################################################
+###############################################################################
+def embeddedStep(f,y,k1,h,op,p,tab):
+    '''
+    One step of size h of an embedded pair. f returns the derivative
+    (p['dt']=1), k1 is f(y).
+    Returns the new state, the local error estimate and the stages
+    '''
+    k = [k1]
+    for s in range(1,len(tab['c'])):
+        ys = y.copy()
+        for j,a in enumerate(tab['a'][s]):
+            if a != 0 : ys += (h*a)*k[j]
+        k.append(f(ys,op,p))
+    ynew = y.copy()
+    err  = np.zeros_like(y)
+    for j,(b,bh) in enumerate(zip(tab['b'],tab['bh'])):
+        if b    != 0 : ynew += (h*b)*k[j]
+        if b-bh != 0 : err  += (h*(b-bh))*k[j]
+    return ynew,err,k
+
+def errorNorm(err,y,ynew,pN):
+    '''Scaled RMS error of each column'''
+    sc   = pN.get('atol',1e-9) + pN.get('rtol',1e-6)*np.maximum(np.abs(y),np.abs(ynew))
+    return np.sqrt(np.mean((err/sc)**2,axis=0))
+
+def worstError(ecol,alive=True):
+    '''Worst error among the finite columns still alive'''
+    ecol = ecol[np.isfinite(ecol) & alive]
+    return ecol.max() if len(ecol) else 0.
+
+def hermite(theta,h,y0,f0,y1,f1):
+    '''Cubic Hermite interpolation inside a step, theta in [0,1]'''
+    return ( (1+2*theta)*(1-theta)**2 * y0 + theta*(1-theta)**2 * h*f0 +
+             theta**2*(3-2*theta)     * y1 + theta**2*(theta-1)  * h*f1 )
+
+
+###############################################################################
+### TEMPORAL LOOP #############################################################
+###############################################################################
+def AdaptiveLoop(f,y,op,pN,p,t_s,store,info,events=None):
+    '''
+    Integrate y from t_s[0] to t_s[-1] with the method pN['method'], writing
+    the state at each time of t_s in the store (t_s[0] is already written).
+    f is the derivative (p['dt']=1).
+    Numerical parameters read in pN (with defaults) :
+    *    rtol, atol : relative and absolute tolerance
+    *    dt         : first trial step
+    *    dtmax      : largest step allowed
+    *    dtmin      : below it the integration stops with a RuntimeWarning,
+                      the rest is stored as NaN and info['Tend'] is the
+                      time reached
+    info receives the step-size history and counters.
+    events (optional EventMonitor) freezes the terminated columns, which
+    are then left out of the error control. With events, reaching dtmin
+    terminates the columns that prevent the step ('stalled') instead of
+    stopping the whole run
+    '''
+    tab    = TABLEAUX[pN['method']]
+    dtmax  = pN.get('dtmax',np.inf)
+    dtmin  = pN.get('dtmin',1e-12*t_s[-1])
+    safety,facmin,facmax = 0.9, 0.2, 5.
+
+    t    = t_s[0]
+    h    = min(pN['dt'],dtmax)
+    f0   = f(y,op,p)
+    nfev = 1
+    k          = 1                                  # next storage index
+    hist_t,hist_h,nrej = [],[],0
+
+    while k < len(t_s):
+        last = t_s[-1]-t <= h
+        if last : h = t_s[-1]-t
+        ynew,err,stages = embeddedStep(f,y,f0,h,op,p,tab)
+        nfev += len(stages)-1
+        ecol  = errorNorm(err,y,ynew,pN)
+        errn  = worstError(ecol,True if events is None else events.alive)
+
+        if errn > 1 :                               # rejected step
+            nrej += 1
+            h    *= max(facmin,safety*errn**(-1/5))
+            if h < dtmin and events is not None :   # singular columns are stopped
+                events.terminate(~(ecol<=1),t,y,'stalled')
+                f0 = np.where(events.alive,f0,0)
+                h  = hist_h[-1] if hist_h else pN['dt']
+                if not events.alive.any() :
+                    for k in range(k,len(t_s)) : store.write(k,t_s[k],y)
+                    info['Tend'] = t
+                    break
+                continue
+            if h < dtmin :
+                warnings.warn('Step size below dtmin at t=%g : integration stopped' % t,RuntimeWarning)
+                for k in range(k,len(t_s)) : store.write(k,t_s[k],np.full_like(y,np.nan))
+                info['Tend'] = t
+                break
+            continue
+
+        f1 = stages[-1] if tab['fsal'] else f(ynew,op,p)
+        nfev += 0 if tab['fsal'] else 1
+        tnew = t_s[-1] if last else t+h
+        if events is not None :
+            running = events.check(t,y,tnew,ynew)
+            f1      = np.where(events.alive,f1,0)    # frozen columns stay still
+            if not running :                         # every column terminated
+                for k in range(k,len(t_s)) : store.write(k,t_s[k],ynew)
+                info['Tend'] = tnew
+                break
+        while k < len(t_s) and t_s[k] <= tnew :     # dense output on t_s
+            store.write(k,t_s[k],hermite(min(1,(t_s[k]-t)/h),h,y,f0,ynew,f1))
+            k += 1
+        t    = tnew
+        y,f0 = ynew,f1
+        hist_t.append(t)
+        hist_h.append(h)
+        h    = min(dtmax, h*(facmax if errn==0 else min(facmax,safety*errn**(-1/5))))
+
+    info['t_steps']   = np.array(hist_t)
+    info['dt_steps']  = np.array(hist_h)
+    info['Nrejected'] = nrej
+    info['Nfev']      = nfev
+    return y
+
+
+###############################################################################
+### IMPLICIT-EXPLICIT SPLITTING ###############################################
+###############################################################################
+def IMEXSplit(SYS,op,p):
+    '''
+    Strang splitting of one step of size p['dt'] for the 'imex' method :
+    implicit half step, explicit rk4 step, implicit half step. The model
+    gives with SYS.implicitPart(op,p) the parameters of its explicit part and
+    the stiff linear part {index of variable : A}, dy_i/dt = A @ y_i.
+    Returns the explicit parameters and the implicit half step, which
+    replaces in-place each y_i by the solution of
+    (Id - dt/4 A) y_i(t+dt/2) = (Id + dt/4 A) y_i : trapezoidal rule,
+    second order and unconditionally stable, the LU being factorized once
+    '''
+    if not hasattr(SYS,'implicitPart') :
+        raise ValueError(type(SYS).__name__+" has no implicit part, the 'imex' method cannot be used")
+    pe,lin = SYS.implicitPart(op,p)
+    lus    = {}
+    for i,A in lin.items():
+        Id     = sp.identity(A.shape[0])
+        lus[i] = splu(sp.csc_matrix(Id - p['dt']/4*A)),sp.csr_matrix(Id + p['dt']/4*A)
+
+    def implicit(y):
+        for i,(lu,B) in lus.items() : y[i] = lu.solve(B @ y[i])
+        return y
+    return pe,implicit
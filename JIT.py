@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+COMPILED BACKEND (NUMBA)
+
+With parNum['JIT']=True, Miscfunc.TemporalLoop runs the whole rk4 loop in
+one compiled function : parameters are packed in a (Npar,Nx) array (the
+dictionnaries cannot be compiled), each column is integrated in a native loop
+over the steps, and the columns are distributed over the cores (prange).
+The compilation is cached on disk (__pycache__), so only the first run of a
+model pays for it.
+
+The kernels below are plain python functions, compiled when numba is
+installed. Without numba, or for a case the kernels do not cover (model
+without kernel, imex, events, compaction, coupled models, RHS not 'fused', float32),
+TemporalLoop keeps the NumPy path ; info['backend'] tells which one ran.
+Adding a model means writing its column RHS and registering it in KERNELS.
+"""
+import numpy as np
+try :
+    import numba
+except ImportError :
+    numba = None
+
+
+###############################################################################
+### RHS OF ONE COLUMN #########################################################
+###############################################################################
+# par is the column of packParams, in the order of SYS.parameters :
+# r alpha delta1 beta nu etaP muP gammaP k0 k1 k2 phi0 phi1
+def GK_Reduced_rhs(y,par,dt,out):
+    '''GK_Reduced.f for one column, written in out'''
+    r,alpha,delta1,beta,nu = par[0],par[1],par[2],par[3],par[4]
+    etaP,muP,gammaP        = par[5],par[6],par[7]
+    k0,k1,k2,phi0,phi1     = par[8],par[9],par[10],par[11],par[12]
+    om,lamb,d = y[0],y[1],y[2]
+    pi   = 1 - om - r*d
+    i    = etaP*(om*muP-1)
+    phil = - phi0 + phi1/ (1-lamb)**2
+    kap  = k0 + k1*np.exp(k2*pi)
+    out[0] = om   * (phil-alpha-gammaP*i)*dt
+    out[1] = lamb * (kap/nu - alpha - alpha - beta )*dt
+    out[2] = (kap - pi - d*  (kap/nu - delta1 + i))*dt
+
+def GK_FULL_rhs(y,par,dt,out):
+    '''GK_FULL.f for one column, written in out'''
+    r,alpha,delta1,beta,nu = par[0],par[1],par[2],par[3],par[4]
+    etaP,muP,gammaP        = par[5],par[6],par[7]
+    k0,k1,k2,phi0,phi1     = par[8],par[9],par[10],par[11],par[12]
+    a,N,K,W,D = y[0],y[1],y[2],y[3],y[4]
+    Y    = K / nu
+    L    = K / (a * nu)
+    Pi   = Y - W*L - r*D
+    lamb = L / N
+    om   = W * L / Y
+    d    = D / Y
+    pi   = 1 - om - r*d
+    i    = etaP * (om*muP-1)
+    phil = - phi0 + phi1/ (1-lamb)**2
+    I    = Y * (k0 + k1*np.exp(k2*pi))
+    out[0] = alpha*a*dt
+    out[1] = beta*N*dt
+    out[2] = (I - K*delta1)*dt
+    out[3] = W * ( phil + gammaP * i )*dt
+    out[4] = (I - Pi)*dt
+
+
+###############################################################################
+### RK4 LOOP ##################################################################
+###############################################################################
+def makeLoop(rhs,jit=True):
+    '''
+    rk4 loop for the column RHS rhs :
+    loop(y,par,dt,Nsteps,Nskip,buf) does Nsteps steps of every column of y
+    (in-place) and writes the state every Nskip steps in buf[:,k,:], k=0,1..
+    '''
+    if jit : rhs = numba.njit(cache=True,fastmath=False)(rhs)
+    prange = numba.prange if jit else range
+
+    def loop(y,par,dt,Nsteps,Nskip,buf):
+        Nvar,Nx = y.shape
+        for j in prange(Nx):
+            yj  = y[:,j].copy()
+            ys  = np.empty(Nvar)
+            dy1,dy2,dy3,dy4 = np.empty(Nvar),np.empty(Nvar),np.empty(Nvar),np.empty(Nvar)
+            pj  = par[:,j]
+            for n in range(1,Nsteps+1):
+                rhs(yj,pj,dt,dy1)
+                for v in range(Nvar) : ys[v] = yj[v]+dy1[v]/2
+                rhs(ys,pj,dt,dy2)
+                for v in range(Nvar) : ys[v] = yj[v]+dy2[v]/2
+                rhs(ys,pj,dt,dy3)
+                for v in range(Nvar) : ys[v] = yj[v]+dy3[v]
+                rhs(ys,pj,dt,dy4)
+                for v in range(Nvar) : yj[v] += (dy1[v] + 2*dy2[v] + 2*dy3[v] + dy4[v])/6
+                if n%Nskip==0 :
+                    for v in range(Nvar) : buf[v,n//Nskip-1,j] = yj[v]
+            for v in range(Nvar) : y[v,j] = yj[v]
+
+    if jit : loop = numba.njit(parallel=True,cache=True)(loop)
+    return loop
+
+KERNELS = {'GK_Reduced' : GK_Reduced_rhs,
+           'GK_FULL'    : GK_FULL_rhs}
+_loops  = {}
+
+
+def available(SYS,pN):
+    '''True when the compiled loop can replace the NumPy one'''
+    return (numba is not None and type(SYS).__name__ in KERNELS
+            and pN.get('method','rk4')=='rk4' and pN.get('RHS','dict')=='fused'
+            and not pN.get('Events') and not pN.get('Compaction',False)
+            and not getattr(SYS,'coupled',False)
+            and np.dtype(pN.get('dtype',float))==np.float64)
+
+def getLoop(SYS,jit=True):
+    '''Compiled loop of the model (compiled once per process, cached on disk)'''
+    name = type(SYS).__name__
+    if (name,jit) not in _loops : _loops[name,jit] = makeLoop(KERNELS[name],jit)
+    return _loops[name,jit]
+
+def packParams(SYS,p,Nx):
+    '''Parameters of SYS.parameters as a (Npar,Nx) array'''
+    return np.ascontiguousarray([np.broadcast_to(np.asarray(p[k],dtype=float),(Nx,)) for k in SYS.parameters])
+
+def TemporalLoop(y,SYS,pN,p,store,Nskip,jit=True,chunk=256,t0=0):
+    '''
+    rk4 loop of Miscfunc.TemporalLoop with the compiled kernel, chunk stored
+    states at a time (t=t0 is already stored)
+    '''
+    loop  = getLoop(SYS,jit)
+    par   = packParams(SYS,p,y.shape[1])
+    Nst   = pN['Nt']//Nskip                          # states to store
+    buf   = np.empty((y.shape[0],min(chunk,max(Nst,1)),y.shape[1]))
+    k,t   = 0,t0
+    while k < Nst :
+        n = min(buf.shape[1],Nst-k)
+        loop(y,par,float(pN['dt']),n*Nskip,Nskip,buf)
+        for m in range(n) :
+            for _ in range(Nskip) : t += pN['dt']   # same time as the NumPy loop
+            store.write(k+m+1,t,buf[:,m,:])
+        k += n
+    rest = pN['Nt']-Nst*Nskip                        # steps after the last storage
+    if rest : loop(y,par,float(pN['dt']),rest,Nskip,buf)
+    return y
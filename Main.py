@@ -5,8 +5,11 @@ import ClassesGoodwin as C    # Core of models
 import Miscfunc as M          # All miscellaneous functions
 import VariableDictionnary as VarD # Useful infos on variables
 import plots as plts          # Already written plot functions
+import Ensemble as Ens        # Multi-core runs of uncoupled ensembles
+import Checkpoint as Ckp      # Restart and continuation of long runs
+import Profiling as Prof      # Timers of the run phases
 
-SYS    = C.GK_Reduced()#FULL()#GK_Reduced()  #GK_FULL#     # SYSTEM SOLVED 
+SYS    = C.GK_Reduced()#FULL()#GK_Reduced()  #GK_FULL#GEMMES()# SYSTEM SOLVED 
 
 ### WELCOME MESSAGE ################################################################################
 """
@@ -39,6 +42,8 @@ HOW TO IMPLEMENT YOUR TOY-MODEL ?
     6 Add them in intermediaryfuncs 
     7 Change the core ( self.f ) of the dynamics 
     8 Change the list of plots  
+    Or write the equations in a dictionnary and compile it (see ModelSpec) : 
+        SYS = ModelSpec.compileModel(ModelSpec.GK_REDUCED)
 
 WHAT I AM (Paul) LOOKING FOR IN FURTHER DEVELOPMENT 
 * An Extensive dynamical model 
@@ -53,34 +58,49 @@ WHAT I AM (Paul) LOOKING FOR IN FURTHER DEVELOPMENT
 parNum   = Par.parnum()                     # Value of numerical parameters 
 params   = Par.BasicParameters()            # Value of "Physical" parameters 
 params   = Par.Modifications (   params, parNum ) # Original modification you might want to do
-initCond = Par.initCond      (   params ,parNum ) # Values of the initial parameters
-op       = M.prepareOperators(           parNum ) # Spatial operators initialisation
-#params   = SYS.keepUsefulParams( params )   # Cleaning the params dictionnary to be lighter 
+prof     = Prof.Profiler(parNum['Profile'],parNum['ProfileMemory'],parNum['ProfileIntermediaries'])
+with prof :                                 # active until the end of the plots, even on an error
+    with prof.phase('init'):
+        initCond = Par.initCond      (   params ,parNum ) # Values of the initial parameters
+        op       = M.prepareOperators(           parNum ) # Spatial operators initialisation
+    #params   = SYS.keepUsefulParams( params )   # Cleaning the params dictionnary to be lighter 
 
-print(SYS.description)
-SYS.printParameters(params)
-M  .PrintNumericalparameters(parNum)
+    print(SYS.description)
+    SYS.printParameters(params)
+    M  .PrintNumericalparameters(parNum)
 
-tim=time.time();print('Start simulation...',end='')
-y        = SYS.initializeY(initCond,parNum)             ### The vector y containing all the state of a time t.
-Y_s, t_s = M.TemporalLoop(y,SYS,op,parNum,params) ### Calculation of all timesteps
-print('done ! elapsed time :', time.time()-tim,'s')        
+    tim=time.time();print('Start simulation...',end='')
+    y        = SYS.initializeY(initCond,parNum)             ### The vector y containing all the state of a time t.
+    info     = {}                                           ### Run diagnostics (step sizes...)
+    with prof.phase('integration'):
+        Y_s, t_s = M.TemporalLoop(y,SYS,op,parNum,params,info) ### Calculation of all timesteps
+    #Y_s, t_s = Ens.ParallelTemporalLoop(y,SYS,op,parNum,params,info) ### Same, columns split between cores
+    #Y_s, t_s = Ckp.Resume(parNum['Checkpoint'],SYS,op,info) ### Continue an interrupted run (parNum['Checkpoint'])
+    print('done ! elapsed time :', time.time()-tim,'s')        
+    #Y_s, t_s = Ckp.Continue(Y_s,t_s,SYS,op,parNum,params,100,info) ### Extend the run by 100 years
 
-#if p['Save'] : FG.savedata(rootfold,t,Y_s,p,op) # Save the data as a pickle file in a new folder
-### Results interpretation #########################################################################
-####################################################################################################
-"""Now that the simulation is done, we can translate its results in a more readable fashion. 
-r is the expansion of Y_s into all the relevant variables we are looking for, stored as a dictionnary.
-Then, the other parts are simply plots of the result"""
-results = SYS.expandY_simple(Y_s,t_s,op,params)  # Result dictionnary 
-results = M.getperiods(results,parNum,op)      # Period measurements 
+    if parNum['Save'] : M.savedata(parNum['Save'],SYS,Y_s,t_s,params,parNum) # Save the run in the experiment store (see Experiments)
+    ### Results interpretation #########################################################################
+    ####################################################################################################
+    """Now that the simulation is done, we can translate its results in a more readable fashion. 
+    r is the expansion of Y_s into all the relevant variables we are looking for, stored as a dictionnary.
+    Then, the other parts are simply plots of the result"""
+    with prof.phase('expansion'):
+        results = SYS.expandY_simple(Y_s,t_s,op,params)  # Result dictionnary 
+    results.update(info)                             # Diagnostics of the temporal loop
+    with prof.phase('periods'):
+        results = M.getperiods(results,parNum,op)      # Period measurements 
 
-UsefulVarDic,OrganisedVar = VarD.VariableDictionnary(results)
- 
+    UsefulVarDic,OrganisedVar = VarD.VariableDictionnary(results)
 
-### PLOTS ##########################################################################################
-#################################################################################################### 
-#SYS.plotlitst_simple(results,parNum)
-plts.AllUsefulVariablesSeparate(results,UsefulVarDic)
-#plts.OrganisedVar(results,UsefulVarDic, OrganisedVar)
 
+    ### PLOTS ##########################################################################################
+    #################################################################################################### 
+    #SYS.plotlitst_simple(results,parNum)
+    with prof.phase('plots'):
+        plts.AllUsefulVariablesSeparate(results,UsefulVarDic)
+    #plts.OrganisedVar(results,UsefulVarDic, OrganisedVar)
+
+
+results['profile'] = prof.report()               # Timers and counters of the run (see Profiling)
+if parNum['Profile'] : print(prof.summary())
@@ -1,74 +1,371 @@
 # -*- coding: utf-8 -*-
 import numpy as np
-from scipy.sparse import diags
-import shutil
-from datetime import datetime
-import os
+from scipy.sparse import coo_matrix
+from scipy.sparse.linalg import LinearOperator
+import Integrators as I
+import Storage as S
+import Observers as Obs
+import Events as E
+import Parameters as P
+import Network as Net
+import JIT as J
+import Checkpoint as Ckp
+import Experiments as Exp
+import Profiling as Prof
 
 ###############################################################################
 ### SYSTEM INITIALISATION ###############################################
 ###############################################################################
 def prepareOperators(p):
     """
-    Creation of few spatial operators :
+    Creation of few spatial operators on a periodic ring of p['Nx'] sites,
+    as CSR sparse matrices (O(Nx) memory and product). With 1 or 2 sites,
+    both neighbours of a site are the same site :
     *    3diag is a local meaning on both neighbors and centered value 
     *    diff_cent is a centered difference operator 
     *    laplacian is a classical laplacian operator
+    *    Mean gives the mean over all the sites on each site, computed as a
+         reduction (O(Nx)) : op['Mean'](x) or op['Mean'] @ x
+    With p['Network'], the operators are the ones of this graph (see Network)
     """
+    if p.get('Network') is not None :
+        return Net.networkOperators(p['Network'],p['Nx'],p.get('OperatorCache'),p.get('Directed',False))
     operator={}
-    if p['Nx']>=3:
-        operator['3diag']    =diags([1/3*np.ones(p['Nx']-1), 1/3*np.ones(p['Nx']-1),np.ones(p['Nx'])*1/3,1/3,1/3], [1, -1, 0,p['Nx'],-p['Nx']])    
-        operator['diff_cent']=diags([0.5*np.ones(p['Nx']-1),-0.5*np.ones(p['Nx']-1),-0.5,0.5]                 , [1, -1   ,p['Nx'],-p['Nx']])
-        operator['laplacian']=diags([1*np.ones(p['Nx']-1), -1*np.ones(p['Nx']-1),-2*np.ones(p['Nx'])*1/3,1,1], [1, -1, 0,p['Nx'],-p['Nx']])
-        operator['Mean']  = np.ones((p['Nx'],p['Nx']))/(p['Nx'])
+    Nx = p['Nx']
+    operator['3diag']    =ringOperator(Nx,{-1:1/3 ,0: 1/3,1:1/3})
+    operator['diff_cent']=ringOperator(Nx,{-1:-0.5       ,1:0.5})
+    operator['laplacian']=ringOperator(Nx,{-1:1   ,0:-2  ,1:1  })
+    operator['Mean']  = MeanOperator(Nx)
     return operator
 
+def ringOperator(Nx,stencil):
+    '''CSR matrix of a stencil {offset : coefficient} with periodic boundaries (coefficients of a same site summed)'''
+    rows = np.tile(np.arange(Nx),len(stencil))
+    cols = np.concatenate([(np.arange(Nx)+k)%Nx for k in stencil])
+    vals = np.repeat(np.array(list(stencil.values()),dtype=float),Nx)
+    A    = coo_matrix((vals,(rows,cols)),shape=(Nx,Nx)).tocsr()
+    A.eliminate_zeros()
+    A.sort_indices()
+    return A
+
+class MeanOperator(LinearOperator):
+    '''Mean over the sites broadcast on every site, without the dense Nx*Nx matrix'''
+    def __init__(self,Nx):
+        LinearOperator.__init__(self,dtype=float,shape=(Nx,Nx))
+
+    def _matvec(self,x):
+        return np.full(x.shape,np.mean(x,axis=0))
+
+    def _matmat(self,X):
+        return np.broadcast_to(np.mean(X,axis=0),X.shape).copy()
+
+    def _adjoint(self):
+        return self
+
+    def __call__(self,x):
+        return np.mean(x,axis=-1,keepdims=True)*np.ones_like(x)
+
 
 ###############################################################################
 ### NUMERICAL CORE ############################################################
 ###############################################################################
-def rk4(f,y,op,p):
+def rk4(f,y,op,p,buf=None):
     """
     a traditional RK4 scheme, with y the vector values, and p the parameter dictionnary
     dt is contained within p
+    With buf (see rk4Buffers), f must accept an out buffer (fused RHS) : the
+    stages are written in buf and nothing is allocated ; the increment
+    returned is then buf[0], overwritten at the next step. Same operations
+    in the same order, so the result is bit-identical
     """
-    dy1 =  f(y       ,op,p  )
-    dy2 =  f(y+dy1/2 ,op,p  )
-    dy3 =  f(y+dy2/2 ,op,p  )
-    dy4 =  f(y+dy3   ,op,p  )
-    return (dy1 + 2*dy2 + 2*dy3 + dy4)/6 
-
-def TemporalLoop(y,SYS,op,pN,p):
-    Y_s = np.zeros((SYS.Nvar,pN['Ns'],pN['Nx']))     # stock dynamics
-    Y_s[:,0,:]= 1*y                                 # first stock
-    t_s       = np.zeros(pN['Ns'])                   # stock time
+    if buf is None :
+        dy1 =  f(y       ,op,p  )
+        dy2 =  f(y+dy1/2 ,op,p  )
+        dy3 =  f(y+dy2/2 ,op,p  )
+        dy4 =  f(y+dy3   ,op,p  )
+        return (dy1 + 2*dy2 + 2*dy3 + dy4)/6 
+
+    dy1,dy2,dy3,dy4,ys = buf
+    f(y,op,p,out=dy1)
+    np.divide(dy1,2,out=ys) ; ys += y
+    f(ys,op,p,out=dy2)
+    np.divide(dy2,2,out=ys) ; ys += y
+    f(ys,op,p,out=dy3)
+    np.add(y,dy3,out=ys)
+    f(ys,op,p,out=dy4)
+    dy2 *= 2 ; dy3 *= 2
+    dy1 += dy2 ; dy1 += dy3 ; dy1 += dy4
+    dy1 /= 6
+    return dy1
+
+def rk4Buffers(SYS,pN,y):
+    """Stage buffers of rk4 for the shape of y, None when the RHS has no out buffer"""
+    if pN.get('RHS','dict')=='fused' and hasattr(SYS,'fusedRHS') :
+        return tuple(np.empty_like(y) for _ in range(5))
+    return None
+
+def getRHS(SYS,pN,p):
+    '''
+    Choose the right-hand side used by the integrator, pN['RHS'] :
+    *    'dict'  : SYS.f, readable version working on dictionnaries
+    *    'fused' : SYS.fusedRHS(p), in-place version with precomputed parameters,
+                   bit-identical to 'dict' (only if the model provides it)
+    p['dt'] must already be set. Counted and timed when a profiler is active
+    '''
+    f = SYS.fusedRHS(p) if pN.get('RHS','dict')=='fused' and hasattr(SYS,'fusedRHS') else SYS.f
+    return Prof.ACTIVE.counted(f) if Prof.ACTIVE is not None else f
+
+def TemporalLoop(y,SYS,op,pN,p,info=None,store=None,observers=None,t0=0):
+    '''
+    Calculation of all timesteps. pN['method'] chooses the integrator :
+    *    'rk4'               : fixed timestep pN['dt']
+    *    'dopri5','cashkarp' : adaptive timestep (see Integrators)
+    *    'imex'              : fixed timestep, the stiff linear part of coupled
+                               models being implicit (see Integrators.IMEXSplit)
+    The state is stored at t=t0 then every pN['Tstore'], in the way chosen by
+    pN['StorageMode'] (see Storage).
+    info (optional dictionnary) receives the run diagnostics,
+    store (optional) replaces the store of pN['StorageMode'],
+    observers (optional list, see Observers) are updated with every stored
+    state, their results go in info['observers']
+    pN['Events'] (optional, see Events) terminates and freezes the columns
+    that cross a threshold or diverge, reported in info['events']
+    pN['Compaction'] (rk4 only) integrates only the active columns, see CompactedLoop
+    pN['JIT'] (rk4 only) runs the compiled loop of JIT when numba is there,
+    info['backend'] tells which loop ran
+    pN['Checkpoint'] (rk4 and imex, not with JIT or Compaction) saves the loop
+    state, see FixedStepLoop
+    The state keeps the precision of y (pN['dtype'] in initializeY) : the
+    parameters are cast to it
+    When a profiler is active (see Profiling), the RHS and the store writes
+    are timed and counted
+    '''
+    if info  is None : info  = {}
+    p = P.castParams(p,y.dtype)                      # same object in float64
+    if store is None : store = S.createStore(SYS,pN,info)
+    if observers     : store = Obs.ObservedStore(store,observers,SYS,p,info)
+    prof   = Prof.ACTIVE
+    if prof is not None : prof.instrument(SYS)
+    events = E.EventMonitor(SYS,p,pN['Events'],y) if pN.get('Events') else None
+    t=t0
+    out = prof.timedStore(store) if prof is not None else store
+    out.write(0,t,y)                                 # first stock
+
+    method = pN.get('method','rk4')
+    if method not in ('rk4','imex') and method not in I.TABLEAUX :
+        raise ValueError('Unknown method : '+str(method))
+    if method in I.TABLEAUX :
+        pd       = dict(p)
+        pd['dt'] = 1                                 # f gives the derivative
+        t_grid   = t0 + np.arange(pN['Ns'])*pN['Tstore']
+        y[...]   = I.AdaptiveLoop(getRHS(SYS,pN,pd),y,op,pN,pd,t_grid,out,info,events)
+        if events : info['events'] = events.result()
+        if prof is not None : prof.count('steps',len(info['dt_steps']))
+        return store.finalize()
+
+    Nskip = storageStep(pN)
+    if pN.get('Checkpoint') is not None and (pN.get('JIT',False) or pN.get('Compaction',False)) :
+        raise ValueError('The JIT loop and the compaction cannot be checkpointed, set JIT and Compaction to False')
+    if pN.get('Checkpoint') is None :
+        if pN.get('JIT',False) and J.available(SYS,pN) :
+            info['backend'] = 'jit'
+            p['dt'] = pN['dt']
+            J.TemporalLoop(y,SYS,pN,p,out,Nskip,t0=t0)
+            if prof is not None : prof.count('steps',pN['Nt'])
+            return store.finalize()
+        if pN.get('Compaction',False) and not getattr(SYS,'coupled',False) :
+            info['backend'] = 'numpy'
+            p['dt'] = pN['dt']
+            CompactedLoop(y,SYS,op,pN,p,out,info,events,Nskip,t0=t0)
+            return store.finalize()
+    info['backend'] = 'numpy'
+    return FixedStepLoop(y,SYS,op,pN,p,store,info,events,0,t0,t0)
+
+
+def storageStep(pN):
+    '''Number of timesteps between two storages, Tstore must be a multiple of dt'''
+    Nskip = int(round(pN['Tstore']/pN['dt']))
+    if Nskip<1 or abs(Nskip*pN['dt']-pN['Tstore']) > 1e-9*pN['Tstore'] :
+        raise ValueError('Tstore must be a multiple of dt')
+    return Nskip
+
+def FixedStepLoop(y,SYS,op,pN,p,store,info,events,i0,t,tstart):
+    '''
+    rk4 (or imex) loop of TemporalLoop, from the step i0 at time t to the
+    step pN['Nt'] (the run started at tstart). Returns store.finalize().
+    The columns terminated by the events are no longer integrated (uncoupled
+    models, rk4) : the loop works on the alive columns, scattered back in y
+    when they are stored.
+    With pN['Checkpoint'] (a folder), the whole state of the loop is saved
+    there every pN['CheckpointEvery'] steps ; Checkpoint.Resume continues
+    the run from it, with the same result as an uninterrupted run
+    '''
     p['dt']=pN['dt']
-    t=0 
-    
-    for i in range(pN['Nt']+1):
-        y += rk4(SYS.f,y,op,p)                       # The vector y is dynamically updated 
+    pe,implicit = I.IMEXSplit(SYS,op,p) if pN.get('method','rk4')=='imex' else (p,None)
+    f     = getRHS(SYS,pN,pe)
+    buf   = rk4Buffers(SYS,pN,y)
+    Nskip = storageStep(pN)
+    ckpt  = pN.get('Checkpoint')
+    every = pN.get('CheckpointEvery',1000)
+    out   = Prof.ACTIVE.timedStore(store) if Prof.ACTIVE is not None else store   # store used for the writes
+    drop  = events is not None and implicit is None and not getattr(SYS,'coupled',False)
+    act,yw,pw = None,y,pe                            # alive columns (None : all) and their state
+
+    for i in range(i0+1,pN['Nt']+1):
+        if drop and act is None and not events.alive.all() :      # first terminated columns
+            act = np.nonzero(events.alive)[0]
+            yw,pw = y[:,act],P.sliceParams(pe,act,y.shape[1])
+            f,buf = getRHS(SYS,pN,pw),rk4Buffers(SYS,pN,yw)
+        if events : yprev,tprev = yw.copy(),t
+        if implicit : implicit(yw)                   # stiff part (imex), first half step
+        yw += rk4(f,yw,op,pw,buf)                    # The vector y is dynamically updated
+        if implicit : implicit(yw)                   # second half step
         t += pN['dt']
-        Y_s[:,i,:] = np.copy(y)             # we write it in the "book" Y_s
-        t_s[i]     = t*1                    # we write the time 
-    return Y_s, t_s
+        alive = events.check(tprev,yprev,t,yw,act,pw) if events else True
+        if act is not None :
+            keep = events.alive[act]
+            if not keep.all() or i%Nskip==0 or i==pN['Nt'] or (ckpt is not None and i%every==0) : y[:,act] = yw
+            if not keep.all() and alive :            # newly terminated columns leave the working state
+                act,yw = act[keep],yw[:,keep]
+                pw     = P.sliceParams(pe,act,y.shape[1])
+                f,buf  = getRHS(SYS,pN,pw),rk4Buffers(SYS,pN,yw)
+        if not alive :                               # every column terminated
+            for k in range(-(-i//Nskip),pN['Nt']//Nskip+1) : out.write(k,tstart+k*pN['Tstore'],y)
+            info['Tend'] = t
+            break
+        if i%Nskip==0 : out.write(i//Nskip,t,y)      # we write it in the "book" Y_s
+        if ckpt is not None and i%every==0 and i<pN['Nt'] :
+            Ckp.save(ckpt,SYS,{'y':y,'t':t,'i':i,'tstart':tstart,'store':store,
+                               'events':events,'info':info,'pN':pN,'p':p})
+    if events : info['events'] = events.result()
+    if Prof.ACTIVE is not None : Prof.ACTIVE.count('steps',i-i0)
+    return store.finalize()
+
+
+def CompactedLoop(y,SYS,op,pN,p,store,info,events,Nskip,t0=0):
+    '''
+    rk4 loop on the active columns only. Every pN['CompactEvery'] steps, the
+    columns that are terminated (events) or at a fixed point (relative speed
+    |dy/dt|/(|y|+atol) below pN['FixedPointTol'] for every variable) are
+    frozen and removed from the working state ; the stored states are
+    scattered back on all the columns. Uncoupled models only.
+    The other columns are bit-identical to TemporalLoop without compaction ;
+    a column frozen at a fixed point stays within about
+    FixedPointTol*|y|/mu of it, mu the decay rate of the equilibrium
+    (smallest -real part of the eigenvalues of its jacobian).
+    info['compaction'] : times and active fraction after each compaction,
+    time of convergence of each column (NaN if never)
+    '''
+    Nx    = y.shape[1]
+    every = pN.get('CompactEvery',100)
+    tol   = pN.get('FixedPointTol',1e-8)
+    atol  = pN.get('atol',1e-9)
+    act   = np.arange(Nx)                            # active columns
+    yw,pw = y.copy(),p                               # working state and parameters
+    f     = getRHS(SYS,pN,pw)
+    buf   = rk4Buffers(SYS,pN,yw)
+    tconv = np.full(Nx,np.nan)
+    hist_t,hist_a = [t0],[1.]
+    t     = t0
+
+    for i in range(1,pN['Nt']+1):
+        if events : yprev,tprev = yw.copy(),t
+        yw += rk4(f,yw,op,pw,buf)
+        t  += pN['dt']
+        alive = events.check(tprev,yprev,t,yw,act,pw) if events else True
+
+        if i%every==0 or not alive :                 # compaction
+            with np.errstate(all='ignore'):
+                speed = np.max(np.abs(f(yw,op,pw))/pN['dt']/(np.abs(yw)+atol),axis=0)
+            conv  = speed < tol
+            tconv[act[conv]] = t
+            keep  = ~conv & (events.alive[act] if events else True)
+            if not keep.all():
+                y[:,act] = yw
+                act,yw   = act[keep],yw[:,keep]
+                pw       = P.sliceParams(p,act,Nx)
+                f        = getRHS(SYS,pN,pw)
+                buf      = rk4Buffers(SYS,pN,yw)
+                hist_t.append(t)
+                hist_a.append(len(act)/Nx)
+            if len(act)==0 :                         # nothing left to integrate
+                for k in range(-(-i//Nskip),pN['Nt']//Nskip+1) : store.write(k,t0+k*pN['Tstore'],y)
+                info['Tend'] = t
+                break
+        if i%Nskip==0 :
+            y[:,act] = yw
+            store.write(i//Nskip,t,y)                # we write it in the "book" Y_s
+
+    y[:,act] = yw
+    if events : info['events'] = events.result()
+    if Prof.ACTIVE is not None : Prof.ACTIVE.count('steps',i)
+    info['compaction'] = {'t'              : np.array(hist_t),
+                          'active_fraction': np.array(hist_a),
+                          'converged_time' : tconv}
 
 
 ###############################################################################
 
-def getperiods(r,p,op):
+def getperiods(r,p,op,block=4096):
     '''
     calculate period index values (index of the local maximal position on lambda)
+    for all the columns at once, block columns at a time (lazy results are
+    only read block by block).
+    r['PeriodID'][j] : indices of the lambda peaks of column j
+    r['cycles']      : one entry per cycle (between two successive peaks),
+                       ragged arrays, cycles of column j are in
+                       offsets[j]:offsets[j+1]
+        * column, start, end : column and indices of the two peaks
+        * tmid, period       : middle time and duration
+        * growth             : mean of g over the cycle
+        * lambdapeak, deltalambda : lambda at the first peak, difference between the two peaks
+        * lambda_min, lambda_max, omega_min, omega_max, d_min, d_max
     '''
-    r['PeriodID']=[]
-    
-    for j in np.arange(p['Nx']): 
-        r['PeriodID'].append([])
-        id1=1
-        while id1<p['Nt']-2:
-            if ( r['lambda'][id1,j]>r['lambda'][id1-1,j] and 
-                 r['lambda'][id1,j]>r['lambda'][id1+1,j] ):
-                r['PeriodID'][j].append(1*id1)  
-            id1+=1    
+    t     = np.asarray(r['t'])
+    Nx    = r['lambda'].shape[1]
+    PeriodID,cycles = [],{}
+    for c0 in range(0,Nx,block):
+        c1  = min(Nx,c0+block)
+        lam = np.asarray(r['lambda'][:,c0:c1])
+        Ns  = lam.shape[0]
+
+        #I#### PEAKS : LOCAL MAXIMA IN TIME, A FLAT TOP (float32) COUNTING ONCE AT ITS START
+        slope  = np.sign(np.diff(lam,axis=0))
+        nxt    = np.where(slope!=0,np.arange(Ns-1)[:,None],Ns-2)  # next time lambda changes
+        nxt    = np.minimum.accumulate(nxt[::-1],axis=0)[::-1]
+        after  = np.take_along_axis(slope,nxt,axis=0)             # slope after the flat part
+        peak   = np.zeros(lam.shape,dtype=bool)
+        peak[1:-1] = (slope[:-1]>0) & (after[1:]<0)
+        col,idx    = np.nonzero(peak.T)               # sorted by column, then time
+        counts     = np.bincount(col,minlength=c1-c0)
+        PeriodID  += np.split(idx,np.cumsum(counts)[:-1])
+
+        #II### CYCLES : TWO SUCCESSIVE PEAKS OF THE SAME COLUMN
+        same  = col[1:]==col[:-1]
+        cc,i1,i2 = col[:-1][same], idx[:-1][same], idx[1:][same]
+        c = {'column'     : cc+c0,
+             'start'      : i1,
+             'end'        : i2,
+             'tmid'       : (t[i1]+t[i2])/2,
+             'period'     : t[i2]-t[i1],
+             'lambdapeak' : lam[i1,cc],
+             'deltalambda': lam[i1,cc]-lam[i2,cc]}
+        if 'g' in r :
+            g    = np.asarray(r['g'][:,c0:c1])
+            cumg = np.zeros(lam.shape)
+            cumg[1:] = np.cumsum(g[:-1]*np.diff(t)[:,None],axis=0)
+            c['growth'] = (cumg[i2,cc]-cumg[i1,cc])/c['period']
+        bounds = (np.stack([cc*Ns+i1,cc*Ns+i2],axis=1).ravel() if len(cc)
+                  else np.zeros(0,dtype=int))
+        for name in ('lambda','omega','d'):
+            x = np.asarray(r[name][:,c0:c1]).T.ravel()
+            c[name+'_min'] = np.minimum.reduceat(x,bounds)[::2] if len(cc) else np.zeros(0)
+            c[name+'_max'] = np.maximum.reduceat(x,bounds)[::2] if len(cc) else np.zeros(0)
+        for key,val in c.items(): cycles.setdefault(key,[]).append(val)
+
+    r['PeriodID']      = PeriodID
+    r['cycles']        = {key : np.concatenate(val) for key,val in cycles.items()}
+    r['cycles']['offsets'] = np.searchsorted(r['cycles']['column'],np.arange(Nx+1))
     return r        
             
 def sumexp(f,valini,p,pN,r):
@@ -82,20 +379,15 @@ def sumexp(f,valini,p,pN,r):
 
 ################## MISCELLANEOUS ##############################################
 ###############################################################################    
-def savedata(rootfold,t,Y_s,p,op):  
-    date = str(datetime.now()).split(' ')[0]
-    try : os.mkdir(rootfold+date)
-    except BaseException : print('Folder of the day already created')
-    Nfolder = os.listdir(rootfold+date+'/')
-    Fold    = rootfold+date+'/Expe_'+str(len(Nfolder))
-    os.mkdir(Fold)   
-    #pickle.dump(t  ,      open(Fold+'/t.p'      ,"wb"))
-    print("THIS SHOULD BE WRITTEN WITH THE RELEVANT VARIABLES AGAIN")
-    
-    codefolder = os.getcwd()
-    shutil.copyfile(codefolder+'/FunctionsGoodwin.py'     ,Fold+'/FunctionsGoodwin.py' )
-    shutil.copyfile(codefolder+'/Main.py'                 ,Fold+'/Main.py' )
-    print('data saved in :',Fold)
+def savedata(rootfold,SYS,Y_s,t_s,p,pN,tag=''):
+    '''
+    Save the run in the experiment store of the folder rootfold (see
+    Experiments), with pN['SaveDtype'] and pN['SaveChunk']. Returns its id
+    '''
+    store = Exp.ExperimentStore(rootfold)
+    run   = store.save(SYS,Y_s,t_s,p,pN,tag)
+    print('data saved in :',store.folder(run))
+    return run
 
 def PrintNumericalparameters(p):
     print("Numerical parameters ############")
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+DECLARATIVE MODELS
+
+A model can be written as a dictionnary of equations instead of a class :
+
+    spec = {'name'          : 'GK_Reduced_spec',
+            'description'   : '3 intensive variable Goodwin-Keen',
+            'variables'     : {'omega'  : 'omega*(philips - alpha - gammaP*i)',   # d/dt
+                               'lambda' : 'lambda*(kappa/nu - alpha - alpha - beta)',
+                               'd'      : 'kappa - pi - d*(kappa/nu - delta1 + i)'},
+            'intermediaries': {'pi'     : '1 - omega - r*d',
+                               'kappa'  : 'k0 + k1*exp(k2*pi)', ...},
+            }
+    SYS = ModelSpec.compileModel(spec)
+
+and SYS is used like the classes of ClassesGoodwin (f, fusedRHS,
+intermediaryfuncs, initializeY, expandY_simple...). The parameters are the
+other names of the expressions (or spec['parameters']); the functions are
+the ones of FUNCTIONS. Intermediaries can be given in any order : they are
+sorted by dependencies, and the subexpressions repeated in several
+equations (kappa/nu above) are computed once. fusedRHS is generated too :
+the parameter-only subexpressions are computed once per run and every
+operation writes in a preallocated buffer (out= of the numpy ufuncs). The
+generated python source is in SYS.source.
+"""
+import ast
+import copy
+import keyword
+import re
+import numpy as np
+import plots as plts
+import ClassesGoodwin as CG
+
+FUNCTIONS = {'exp'  : np.exp  , 'log'  : np.log  , 'sqrt' : np.sqrt,
+             'abs'  : np.abs  , 'tanh' : np.tanh , 'sign' : np.sign,
+             'min'  : np.minimum, 'max' : np.maximum, 'where': np.where}
+KEYWORDS  = [k for k in keyword.kwlist if k not in ('True','False','None')]   # renamed (lambda -> lambda_)
+UFUNCS    = {ast.Add : 'np.add', ast.Sub : 'np.subtract', ast.Mult : 'np.multiply', ast.Div : 'np.true_divide',
+             ast.Pow : 'np.power', ast.FloorDiv : 'np.floor_divide', ast.Mod : 'np.remainder',
+             ast.USub : 'np.negative', ast.UAdd : 'np.positive'}
+
+
+###############################################################################
+### PARSING ###################################################################
+###############################################################################
+def pyName(name):
+    '''Python identifier of a model name (lambda -> lambda_)'''
+    return name+'_' if name in KEYWORDS else name
+
+def parse(expr):
+    '''ast of an expression, python keywords used as names being renamed'''
+    expr = re.sub(r'\b('+'|'.join(KEYWORDS)+r')\b',lambda m : pyName(m.group(1)),expr)
+    return ast.parse(expr,mode='eval').body
+
+def modelName(name):
+    '''Inverse of pyName'''
+    return name[:-1] if name.endswith('_') and name[:-1] in KEYWORDS else name
+
+def names(tree):
+    '''Names used by an expression (functions excluded)'''
+    calls = {n.func.id for n in ast.walk(tree) if isinstance(n,ast.Call) and isinstance(n.func,ast.Name)}
+    return [n.id for n in ast.walk(tree) if isinstance(n,ast.Name) and n.id not in calls]
+
+def topologicalOrder(deps):
+    '''Order of the keys of deps {name : names it needs} such that each comes after its needs'''
+    order,state = [],{}
+    def visit(n,path):
+        if state.get(n)=='done' : return
+        if state.get(n)=='open' : raise ValueError('Circular definition : '+' -> '.join(path+[n]))
+        state[n] = 'open'
+        for m in deps[n] :
+            if m in deps : visit(m,path+[n])
+        state[n] = 'done'
+        order.append(n)
+    for n in deps : visit(n,[])
+    return order
+
+
+###############################################################################
+### COMMON SUBEXPRESSIONS #####################################################
+###############################################################################
+def eliminateCommon(statements,prefix='_c'):
+    '''
+    statements : list of (target,ast), evaluated in this order. The
+    subexpressions (operations or calls) that appear more than once are
+    computed once, in a new temporary statement placed before their first use
+    '''
+    statements = copy.deepcopy(statements)
+    counts = {}
+    for _,tree in statements :
+        for node in ast.walk(tree) :
+            if isinstance(node,(ast.BinOp,ast.UnaryOp,ast.Call)) :
+                k = ast.dump(node)
+                counts[k] = counts.get(k,0)+1
+    done,out = {},[]
+
+    class Replace(ast.NodeTransformer):
+        def generic_visit(self,node):
+            key = ast.dump(node) if isinstance(node,(ast.BinOp,ast.UnaryOp,ast.Call)) else None
+            if key in done : return ast.Name(id=done[key],ctx=ast.Load())
+            node = ast.NodeTransformer.generic_visit(self,node)
+            if key is not None and counts[key]>1 :
+                done[key] = prefix+str(len(done))
+                out.append((done[key],node))
+                return ast.Name(id=done[key],ctx=ast.Load())
+            return node
+
+    for target,tree in statements :
+        tree = Replace().visit(ast.Expression(body=tree)).body
+        out.append((target,tree))
+    return out
+
+
+###############################################################################
+### CODE GENERATION ###########################################################
+###############################################################################
+def compileModel(spec):
+    '''Model object (same interface as the classes of ClassesGoodwin) from a spec'''
+    return SpecModel(spec)
+
+class SpecModel(CG.Model):
+    '''Model generated from a declarative spec, see the module doc'''
+    def __init__(self,spec):
+        self.name        = spec.get('name','SpecModel')
+        self.description = spec.get('description',self.name)
+        self.variables   = list(spec['variables'])
+        self.Nvar        = len(self.variables)
+        self.plots       = spec.get('plots',[])
+        self.spec        = spec
+
+        #I#### PARSE AND SORT THE INTERMEDIARIES
+        derivs = {v : parse(e) for v,e in spec['variables'].items()}
+        inter  = {n : parse(e) for n,e in spec.get('intermediaries',{}).items()}
+        deps   = {n : [modelName(m) for m in names(t)] for n,t in inter.items()}
+        self.intermediaries = topologicalOrder(deps)
+        known  = set(self.variables) | set(inter)
+        used   = [modelName(n) for t in list(inter.values())+list(derivs.values()) for n in names(t)]
+        self.parameters = spec.get('parameters',list(dict.fromkeys(n for n in used if n not in known)))
+        unknown = set(used) - known - set(self.parameters)
+        if unknown : raise ValueError('Undefined names in '+self.name+' : '+', '.join(sorted(unknown)))
+
+        #II### INTERMEDIARIES NEEDED BY THE DYNAMICS
+        need = {modelName(n) for t in derivs.values() for n in names(t)}
+        for n in reversed(self.intermediaries) :
+            if n in need : need.update(deps[n])
+        stat = [(pyName(n),inter[n]) for n in self.intermediaries]
+
+        #III## GENERATED FUNCTIONS
+        dyn = eliminateCommon([s for s in stat if modelName(s[0]) in need] +
+                              [('_d'+str(k),derivs[v]) for k,v in enumerate(self.variables)])
+        self.source = {
+            'f'      : self._source('f',dyn,'np.array([' + ','.join('_d%d*dt' % k for k in range(self.Nvar)) + '])'),
+            }
+        self.source['fusedparams'],self.source['fused'],self.Nbuf = self._fusedSource(dyn)
+        for n in self.intermediaries :
+            self.source['_'+pyName(n)] = self._intermediary(n,inter[n])
+        ns = dict(FUNCTIONS,np=np)
+        exec(compile('\n\n'.join(self.source.values()),'<'+self.name+'>','exec'),ns)
+        self._f           = ns['f']
+        self._fusedparams = ns['fusedparams']
+        self._fused       = ns['fused']
+        self.intermediaryfuncs = {n : ns['_'+pyName(n)] for n in self.intermediaries}
+
+    def _source(self,fname,statements,result):
+        '''Source of fname(inputt,p) : unpack, statements (after CSE), return result'''
+        lines = ['def '+fname+'(inputt,p):']
+        lines+= ['    %s = inputt[%d]' % (pyName(v),i) for i,v in enumerate(self.variables)]
+        lines+= ["    %s = p['%s']" % (pyName(n),n) for n in self.parameters]
+        if fname=='f' : lines.append("    dt = p['dt']")
+        lines+= ['    %s = %s' % (t,ast.unparse(e)) for t,e in statements]
+        lines+= ['    return '+result]
+        return '\n'.join(lines)
+
+    def _fusedSource(self,statements):
+        '''
+        Sources of fusedparams(p), the parameters and the parameter-only
+        subexpressions, and of fused(inputt,q,out,buf), the statements of f
+        written one ufunc at a time in the rows of buf, the derivatives*dt in
+        out. Returns them with the number of rows of buf
+        '''
+        params = {pyName(n) for n in self.parameters}
+        hoist  = {}                                     # source -> name in q
+        lines  = []
+        free,nbuf = [],[0]
+        def alloc():
+            if free : return free.pop()
+            nbuf[0] += 1
+            return nbuf[0]-1
+        def constant(node):
+            return set(names(node)) <= params and all(n.func.id in FUNCTIONS for n in ast.walk(node) if isinstance(n,ast.Call))
+        def emit(node):
+            '''(python source of the value of node, row of buf holding it or None)'''
+            if isinstance(node,(ast.Name,ast.Constant)) : return ast.unparse(node),None
+            if constant(node) :
+                src = ast.unparse(node)
+                hoist.setdefault(src,'_p'+str(len(hoist)))
+                return hoist[src],None
+            if isinstance(node,ast.BinOp) and type(node.op) in UFUNCS : ufunc,args = UFUNCS[type(node.op)],[node.left,node.right]
+            elif isinstance(node,ast.UnaryOp) and type(node.op) in UFUNCS : ufunc,args = UFUNCS[type(node.op)],[node.operand]
+            elif (isinstance(node,ast.Call) and not node.keywords and isinstance(FUNCTIONS.get(node.func.id),np.ufunc)
+                  and len(node.args)==FUNCTIONS[node.func.id].nin) : ufunc,args = node.func.id,node.args
+            else :                                      # comparisons, where... : evaluated then copied
+                k = alloc()
+                lines.append('    np.copyto(buf[%d],%s)' % (k,ast.unparse(node)))
+                return 'buf[%d]' % k,k
+            args = [emit(a) for a in args]
+            free.extend(k for _,k in args if k is not None)
+            k = alloc()
+            lines.append('    %s(%s,out=buf[%d])' % (ufunc,','.join(a for a,_ in args),k))
+            return 'buf[%d]' % k,k
+
+        last = {'_d'+str(k) : np.inf for k in range(self.Nvar)}   # name -> statement of its last use
+        for j,(_,tree) in enumerate(statements) :
+            for n in names(tree) : last[n] = max(last.get(n,-1),j)
+        rows = {}                                       # statement target -> its row of buf
+        for j,(target,tree) in enumerate(statements) :
+            src,k = emit(tree)
+            lines.append('    %s = %s' % (target,src))
+            if src in rows : last[src] = max(last[src],last.get(target,-1))   # alias of an earlier target
+            if k is not None : rows[target] = k
+            free.extend(rows.pop(t) for t in list(rows) if last.get(t,-1)<=j)
+        lines+= ['    np.multiply(_d%d,dt,out=out[%d])' % (k,k) for k in range(self.Nvar)]
+        lines+= ['    return out']
+
+        body  = '\n'.join(lines)
+        used  = [n for n in [pyName(n) for n in self.parameters]+list(hoist.values()) if re.search(r'\b'+n+r'\b',body)]
+        head  = ['def fused(inputt,q,out,buf):']
+        head += ['    %s = inputt[%d]' % (pyName(v),i) for i,v in enumerate(self.variables)]
+        head += ["    %s = q['%s']" % (n,n) for n in used+['dt']]
+        setup = ['def fusedparams(p):']
+        setup+= ["    %s = p['%s']" % (pyName(n),n) for n in self.parameters]
+        setup+= ['    %s = %s' % (n,src) for src,n in hoist.items()]
+        setup+= ["    return dict(dt=p['dt']," + ','.join('%s=%s' % (n,n) for n in used) + ')']
+        return '\n'.join(setup),'\n'.join(head)+'\n'+body,max(nbuf[0],1)
+
+    def _intermediary(self,name,tree):
+        '''Source of the function (y,p) of one intermediary, as in ClassesGoodwin'''
+        lines = ['def _'+pyName(name)+'(y,p):']
+        for n in dict.fromkeys(names(tree)) :
+            src = 'p' if modelName(n) in self.parameters else 'y'
+            lines.append("    %s = %s['%s']" % (n,src,modelName(n)))
+        lines.append('    return '+ast.unparse(tree))
+        return '\n'.join(lines)
+
+    ### DYNAMICS
+    def f(self,inputt,op,p):
+        '''
+        Dynamic core of the system, makes the step for y between t and t+dt
+        '''
+        return self._f(inputt,p)
+
+    def fusedRHS(self,p):
+        '''
+        Same as f, with the parameter-only subexpressions computed once and
+        every operation done in place in preallocated buffers (see the module doc)
+        '''
+        q     = self._fusedparams(p)
+        fused = self._fused
+        tmp   = {'shape' : None}
+        def f(inputt,op,p,out=None):
+            if out is None : out = np.empty_like(inputt)
+            if tmp['shape'] != inputt.shape or tmp['dtype'] != inputt.dtype :
+                tmp['shape'],tmp['dtype'] = inputt.shape,inputt.dtype
+                tmp['buf'] = np.empty((self.Nbuf,)+inputt.shape[1:],dtype=inputt.dtype)
+            return fused(inputt,q,out,tmp['buf'])
+        return f
+
+    def plotlitst_simple(self,r,p):
+        '''Launch all plots of spec['plots'] (names of functions of plots)'''
+        for name in self.plots : getattr(plts,name)(r,p)
+
+
+###############################################################################
+### MODELS ####################################################################
+###############################################################################
+GK_REDUCED = {
+    'name'        : 'GK_Reduced_spec',
+    'description' : '3 intensive variable dynamic of simple GoodwinKeen model, declarative version of GK_Reduced',
+    'variables'   : {'omega'  : 'omega * (philips - alpha - gammaP*i)',
+                     'lambda' : 'lambda * (kappa/nu - alpha - alpha - beta)',
+                     'd'      : 'kappa - pi - d*(kappa/nu - delta1 + i)'},
+    'intermediaries' : {'pi'      : '1 - omega - r*d',
+                        'i'       : 'etaP*(omega*muP-1)',
+                        'g'       : '(1-omega)/nu - delta1',
+                        'philips' : '- phi0 + phi1/ (1-lambda)**2',
+                        'kappa'   : 'k0 + k1*exp(k2*pi)'},
+    'plots'       : ['GoodwinKeenTypical','omegalambdacycles','GraphesIntensive'],
+    }
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+COUPLING OPERATORS ON A NETWORK
+
+When parNum['Network'] is given, Miscfunc.prepareOperators builds the
+operators on this graph instead of the periodic ring : the Nx columns are
+its nodes (regions, sectors...). The graph is either
+*    an edge list, array of (i,j) or (i,j,weight) rows
+*    a scipy sparse adjacency matrix
+*    a file : .npz (scipy.sparse.save_npz adjacency) or text edge list
+The graph is undirected unless parNum['Directed'] (the edge i,j then means
+that i is influenced by j) : an edge given in both directions, as in a
+symmetric adjacency, counts once with the larger of its two weights.
+Repeated edges of the same direction are summed. Every operator is a CSR matrix, so applying it
+costs O(number of edges) :
+*    adjacency : weighted adjacency A
+*    average   : weighted mean over the neighbours, D^-1 A (an isolated node
+                 is its own average)
+*    laplacian : normalized (random walk) laplacian, average - Id, used by
+                 the coupled models like the ring laplacian
+*    Mean      : mean over all the nodes, as in prepareOperators
+The operators can be cached in parNum['OperatorCache'] (a folder, None by
+default : no cache) under the hash of the graph, so a large network is
+built once.
+"""
+import os
+import hashlib
+import numpy as np
+import scipy.sparse as sp
+import Miscfunc as M
+
+
+def networkOperators(graph,Nx,cache=None,directed=False):
+    '''Operators of the graph (see module doc), read in the cache when possible'''
+    A   = adjacency(graph,Nx,directed)
+    key = graphHash(A)
+    names = ('adjacency','average','laplacian')
+    files = {n : os.path.join(cache,key+'_'+n+'.npz') for n in names} if cache else {}
+    if files and all(os.path.exists(fi) for fi in files.values()):
+        op = {n : sp.load_npz(fi).tocsr() for n,fi in files.items()}
+    else :
+        deg  = np.asarray(A.sum(axis=1)).ravel()
+        iso  = deg==0
+        avg  = sp.diags(np.where(iso,0,1/np.where(iso,1,deg))) @ A + sp.diags(iso.astype(float))
+        op   = {'adjacency' : A,
+                'average'   : avg.tocsr(),
+                'laplacian' : (avg - sp.identity(Nx)).tocsr()}
+        if files :
+            os.makedirs(cache,exist_ok=True)
+            for n,fi in files.items() : sp.save_npz(fi,op[n],compressed=False)
+    op['Mean'] = M.MeanOperator(Nx)
+    return op
+
+def adjacency(graph,Nx,directed=False):
+    '''Weighted CSR adjacency of Nx nodes, without self-loops'''
+    if isinstance(graph,str) : graph = readGraph(graph)
+    if sp.issparse(graph) :
+        A = sp.csr_matrix(graph,dtype=float)
+    else :
+        e = np.asarray(graph)
+        if e.ndim!=2 or e.shape[1] not in (2,3) :
+            raise ValueError('An edge list is an array of (i,j) or (i,j,weight) rows')
+        w = e[:,2].astype(float) if e.shape[1]==3 else np.ones(len(e))
+        i,j = e[:,0].astype(int),e[:,1].astype(int)
+        if len(e) and max(i.max(),j.max())>=Nx :
+            raise ValueError('The network has more nodes than Nx='+str(Nx))
+        A = sp.csr_matrix((w,(i,j)),shape=(Nx,Nx))   # duplicated edges are summed
+    if A.shape!=(Nx,Nx) :
+        raise ValueError('The adjacency is '+str(A.shape)+', expected Nx='+str(Nx)+' nodes')
+    if not directed : A = A.maximum(A.T)                  # (i,j) and (j,i) are the same edge
+    A = (A - sp.diags(A.diagonal())).tocsr()
+    A.eliminate_zeros()
+    A.sort_indices()
+    return A
+
+def readGraph(path):
+    '''Sparse adjacency (.npz) or edge list (text, one "i j [weight]" per line)'''
+    if path.endswith('.npz') : return sp.load_npz(path)
+    return np.atleast_2d(np.loadtxt(path,ndmin=2))
+
+def graphHash(A):
+    '''Hash of a CSR matrix (structure and weights)'''
+    h = hashlib.sha1()
+    for a in (np.array(A.shape),A.indptr,A.indices,A.data) :
+        h.update(np.ascontiguousarray(a,dtype=float).tobytes())
+    return h.hexdigest()[:16]
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+ONLINE ACCUMULATORS
+
+Observers are updated by Miscfunc.TemporalLoop with every stored state
+(every Tstore) while integrating, so that summary statistics do not need the
+trajectory : with parNum['StorageMode']='last' a run costs O(Nx) memory.
+
+    obs = [Obs.RunningMoments(['lambda','omega','d']),
+           Obs.PeakDetector('lambda')]
+    Y_s, t_s = M.TemporalLoop(y,SYS,op,parNum,params,info,observers=obs)
+    info['observers']['peaks']['period_mean']
+
+Any variable of the system or of its intermediaryfuncs can be observed.
+Each observer has a name (its key in info['observers']), an
+update(t,sample) method and a result() method.
+"""
+import numpy as np
+
+
+class Sample():
+    '''
+    State at one time, read as a dictionnary : variables of the system, and
+    intermediary variables calculated on first access only
+    '''
+    def __init__(self,SYS,p,y):
+        self.SYS = SYS
+        self.p   = p
+        self.r   = {name : y[i] for i,name in enumerate(SYS.variables)}
+
+    def __getitem__(self,name):
+        if name not in self.r :
+            for n,fs in self.SYS.intermediaryfuncs.items():   # in dependency order
+                if n not in self.r : self.r[n] = fs(self.r,self.p)
+                if n==name         : break
+        return self.r[name]
+
+
+class ObservedStore():
+    '''Store wrapper feeding the observers with every stored state'''
+    def __init__(self,store,observers,SYS,p,info):
+        self.store     = store
+        self.observers = observers
+        self.SYS,self.p,self.info = SYS,p,info
+
+    def write(self,k,t,y):
+        self.store.write(k,t,y)
+        sample = Sample(self.SYS,self.p,y)
+        for obs in self.observers : obs.update(t,sample)
+
+    def finalize(self):
+        self.info['observers'] = {obs.name : obs.result() for obs in self.observers}
+        return self.store.finalize()
+
+
+###############################################################################
+### ACCUMULATORS ##############################################################
+###############################################################################
+class RunningMoments():
+    '''Mean and standard deviation in time of each column (Welford)'''
+    def __init__(self,names,name='moments'):
+        self.names,self.name = names,name
+        self.n    = 0
+        self.mean = {}
+        self.M2   = {}
+
+    def update(self,t,s):
+        self.n += 1
+        for v in self.names:
+            x = s[v]
+            if self.n==1 : self.mean[v],self.M2[v] = np.zeros_like(x,dtype=float),np.zeros_like(x,dtype=float)
+            delta         = x - self.mean[v]
+            self.mean[v] += delta/self.n
+            self.M2[v]   += delta*(x-self.mean[v])
+
+    def result(self):
+        res = {v : {'mean' : self.mean[v],
+                    'std'  : np.sqrt(self.M2[v]/self.n)} for v in self.mean}
+        res['Nsamples'] = self.n
+        return res
+
+
+class Envelope():
+    '''Minimum and maximum in time of each column'''
+    def __init__(self,names,name='envelope'):
+        self.names,self.name = names,name
+        self.min,self.max = {},{}
+
+    def update(self,t,s):
+        for v in self.names:
+            x = s[v]
+            if v not in self.min : self.min[v],self.max[v] = np.array(x,dtype=float),np.array(x,dtype=float)
+            np.fmin(self.min[v],x,out=self.min[v])
+            np.fmax(self.max[v],x,out=self.max[v])
+
+    def result(self):
+        return {v : {'min' : self.min[v], 'max' : self.max[v]} for v in self.min}
+
+
+class CrossSection():
+    '''
+    Moments over the Nx columns at each stored time (what MesoMeanSTD plots),
+    O(Ns) memory : NaN columns are ignored
+    '''
+    def __init__(self,names,name='crosssection'):
+        self.names,self.name = names,name
+        self.t    = []
+        self.mean = {v : [] for v in names}
+        self.std  = {v : [] for v in names}
+
+    def update(self,t,s):
+        self.t.append(t)
+        for v in self.names:
+            x = s[v]
+            finite = np.isfinite(x)
+            self.mean[v].append(x[finite].mean() if finite.any() else np.nan)
+            self.std [v].append(x[finite].std()  if finite.any() else np.nan)
+
+    def result(self):
+        res = {v : {'mean' : np.array(self.mean[v]),
+                    'std'  : np.array(self.std[v])} for v in self.names}
+        res['t'] = np.array(self.t)
+        return res
+
+
+class PeakDetector():
+    '''
+    Online detection of the local maxima of one variable (lambda by
+    default), same criterion as Miscfunc.getperiods : a flat top (float32)
+    counts once, at its start. Per column :
+    number of peaks, time and value of the last one, last and mean period,
+    last amplitude (peak minus the minimum since the previous peak)
+    '''
+    def __init__(self,var='lambda',name='peaks'):
+        self.var,self.name = var,name
+        self.n     = 0
+
+    def update(self,t,s):
+        x = np.array(s[self.var],dtype=float)
+        if self.n==0 :
+            Nx = x.shape[0]
+            self.Npeaks   = np.zeros(Nx,dtype=int)
+            self.lastpeak = np.full(Nx,np.nan)
+            self.peakval  = np.full(Nx,np.nan)
+            self.Tlast    = np.full(Nx,np.nan)
+            self.Tsum     = np.zeros(Nx)
+            self.amp      = np.full(Nx,np.nan)
+            self.low      = x.copy()                  # minimum since last peak
+            self.cand     = np.zeros(Nx,dtype=bool)   # rise followed by a flat part : peak if it goes down next
+            self.tc       = np.full(Nx,np.nan)        # time and value of the candidate
+            self.xc       = np.full(Nx,np.nan)
+        else :
+            up,down = x>self.x1, x<self.x1
+            peak = self.cand & down
+            old  = peak & (self.Npeaks>0)
+            self.Tlast[old]    = self.tc[old] - self.lastpeak[old]
+            self.Tsum [old]   += self.Tlast[old]
+            self.amp  [peak]   = self.xc[peak] - self.low[peak]
+            self.lastpeak[peak]= self.tc[peak]
+            self.peakval [peak]= self.xc[peak]
+            self.Npeaks  [peak]+= 1
+            self.low     [peak]= self.xc[peak]
+            self.cand = up | (self.cand & (x==self.x1))
+            self.tc[up],self.xc[up] = t,x[up]
+        np.fmin(self.low,x,out=self.low)
+        self.x1 = x
+        self.n += 1
+
+    def result(self):
+        if self.n==0 : return {}
+        return {'Npeaks'      : self.Npeaks,
+                'lastpeak'    : self.lastpeak,
+                'peak_last'   : self.peakval,
+                'period_last' : self.Tlast,
+                'period_mean' : np.where(self.Npeaks>1,self.Tsum/np.maximum(self.Npeaks-1,1),np.nan),
+                'amplitude'   : self.amp}
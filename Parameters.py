@@ -18,15 +18,56 @@ def parnum():
     'Tmax' : 100,       # Duration of simulation    
     'Nx'   : 1,         # Number of similar systems evolving in parrallel
 
-    'dt'   : 0.01,        # Timestep (fixed timestep method)    
-    } 
+    'dt'   : 0.01,        # Timestep (fixed timestep method)
+    'dtype': np.float64,  # Precision of the state and the stored trajectory (np.float32 : half the memory, see Precision)
+    'RHS'  : 'fused',     # 'dict' (readable SYS.f) or 'fused' (in-place, bit-identical)
+    'JIT'  : False,       # Opt-in compiled rk4 loop (needs numba, falls back to NumPy), see JIT
+
+    'method' : 'rk4',     # Integrator : 'rk4' (fixed dt), 'dopri5' or 'cashkarp' (adaptive),
+                          # 'imex' (fixed dt, implicit diffusion of coupled models)
+    'rtol'   : 1e-6,      # Relative tolerance (adaptive methods)
+    'atol'   : 1e-9,      # Absolute tolerance (adaptive methods)
+
+    'Tstore'      : 0.01,   # Time between two storages (a multiple of dt for rk4)
+    'StorageMode' : 'full', # 'full' (every Tstore), 'last' (last state only) or 'stats' (running statistics)
+    'Output'      : 'memory',     # 'memory', or streamed to disk : 'memmap' or 'hdf5'
+    'OutputPath'  : 'Trajectory', # Folder (memmap) or file (hdf5) of the streamed trajectory
+
+    'Network'       : None,        # Coupling graph instead of the ring : edge list, sparse adjacency or file (see Network)
+    'Directed'      : False,       # Edges (i,j) of the network act only on i
+    'OperatorCache' : None,        # Folder where the network operators are cached (None : no cache)
+
+    'Events' : [],        # Terminating events (see Events), e.g. CrisisEvents()
+    'Compaction'    : False, # Integrate only the columns still active (rk4)
+    'CompactEvery'  : 100,   # Steps between two compactions
+    'FixedPointTol' : 1e-8,  # Relative speed under which a column is at a fixed point
+
+    'Checkpoint'      : None, # Folder where the rk4/imex loop state is saved (None : no checkpoint), see Checkpoint
+    'CheckpointEvery' : 1000, # Steps between two checkpoints
+
+    'Save'      : None,   # Folder of the experiment store where the run is saved (None : not saved), see Experiments
+    'SaveDtype' : None,   # Saved precision, e.g. np.float32 (None : as computed)
+    'SaveChunk' : 1024,   # Columns per compressed chunk of the saved variables
+
+    'Profile'               : False, # Time the phases of the run, count the RHS calls (see Profiling)
+    'ProfileMemory'         : False, # Also trace the allocations of each phase (slower)
+    'ProfileIntermediaries' : False, # Also time each intermediary function of the model
+    }
         
     ### INTERMEDIARY VALUES 
-    parNum['Tstore']     = parNum['dt']                         # Time between two storage (if StorageMode=full, it goes to dt)
     parNum['Nt']         = int(parNum['Tmax']/parNum['dt'])         # Number of temporal iteration          
     parNum['Ns']         = int(parNum['Tmax']/parNum['Tstore'])+1   # Number of elements stored
     return parNum 
 
+def CrisisEvents(dmax=100,omegamin=1e-3):
+    '''
+    Usual ends of a Goodwin-Keen run, to put in parNum['Events'] :
+    debt explosion, employement reaching the Philips singularity, wage collapse
+    '''
+    return [{'name':'debt crisis'    ,'var':'d'     ,'threshold':dmax    ,'direction': 1},
+            {'name':'full employment','var':'lambda','threshold':1       ,'direction': 1},
+            {'name':'wage collapse'  ,'var':'omega' ,'threshold':omegamin,'direction':-1}]
+
 def initCond(p,parNum):
     '''
     Determine the initial conditions that are used by the system to iterate on
@@ -46,6 +87,11 @@ def initCond(p,parNum):
     'CO2up_ini' : v1*460   ,
     'CO2lo_ini' : v1*1740  ,
     'T_ini'     : v1*0     ,
+    'T0_ini'    : v1*0     , # Deep ocean temperature
+    'sigma_ini' : v1*9.78  , # Emission intensity (GtC per output unit)
+    'gsigma_ini': v1*-0.0152, # Growth rate of the emission intensity
+    'Eland_ini' : v1*1.1   , # Land-use emissions (GtC/y)
+    'pbs_ini'   : v1*0.547 , # Backstop technology price (output unit per GtC)
     
     ### INITIAL EXTENSIVE VARIABLES 
     'Y' : v1*1 , # GDP
@@ -59,6 +105,8 @@ def initCond(p,parNum):
     ic['K'] = ic['Y']*p['nu']
     ic['L'] = ic['lambda']*ic['N']
     ic['W'] = ic['omega']*ic['a']
+    for key in ('CO2at','CO2up','CO2lo','T','T0','sigma','gsigma','Eland','pbs'):
+        ic[key] = ic[key+'_ini']
 
     return ic 
 
@@ -119,9 +167,10 @@ def BasicParameters():
     'dPBS'   : - 0.005,               # Growth rate of back-stop technology price   
     'dPc'    : 0, #[CORRECT]          # Growth rate of back-stop technology price 
     'dEland' : - 0.022,               # Growth rate of land use change in CO2 emission
+    'n'      : 0,                     # Fraction of the industrial emissions abated
     
     # Damage function (on GDP)
-    '''D = 1 - (1 + p['pi1']*T + p['pi2']*T**2 + p['pi3']*T**p['zeta'] )**(-1)'''
+    # D = 1 - (1 + p['pi1']*T + p['pi2']*T**2 + p['pi3']*T**p['zeta'] )**(-1)
     'pi1' : 0         ,                # Linear temperature impact
     'pi2' : .00236    ,                # Quadratic temperature impact
     'pi3' : .00000507 ,                # Weitzmann Damage temperature impact 
@@ -131,6 +180,9 @@ def BasicParameters():
     # Climate model
     'Phi12'   : .024 ,#Transfer of carbon from atmosphere to biosphere
     'Phi23'   : .001 ,#Transfer from biosphere to stock
+    'CAT_eq'  : 588  ,#Preindustrial carbon in atmosphere (GtC)
+    'CUP_eq'  : 360  ,#Preindustrial carbon in biosphere and upper ocean (GtC)
+    'CLO_eq'  : 1720 ,#Preindustrial carbon in deep ocean (GtC)
     
     'C'     : 1/.098 ,# Heat capacity of fast-paced climate
     'C0'    : 3.52   ,# Heat capacity of inertial component of climate
@@ -143,15 +195,82 @@ def BasicParameters():
        
     }
     
-    params['omega0']     = 1-params['nu']*(params['alpha']+
-                                           params['beta']+
-                                           params['delta1'])  # Solow point of a classic goodwin system          
-    params['phi0']       = params['phinul']    / (1- params['phinul']**2)          # Based on Phinul value
-    params['phi1']       = params['phinul']**(3) / (1- params['phinul']**2)        # Based on Phinul value
-    params['lambdamin']  = 1- np.sqrt( params['phi1']/(params['alpha']+
-                                                       params['phi0'])) # Same
+    params = DerivedParameters(params)
     params['lambdamax']  = .98     
     return params
 
+def DerivedParameters(params,keep=()):
+    '''
+    Parameters deduced from the others. Works on scalars as well as on
+    length-Nx arrays (parameter sweeps). Names in keep are not recalculated
+    '''
+    derived = {}
+    derived['omega0']     = 1-params['nu']*(params['alpha']+
+                                            params['beta']+
+                                            params['delta1'])  # Solow point of a classic goodwin system          
+    derived['phi0']       = params['phinul']    / (1- params['phinul']**2)          # Based on Phinul value
+    derived['phi1']       = params['phinul']**(3) / (1- params['phinul']**2)        # Based on Phinul value
+    phi0 = params['phi0'] if 'phi0' in keep else derived['phi0']
+    phi1 = params['phi1'] if 'phi1' in keep else derived['phi1']
+    derived['lambdamin']  = 1- np.sqrt( phi1/(params['alpha']+
+                                              phi0)) # Same
+    for key,value in derived.items():
+        if key not in keep : params[key] = value
+    return params
+
+def castParams(params,dtype):
+    '''
+    Parameters in the precision dtype (parNum['dtype']) : the float arrays and
+    the numpy float scalars are converted, so that they do not bring the
+    calculations back to float64 (python floats follow the arrays already)
+    '''
+    dtype = np.dtype(dtype)
+    if dtype==np.float64 : return params
+    out = dict(params)
+    for k,v in params.items():
+        if isinstance(v,np.ndarray) and v.dtype.kind=='f' : out[k] = v.astype(dtype)
+        elif isinstance(v,np.floating)                    : out[k] = dtype.type(v)
+    return out
+
+def sliceParams(params,cols,Nx):
+    '''
+    Parameters of the columns cols only : the length-Nx arrays (sweeps)
+    are sliced, the scalars are kept
+    '''
+    return {k : (v[cols] if np.ndim(v)==1 and len(v)==Nx else v) for k,v in params.items()}
+
+def Sweep(params,parNum,grid,method='cartesian',N=None,seed=None):
+    '''
+    Vectorized parameter sweep : one column of the Nx axis per parameter set.
+    grid    : {name : values} for 'cartesian' (every combination is run),
+              {name : (min,max)} for 'lhs' (N points of a latin hypercube, N required)
+    Every swept parameter becomes a length-Nx array, the derived parameters
+    (omega0, phi0, phi1, lambdamin) are recalculated column by column.
+    Call it before initCond and prepareOperators.
+    Returns the new params, parNum, and sweep = {name : value of each column}
+    to tag the results with (results['sweep'] = sweep)
+    '''
+    names = list(grid.keys())
+    if method=='cartesian' :
+        mesh  = np.meshgrid(*[np.asarray(grid[n],dtype=float) for n in names],indexing='ij')
+        sweep = {n : m.ravel() for n,m in zip(names,mesh)}
+    elif method=='lhs' :
+        if N is None or N<1 : raise ValueError("method='lhs' needs the number of parameter sets N")
+        rng   = np.random.default_rng(seed)
+        sweep = {}
+        for n in names:
+            lo,hi    = grid[n]
+            sweep[n] = lo + (rng.permutation(N)+rng.random(N))/N*(hi-lo)
+    else :
+        raise ValueError('Unknown sweep method : '+str(method))
+
+    Nx           = len(sweep[names[0]])
+    params       = dict(params)
+    parNum       = dict(parNum)
+    parNum['Nx'] = Nx
+    for n in names : params[n] = sweep[n]
+    params = DerivedParameters(params,keep=names)
+    return params, parNum, sweep
+
 
    
\ No newline at end of file
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+VALIDATION OF THE REDUCED PRECISION
+
+parNum['dtype']=np.float32 halves the memory and the bandwidth of the state
+and of the stored trajectory. Compare runs the same sweep in float64 and in
+float32 and tells, column by column, whether the float32 run can be trusted :
+
+    rep = Prec.Compare(SYS,params,parNum)                 # on REFERENCE
+    rep = Prec.Compare(SYS,params,parNum,{'k2':...})      # on another sweep
+    rep['safe']                  # (Nx,) float32 within rtol of float64
+    print(Prec.summary(rep))
+
+Compared for each column :
+*    error    : (Nvar,Nx) max over time of |Y32-Y64| / max over time of |Y64|
+*    tdiverge : first stored time where one variable is more than rtol away
+               (relative to its scale), inf if never
+*    period   : mean period of the lambda cycles (getperiods) in both runs,
+               and period_error, their relative difference. Only the cycles
+               of amplitude above amplitude count : once a cycle is damped,
+               the peaks found are rounding noise, different in each precision
+Columns whose float64 run does not stay finite are never safe.
+"""
+import numpy as np
+import Parameters as Par
+import Miscfunc as M
+
+REFERENCE = {'k2' : [10,15,20,25,30],              # reference sweep of Compare
+             'r'  : [.01,.02,.03,.04,.05]}
+
+
+def run(SYS,params,parNum,dtype,amplitude=1e-4):
+    '''Trajectory and mean period of the cycles of each column (lambda amplitude above amplitude) in the precision dtype'''
+    pN      = dict(parNum,dtype=dtype)
+    y       = SYS.initializeY(Par.initCond(params,pN),pN)
+    op      = M.prepareOperators(pN)
+    Y_s,t_s = M.TemporalLoop(y,SYS,op,pN,dict(params),{})
+    r       = M.getperiods(SYS.expandY_simple(Y_s,t_s,op,params),pN,op)
+    cyc     = r['cycles']
+    keep    = cyc['lambda_max']-cyc['lambda_min'] > amplitude    # not the rounding noise of a damped cycle
+    count   = np.bincount(cyc['column'][keep],minlength=pN['Nx'])
+    with np.errstate(invalid='ignore'):
+        period = np.bincount(cyc['column'][keep],weights=cyc['period'][keep],minlength=pN['Nx'])/count
+    return np.asarray(Y_s),t_s,period
+
+def Compare(SYS,params,parNum,grid=REFERENCE,method='cartesian',rtol=1e-3,amplitude=1e-4,
+            dtypes=(np.float64,np.float32)):
+    '''
+    Run the sweep grid (see Parameters.Sweep, None : params as they are) in
+    the two precisions of dtypes (reference first), see module doc
+    '''
+    sweep = {}
+    if grid : params,parNum,sweep = Par.Sweep(params,parNum,grid,method)
+    Y64,t_s,P64 = run(SYS,params,parNum,dtypes[0],amplitude)
+    Y32,_  ,P32 = run(SYS,params,parNum,dtypes[1],amplitude)
+    Y32   = Y32.astype(Y64.dtype)
+    with np.errstate(all='ignore'):
+        scale = np.max(np.abs(Y64),axis=1)                       # (Nvar,Nx)
+        dev   = np.abs(Y32-Y64)/scale[:,None,:]                  # (Nvar,Ns,Nx)
+        error = np.max(dev,axis=1)
+        perr  = np.abs(P32-P64)/P64
+    finite   = np.isfinite(Y64).all(axis=(0,1))
+    bad      = (~(dev<=rtol)).any(axis=0)                        # (Ns,Nx), NaN counts as diverged
+    tdiv     = np.where(bad.any(axis=0),t_s[np.argmax(bad,axis=0)],np.inf)
+    perok    = (perr<=rtol) | (np.isnan(P64) & np.isnan(P32))   # no cycle in both runs
+    safe     = finite & (error<=rtol).all(axis=0) & perok
+    return {'variables'    : list(SYS.variables),
+            'sweep'        : sweep,
+            'dtypes'       : [np.dtype(d).name for d in dtypes],
+            'rtol'         : rtol,
+            'error'        : error,
+            'tdiverge'     : tdiv,
+            'period'       : np.array([P64,P32]),
+            'period_error' : perr,
+            'safe'         : safe,
+            'memory'       : (Y64.nbytes,Y64.nbytes*np.dtype(dtypes[1]).itemsize//Y64.itemsize)}
+
+def summary(rep):
+    '''Readable summary of Compare'''
+    lines = ['%s against %s, rtol=%g : %d/%d columns safe' % (rep['dtypes'][1],rep['dtypes'][0],rep['rtol'],
+                                                             rep['safe'].sum(),len(rep['safe']))]
+    for i,name in enumerate(rep['variables']):
+        lines.append('    %-8s max relative error %.2e (median %.2e)' % (name,np.nanmax(rep['error'][i]),
+                                                                       np.nanmedian(rep['error'][i])))
+    with np.errstate(all='ignore'):
+        lines.append('    period   max relative error %.2e' % np.nanmax(rep['period_error']))
+    for j in np.nonzero(~rep['safe'])[0]:
+        where = ', '.join('%s=%g' % (n,v[j]) for n,v in rep['sweep'].items())
+        lines.append('    unsafe column %d (%s) : diverges at t=%g' % (j,where,rep['tdiverge'][j]))
+    return '\n'.join(lines)
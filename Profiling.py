@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+PROFILING OF A RUN
+
+    prof = Prof.Profiler(parNum['Profile'],memory=True,intermediaries=True)
+    with prof :                                   # the profiler is active
+        with prof.phase('integration') : Y_s,t_s = M.TemporalLoop(...)
+        with prof.phase('expansion')   : results = SYS.expandY_simple(...)
+    results['profile'] = prof.report()
+    print(prof.summary())
+
+*    phases : wall and CPU time of each phase (cumulated if repeated). While
+     the profiler is active, TemporalLoop adds the phases 'rhs' (time spent
+     in the RHS) and 'storage' (store writes), which are parts of the
+     integration ; the rest of the integration is the rk4 arithmetic and copies
+*    counters : RHS evaluations ('rhs'), timesteps ('steps'), stored states
+     ('stores')
+*    memory (optional, tracemalloc) : bytes still allocated at the end of
+     each phase ('mem_net') and peak above its start ('mem_peak'). tracemalloc
+     slows the allocations down, so the times are then less representative
+*    intermediaries (optional) : calls and time of each function of
+     SYS.intermediaryfuncs, 'self' excluding the intermediaries it calls.
+     The methods are also timed when SYS.f calls them directly (dict RHS),
+     not only through intermediaryfuncs (Results, Observers, Events). The
+     fused RHS computes them inline : its time is only in the phase 'rhs'
+A disabled profiler (Profiler(False)) gives shared empty contexts and wraps
+nothing : the loop is then exactly the unprofiled one.
+"""
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+ACTIVE = None                                    # profiler of the running block, if any
+_NULL  = nullcontext()
+
+
+def phase(name):
+    '''Phase of the active profiler (empty context when none)'''
+    return ACTIVE.phase(name) if ACTIVE is not None else _NULL
+
+
+class Profiler():
+    '''Timers and counters of a run, see module doc'''
+    def __init__(self,enabled=True,memory=False,intermediaries=False):
+        self.enabled  = bool(enabled)
+        self.memory   = memory and self.enabled
+        self.inter    = intermediaries and self.enabled
+        self.phases   = {}
+        self.counters = {}
+        self.intermediaries = {}
+        self._stack   = []                       # running intermediaries (self time)
+        self._models  = []
+        self._prev    = None
+
+    ### ACTIVATION
+    def __enter__(self):
+        global ACTIVE
+        if self.enabled :
+            self._prev,ACTIVE = ACTIVE,self
+            if self.memory and not tracemalloc.is_tracing() : tracemalloc.start()
+        return self
+
+    def __exit__(self,*exc):
+        global ACTIVE
+        if self.enabled :
+            ACTIVE = self._prev
+            for SYS,funcs,methods in self._models :
+                SYS.intermediaryfuncs = funcs
+                for m in methods : delattr(SYS,m)
+            self._models = []
+            if self.memory and tracemalloc.is_tracing() : tracemalloc.stop()
+        return False
+
+    def start(self):
+        '''Activate the profiler (same as with prof :), returns it'''
+        return self.__enter__()
+
+    def stop(self):
+        '''Deactivate the profiler'''
+        self.__exit__(None,None,None)
+
+    ### TIMERS AND COUNTERS
+    def phase(self,name):
+        '''Context timing the phase name'''
+        return _Phase(self,name) if self.enabled else _NULL
+
+    def add(self,name,wall,cpu,calls=1):
+        ph = self.phases.setdefault(name,{'wall':0.,'cpu':0.,'calls':0})
+        ph['wall'] += wall
+        ph['cpu']  += cpu
+        ph['calls']+= calls
+
+    def count(self,name,n=1):
+        if self.enabled : self.counters[name] = self.counters.get(name,0)+n
+
+    def counted(self,f,name='rhs'):
+        '''f timed and counting its calls (phase name)'''
+        if not self.enabled : return f
+        clock,add = time.perf_counter,self.add
+        def g(*args,**kw):
+            t0  = clock()
+            out = f(*args,**kw)
+            add(name,clock()-t0,0.)
+            return out
+        return g
+
+    def timedStore(self,store):
+        '''store whose writes are counted and timed (phase 'storage')'''
+        return _TimedStore(store,self) if self.enabled else store
+
+    def instrument(self,SYS):
+        '''
+        Time the intermediaryfuncs of SYS until the profiler exits. The ones
+        that are methods of SYS are shadowed on the instance by their timed
+        version, so that the calls of f (self.pi(y,p)...) are timed too
+        '''
+        if not self.inter or any(S is SYS for S,_,_ in self._models) : return SYS
+        funcs,methods,timed = SYS.intermediaryfuncs,[],{}
+        for n,f in funcs.items() :
+            timed[n] = self._timed(n,f)
+            m = getattr(f,'__name__',None)
+            if getattr(f,'__self__',None) is SYS and m not in vars(SYS) :
+                setattr(SYS,m,timed[n])
+                methods.append(m)
+        self._models.append((SYS,funcs,methods))
+        SYS.intermediaryfuncs = timed
+        return SYS
+
+    def _timed(self,name,f):
+        clock,stack,stats = time.perf_counter,self._stack,self.intermediaries
+        def g(y,p):
+            stack.append(0.)                     # time of the intermediaries called by f
+            t0 = clock()
+            try : return f(y,p)
+            finally :
+                dt    = clock()-t0
+                inner = stack.pop()
+                if stack : stack[-1] += dt
+                s = stats.setdefault(name,{'calls':0,'time':0.,'self':0.})
+                s['calls'] += 1
+                s['time']  += dt
+                s['self']  += dt-inner
+        return g
+
+    ### REPORT
+    def report(self):
+        '''Dictionnary of everything measured'''
+        rep = {'phases'   : {n : dict(v) for n,v in self.phases.items()},
+               'counters' : dict(self.counters)}
+        for c,n in (('rhs','rhs'),('stores','storage')) :
+            if n in self.phases : rep['counters'][c] = self.phases[n]['calls']
+        if 'integration' in self.phases :
+            rest = self.phases['integration']['wall']
+            for n in ('rhs','storage') : rest -= self.phases.get(n,{'wall':0})['wall']
+            rep['phases']['integration']['other'] = rest     # rk4 arithmetic, copies, events
+        if self.inter : rep['intermediaries'] = {n : dict(v) for n,v in self.intermediaries.items()}
+        return rep
+
+    def summary(self):
+        '''Readable table of the report'''
+        rep   = self.report()
+        lines = ['%-14s %10s %10s %8s %12s %12s' % ('phase','wall (s)','cpu (s)','calls','mem net','mem peak')]
+        for n,v in rep['phases'].items() :
+            lines.append('%-14s %10.4f %10.4f %8d %12s %12s' % (n,v['wall'],v['cpu'],v['calls'],
+                         v.get('mem_net',''),v.get('mem_peak','')))
+            if 'other' in v : lines.append('%-14s %10.4f' % ('  other',v['other']))
+        for n,v in rep['counters'].items() : lines.append('%-14s %10d' % (n,v))
+        for n,v in sorted(rep.get('intermediaries',{}).items(),key=lambda kv : -kv[1]['self']) :
+            lines.append('%-14s %10.4f %10s %8d  (self %.4f)' % (n,v['time'],'',v['calls'],v['self']))
+        return '\n'.join(lines)
+
+
+class _Phase():
+    '''Timer of one phase'''
+    def __init__(self,prof,name):
+        self.prof,self.name = prof,name
+
+    def __enter__(self):
+        if self.prof.memory and tracemalloc.is_tracing() :
+            self.mem0 = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.w0,self.c0 = time.perf_counter(),time.process_time()
+        return self
+
+    def __exit__(self,*exc):
+        self.prof.add(self.name,time.perf_counter()-self.w0,time.process_time()-self.c0)
+        if self.prof.memory and tracemalloc.is_tracing() :
+            cur,peak = tracemalloc.get_traced_memory()
+            ph = self.prof.phases[self.name]
+            ph['mem_net']  = ph.get('mem_net',0)+cur-self.mem0
+            ph['mem_peak'] = max(ph.get('mem_peak',0),peak-self.mem0)
+        return False
+
+
+class _TimedStore():
+    '''Store wrapper timing its writes'''
+    def __init__(self,store,prof):
+        self.store,self.prof = store,prof
+
+    def write(self,k,t,y):
+        t0 = time.perf_counter()
+        self.store.write(k,t,y)
+        self.prof.add('storage',time.perf_counter()-t0,0.)
+
+    def finalize(self):
+        return self.store.finalize()
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+LAZY RESULTS
+
+SYS.expandY_simple returns a Results mapping instead of a dictionnary
+holding every intermediary variable : an intermediary (kappa, pi, g...) is
+calculated the first time it is read, together with the intermediaries it
+needs, and memoized. The memoized arrays are limited to budget bytes (least
+recently used ones are dropped first, and calculated again if needed).
+
+    results = SYS.expandY_simple(Y_s,t_s,op,params)
+    results['lambda']                        # (Ns,Nx), nothing else is calculated
+    part = results.window(t0=50,cols=[0,3])  # intermediaries only calculated on this part
+
+Results behaves like a dictionnary (keys, get, update, in...), so plots,
+getperiods and VariableDictionnary use it unchanged. The entries set by hand
+(run diagnostics, periods...) are kept apart and never dropped.
+Deleting (del, pop) an entry set by hand removes it ; deleting an
+intermediary frees its memoized array, it stays a key and is calculated
+again when read ; t and the variables of the trajectory cannot be deleted
+(ValueError).
+A variable of a trajectory streamed to HDF5 (Y_s being the h5py dataset) is
+a VariableView : only the slices taken from it are read from the file.
+"""
+from collections import OrderedDict
+from collections.abc import MutableMapping
+import numpy as np
+from numpy.lib.mixins import NDArrayOperatorsMixin
+import Parameters as Par
+
+BUDGET = 2**30                          # bytes of memoized intermediaries
+
+
+class Results(MutableMapping):
+    '''Lazy dictionnary of the results of SYS, see module doc'''
+    def __init__(self,SYS,Y_s,t_s,p,budget=BUDGET):
+        self.SYS,self.Y_s,self.p = SYS,Y_s,Par.castParams(p,Y_s.dtype)
+        self.budget = budget
+        self.cache  = OrderedDict()             # memoized intermediaries, LRU first
+        self.data   = {'t' : t_s}               # variables set by hand
+        self.index  = {ids : i for i,ids in enumerate(SYS.variables)}
+        self.nbytes = 0
+
+    def __getitem__(self,name):
+        if name in self.data  : return self.data[name]
+        if name in self.index :
+            if isinstance(self.Y_s,np.ndarray) : return self.Y_s[self.index[name]]   # memmap : a view already
+            return VariableView(self.Y_s,self.index[name])
+        if name in self.cache :
+            self.cache.move_to_end(name)
+            return self.cache[name]
+        if name not in self.SYS.intermediaryfuncs : raise KeyError(name)
+        value = self.SYS.intermediaryfuncs[name](self,self.p)   # reads what it needs from self
+        self._memoize(name,value)
+        return value
+
+    def _memoize(self,name,value):
+        self.cache[name] = value
+        self.nbytes     += np.asarray(value).nbytes
+        while self.nbytes > self.budget and len(self.cache) > 1 :
+            old,v = self.cache.popitem(last=False)
+            self.nbytes -= np.asarray(v).nbytes
+
+    def __setitem__(self,name,value):
+        if name in self.cache : self.nbytes -= np.asarray(self.cache.pop(name)).nbytes
+        self.data[name] = value
+
+    def __delitem__(self,name):
+        if name=='t' or (name in self.index and name not in self.data) :
+            raise ValueError(name+' is a variable of the trajectory, it cannot be deleted from the results')
+        if name in self.data : del self.data[name]        # set by hand
+        elif name in self.SYS.intermediaryfuncs :
+            if name in self.cache : self.nbytes -= np.asarray(self.cache.pop(name)).nbytes
+        else : raise KeyError(name)
+
+    def clear(self):
+        '''Remove the entries set by hand and free the memoized intermediaries'''
+        self.data = {'t' : self.data['t']}
+        self.cache.clear()
+        self.nbytes = 0
+
+    def __iter__(self):
+        yield from self.data
+        for name in list(self.index)+list(self.SYS.intermediaryfuncs) :
+            if name not in self.data : yield name
+
+    def __len__(self):
+        return len(set(self.data)|set(self.index)|set(self.SYS.intermediaryfuncs))
+
+    def __contains__(self,name):
+        return name in self.data or name in self.index or name in self.SYS.intermediaryfuncs
+
+    def window(self,t0=None,t1=None,cols=None):
+        '''
+        Results restricted to the stored times t0<=t<=t1 and to the columns
+        cols (slice, indices or boolean mask). Nothing is calculated ; the
+        entries set by hand are not carried over
+        '''
+        t  = np.asarray(self.data['t'])
+        k0 = 0      if t0 is None else int(np.searchsorted(t,t0,side='left'))
+        k1 = len(t) if t1 is None else int(np.searchsorted(t,t1,side='right'))
+        Nx = self.Y_s.shape[2]
+        if cols is None : cols = slice(None)
+        if isinstance(cols,slice) : Y_s = self.Y_s[:,k0:k1,cols]
+        else :
+            cols = np.arange(Nx)[np.asarray(cols)]
+            uniq,inv = np.unique(cols,return_inverse=True)    # increasing, as h5py needs
+            Y_s  = np.asarray(self.Y_s[:,k0:k1,uniq])[:,:,inv]   # only these columns are read
+        return Results(self.SYS,Y_s,t[k0:k1],Par.sliceParams(self.p,cols,Nx),self.budget)
+
+    def compute(self,names=None):
+        '''Plain dictionnary with every variable of names (default : all)'''
+        return {name : self[name] for name in (names if names is not None else self)}
+
+
+class VariableView(NDArrayOperatorsMixin):
+    '''
+    Y_s[i] of a (Nvar,Ns,Nx) dataset (h5py) that is not read : indexing reads
+    only the selection, the numpy functions and operators read the whole
+    variable, chunk of times by chunk of times
+    '''
+    def __init__(self,Y_s,i,chunk=256):
+        self.Y_s,self.i,self.chunk = Y_s,i,chunk
+        self.shape = tuple(Y_s.shape[1:])
+        self.dtype = Y_s.dtype
+        self.ndim  = len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self,key):
+        return self.Y_s[(self.i,)+(key if isinstance(key,tuple) else (key,))]
+
+    def __array__(self,dtype=None,copy=None):
+        out = np.empty(self.shape,dtype=self.dtype)
+        for k in range(0,self.shape[0],self.chunk) : out[k:k+self.chunk] = self.Y_s[self.i,k:k+self.chunk]
+        return out if dtype is None else out.astype(dtype,copy=False)
+
+    def __array_ufunc__(self,ufunc,method,*inputs,**kw):
+        inputs = [np.asarray(x) if isinstance(x,VariableView) else x for x in inputs]
+        return getattr(ufunc,method)(*inputs,**kw)
+
+    @property
+    def T(self):
+        return np.asarray(self).T
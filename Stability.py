@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+"""
+LINEAR STABILITY OF THE EQUILIBRIA, WITHOUT TIME INTEGRATION
+
+The models with intensive dynamics (GK_Reduced, GK_FULL ; not GEMMES nor the
+ModelSpec models, refused with a ValueError) give them (omega, lambda, d) with
+SYS.intensiveRHS, their analytic jacobian SYS.jacobian and their equilibria
+SYS.equilibria. Everything is vectorized on the Nx parameter sets, so a whole
+sweep is classified at once :
+
+    params,parNum,sweep = Par.Sweep(params,parNum,{'r':...,'k2':...})
+    eq = Stab.Equilibria(SYS,params)
+    eq['solow']['stable']          # one boolean per parameter set
+
+or directly Stab.StabilityMap(SYS,params,parNum,grid).
+
+Where the runs end up is found the same way, without integrating to Tmax :
+
+    fp = Stab.FixedPoints(SYS,params)              # Newton on intensiveRHS
+    fp = Stab.FixedPoints(SYS,params,x0=[.8,.9,1.],seeds=[0])
+    lc = Stab.LimitCycles(SYS,params,sweep=sweep)  # shooting on periodic orbits
+    lc['period'], lc['amplitude'], lc['stable']    # one value per parameter set
+    lc['reason']                                   # 'converged', 'damped', 'collapsed'...
+
+Both solve every column at once. The columns that fail, or that are not
+seeds, start again from the solution of the nearest solved parameter set
+(warm starts), so that a few seeds spread over the whole sweep.
+"""
+import numpy as np
+from scipy.spatial import cKDTree
+import Parameters as Par
+
+TYPES = ['undefined','stable node','stable focus','saddle','unstable node','unstable focus','center']
+REASONS = ['converged','no cycle','damped','collapsed','diverged','not converged','not solved']   # LimitCycles
+
+
+def Equilibria(SYS,p,tol=1e-10):
+    '''
+    Equilibria of SYS for every parameter set in p :
+    {name : {'x'           : (3,Nx) intensive state (NaN : does not exist)
+             'exists'      : (Nx,) bool
+             'eigenvalues' : (Nx,3) complex, sorted by decreasing real part
+             'stable'      : (Nx,) bool, every real part below -tol
+             'type'        : (Nx,) index in TYPES
+             'typename'    : (Nx,) name of the type}}
+    '''
+    eqs = SYS.equilibria(p)
+    for name,eq in eqs.items():
+        x  = eq['x']
+        Nx = x.shape[1]
+        if 'eigenvalues' not in eq :
+            eig    = np.full((Nx,3),np.nan,dtype=complex)
+            exists = np.isfinite(x).all(axis=0)
+            cols   = np.nonzero(exists)[0]
+            if len(cols) : eig[cols] = np.linalg.eigvals(SYS.jacobian(x[:,cols],Par.sliceParams(p,cols,Nx)))
+        else :
+            eig    = eq['eigenvalues']
+            exists = np.isfinite(eig).all(axis=1)
+        eq['exists']      = exists
+        _classified(eq,eig,tol)
+    return eqs
+
+def _classified(eq,eig,tol):
+    '''Eigenvalues (sorted by decreasing real part), type, typename and stable of an equilibrium'''
+    order = np.argsort(-eig.real,axis=1)
+    eq['eigenvalues'] = np.take_along_axis(eig,order,axis=1)
+    eq['type']        = classify(eq['eigenvalues'],tol)
+    eq['typename']    = np.array(TYPES,dtype=object)[eq['type']]
+    eq['stable']      = eq['type']<=2
+    eq['stable'][eq['type']==0] = False
+    return eq
+
+def classify(eig,tol=1e-10):
+    '''Type (index in TYPES) of an equilibrium from its eigenvalues (Nx,n)'''
+    re,im   = eig.real,eig.imag
+    focus   = (np.abs(im)>tol).any(axis=1)
+    neg,pos = (re<-tol).all(axis=1),(re>tol).all(axis=1)
+    t = np.full(len(eig),3)                                   # saddle
+    t[neg & ~focus] = 1
+    t[neg &  focus] = 2
+    t[pos & ~focus] = 4
+    t[pos &  focus] = 5
+    t[~neg & ~pos & (np.abs(re)<=tol).any(axis=1) & (re<=tol).all(axis=1)] = 6
+    t[~np.isfinite(eig).all(axis=1)] = 0
+    return t
+
+def StabilityMap(SYS,params,parNum,grid,method='cartesian',N=None,seed=None):
+    '''
+    Equilibria over a parameter sweep (same arguments as Parameters.Sweep).
+    Returns the equilibria and sweep = {name : value of each parameter set}
+    '''
+    params,parNum,sweep = Par.Sweep(params,parNum,grid,method,N,seed)
+    return Equilibria(SYS,params), sweep
+
+
+###############################################################################
+### FIXED POINTS AND LIMIT CYCLES #############################################
+###############################################################################
+def FixedPoints(SYS,p,x0=None,sweep=None,seeds=None,tol=1e-10,maxiter=50,warm=True):
+    '''
+    Fixed points of the intensive dynamics by Newton iterations on
+    SYS.intensiveRHS, from x0 ((3,Nx), or (3,) for every column, default the
+    Solow equilibrium of SYS.equilibria) on the seeds columns (indices,
+    default all of them). With warm, the other columns and those where Newton
+    fails start again from the solution of the nearest solved column (see
+    neighbours) ; the columns of non-finite x0 are left alone.
+    Returns {'x'          : (3,Nx) fixed point (NaN : not converged)
+             'converged'  : (Nx,) bool, |intensiveRHS| below tol
+             'residual'   : (Nx,) |intensiveRHS| at x
+             'iterations' : (Nx,) Newton iterations
+             'source'     : (Nx,) column of the warm start (-1 : x0)
+             and eigenvalues, type, typename, stable as in Equilibria}
+    '''
+    _intensive(SYS,'FixedPoints')
+    if x0 is None : x0 = SYS.equilibria(p)['solow']['x']
+    Nx   = _columns(p,x0)
+    x    = np.array(np.broadcast_to(np.asarray(x0,dtype=float).reshape(len(x0),-1),(len(x0),Nx)))
+    out  = {'x'          : np.full_like(x,np.nan),
+            'converged'  : np.zeros(Nx,dtype=bool),
+            'residual'   : np.full(Nx,np.nan),
+            'iterations' : np.zeros(Nx,dtype=int),
+            'source'     : np.full(Nx,-1)}
+
+    def solve(cols,guess):
+        xc,res,it = _newton(SYS,Par.sliceParams(p,cols,Nx),guess,tol,maxiter)
+        conv = res<=tol
+        out['x'][:,cols[conv]]     = xc[:,conv]
+        out['residual'][cols]      = np.where(conv | np.isnan(out['residual'][cols]),res,out['residual'][cols])
+        out['iterations'][cols]   += it
+        out['converged'][cols]     = conv
+        return conv
+
+    cols = np.arange(Nx) if seeds is None else np.atleast_1d(seeds)
+    cols = cols[np.isfinite(x[:,cols]).all(axis=0)]
+    if len(cols) : solve(cols,x[:,cols])
+    if warm : _warmStart(lambda c,s : solve(c,out['x'][:,s]),out,neighbours(p,Nx,sweep),
+                         np.isfinite(x).all(axis=0))
+    eig  = np.full((Nx,len(x)),np.nan,dtype=complex)
+    cols = np.nonzero(out['converged'])[0]
+    if len(cols) : eig[cols] = np.linalg.eigvals(SYS.jacobian(out['x'][:,cols],Par.sliceParams(p,cols,Nx)))
+    return _classified(out,eig,tol)
+
+def LimitCycles(SYS,p,x0=None,T0=None,sweep=None,seeds=None,nsteps=200,tol=1e-8,maxiter=20,
+                amin=1e-6,warm=True,Ttrans=100,dt=0.05):
+    '''
+    Periodic orbits of the intensive dynamics by shooting : Newton iterations
+    on (x,T) so that the flow of x during T comes back to x, the derivative
+    of the flow being integrated along (variational equation), with the phase
+    condition that the correction of x is orthogonal to the flow.
+    Each orbit is integrated with nsteps rk4 steps, whatever its period.
+    x0 (3,Nx) and T0 (Nx,) are the guesses ; without T0 they come from
+    cycleGuess started at x0 (default the initial conditions of
+    Parameters.initCond), on the seeds columns only (indices, default all
+    of them). With warm, the other columns and those where the shooting fails
+    start again from the orbit of the nearest solved column (see neighbours).
+    Orbits of amplitude below amin (collapsing on an equilibrium) are failures.
+    Returns {'x'           : (3,Nx) point of the orbit (NaN : not converged)
+             'period'      : (Nx,) period T
+             'min','max'   : (3,Nx) extrema along the orbit (on the nsteps points)
+             'amplitude'   : (3,Nx) max-min
+             'converged'   : (Nx,) bool, residual below tol times the amplitude
+             'residual'    : (Nx,) |flow(x,T)-x|
+             'iterations'  : (Nx,) Newton iterations
+             'source'      : (Nx,) column of the warm start (-1 : own guess)
+             'multipliers' : (Nx,2) Floquet multipliers (without the trivial
+                             one), by decreasing modulus
+             'stable'      : (Nx,) bool, every multiplier inside the unit circle
+             'reason'      : (Nx,) outcome, one of REASONS : 'converged' ;
+                             'no cycle' (the transient of cycleGuess has less
+                             than two maxima), 'damped' (its oscillations
+                             decay, or are below amin) or 'diverged' when no
+                             shooting started ; else the end of the last
+                             shooting : 'collapsed' (amplitude below amin :
+                             an equilibrium), 'diverged' (non-finite state or
+                             period), 'not converged' (maxiter, or the step
+                             shrank below 1e-3) ; 'not solved' : no guess}
+    '''
+    _intensive(SYS,'LimitCycles')
+    Nx = _columns(p,x0,T0)
+    if x0 is None : x0 = [p['omega0'],p['lambdamax'],1.]
+    x0 = np.array(np.broadcast_arrays(*[np.asarray(v,dtype=float) for v in x0]+[np.zeros(Nx)])[:-1])
+    why = np.full(Nx,'not solved',dtype=object)
+    if T0 is None :
+        seeds = np.arange(Nx) if seeds is None else np.atleast_1d(seeds)
+        x,T   = np.full_like(x0,np.nan),np.full(Nx,np.nan)
+        x[:,seeds],T[seeds],why[seeds] = cycleGuess(SYS,Par.sliceParams(p,seeds,Nx),x0[:,seeds],Ttrans,dt,amin=amin)
+    else :
+        x,T   = x0,np.array(np.broadcast_to(np.asarray(T0,dtype=float),(Nx,)))
+    n   = len(x)
+    out = {'x'          : np.full_like(x,np.nan),
+           'period'     : np.full(Nx,np.nan),
+           'min'        : np.full_like(x,np.nan),
+           'max'        : np.full_like(x,np.nan),
+           'converged'  : np.zeros(Nx,dtype=bool),
+           'residual'   : np.full(Nx,np.nan),
+           'iterations' : np.zeros(Nx,dtype=int),
+           'source'     : np.full(Nx,-1),
+           'multipliers': np.full((Nx,n-1),np.nan,dtype=complex),
+           'reason'     : why}
+
+    def solve(cols,xg,Tg):
+        r = _shooting(SYS,Par.sliceParams(p,cols,Nx),xg,Tg,nsteps,tol,maxiter,amin)
+        conv = r['converged']
+        out['reason'][cols] = r['reason']
+        for k in ('x','min','max') : out[k][:,cols[conv]] = r[k][:,conv]
+        for k in ('period','multipliers') : out[k][cols[conv]] = r[k][conv]
+        out['residual'][cols]    = np.where(conv | np.isnan(out['residual'][cols]),r['residual'],out['residual'][cols])
+        out['iterations'][cols] += r['iterations']
+        out['converged'][cols]   = conv
+        return conv
+
+    cols = np.nonzero(np.isfinite(x).all(axis=0) & np.isfinite(T))[0]
+    if len(cols) : solve(cols,x[:,cols],T[cols])
+    if warm : _warmStart(lambda c,s : solve(c,out['x'][:,s],out['period'][s]),out,neighbours(p,Nx,sweep),
+                         np.ones(Nx,dtype=bool))
+    out['amplitude'] = out['max']-out['min']
+    with np.errstate(invalid='ignore'):
+        out['stable'] = (np.abs(out['multipliers'])<1).all(axis=1) & out['converged']
+    return out
+
+def cycleGuess(SYS,p,x,Ttrans=100,dt=0.05,var=1,amin=1e-6,decay=.9):
+    '''
+    Guess of the limit cycles by a short rk4 integration (Ttrans, step dt) of
+    the intensive dynamics from x (3,Nx) : state at the last maximum of the
+    variable var (default lambda) and time between its last two maxima.
+    NaN where there are less than two maxima, where the last oscillation is
+    smaller than amin or than decay times the previous one (damped).
+    Returns x, T and why there is no guess ('' : a guess, else 'no cycle',
+    'damped' or 'diverged')
+    '''
+    x     = np.array(x,dtype=float)
+    Nx    = x.shape[1]
+    xpeak = np.full_like(x,np.nan)
+    tpeak = np.full((2,Nx),np.nan)                           # last two maxima
+    amp   = np.zeros((2,Nx))                                # last two oscillations
+    low   = np.full(Nx,np.inf)                               # minimum since the last maximum
+    v2,v1 = np.full(Nx,np.nan),x[var].copy()
+    xprev = x.copy()
+    with np.errstate(all='ignore'):
+        for k in range(1,int(round(Ttrans/dt))+1):
+            x    = _step(SYS,p,x,dt)[0]
+            peak = (v1>v2) & (v1>=x[var])                   # maximum at the previous step
+            if peak.any():
+                xpeak[:,peak] = xprev[:,peak]
+                tpeak[0,peak],tpeak[1,peak] = tpeak[1,peak],(k-1)*dt
+                amp[0,peak],amp[1,peak] = amp[1,peak],v1[peak]-low[peak]
+                low[peak] = np.inf
+            low   = np.fmin(low,x[var])
+            v2,v1 = v1,x[var]
+            xprev = x
+    T  = tpeak[1]-tpeak[0]
+    ok = np.isfinite(T) & (amp[1]>amin) & (amp[1]>=decay*amp[0]) & np.isfinite(xpeak).all(axis=0)
+    why = np.where(np.isfinite(T),'damped','no cycle').astype(object)
+    why[~np.isfinite(x).all(axis=0)] = 'diverged'
+    why[ok] = ''
+    xpeak[:,~ok] = np.nan
+    T[~ok]       = np.nan
+    return xpeak,T,why
+
+def neighbours(p,Nx,sweep=None):
+    '''
+    Coordinates of the columns for the warm starts, each scaled to [0,1] :
+    the values of sweep (see Parameters.Sweep), by default of every parameter
+    that varies along the columns, else the index of the column
+    '''
+    if sweep is None : sweep = {k : v for k,v in p.items() if np.ndim(v)==1 and len(v)==Nx}
+    c = [np.asarray(v,dtype=float) for v in sweep.values()] or [np.arange(Nx,dtype=float)]
+    c = np.array(c).T
+    span = np.ptp(c,axis=0)
+    return (c-c.min(axis=0))/np.where(span>0,span,1)
+
+
+###############################################################################
+### SOLVERS ###################################################################
+###############################################################################
+def _intensive(SYS,name):
+    '''ValueError when SYS has no intensive dynamics'''
+    missing = [m for m in ('intensiveRHS','jacobian') if not hasattr(SYS,m)]
+    if missing :
+        raise ValueError(name+' needs the intensive dynamics of the model : '+type(SYS).__name__+
+                         ' has no '+' and no '.join(missing)+' (see GK_Reduced, GK_FULL)')
+
+def _columns(p,x0=None,T0=None):
+    '''Nx of the parameter sets and of the guesses'''
+    n = [len(v) for v in p.values() if np.ndim(v)==1]
+    if np.ndim(x0)==2 : n.append(np.shape(x0)[1])
+    if np.ndim(T0)==1 : n.append(len(T0))
+    return max(n+[1])
+
+def _warmStart(solve,out,coords,cand):
+    '''
+    The columns cand not converged start again from the solution of the
+    nearest converged column, the closest ones first (so that the solutions
+    spread over the grid step by step), until no new column converges.
+    solve(cols,src) starts cols from src and returns which converged
+    '''
+    tried = np.full(len(cand),-1)                            # last warm start of each column
+    while True :
+        done = np.nonzero(out['converged'])[0]
+        todo = np.nonzero(cand & ~out['converged'])[0]
+        if not len(done) or not len(todo) : return
+        dist,k = cKDTree(coords[done]).query(coords[todo])
+        src  = done[k]
+        new  = src!=tried[todo]
+        if not new.any() : return
+        near = new & (dist<=2*dist[new].min())                # front of the solved region
+        todo,src = todo[near],src[near]
+        tried[todo] = src
+        conv = solve(todo,src)
+        out['source'][todo[conv]] = src[conv]
+
+def _solve(A,b):
+    '''Batched solution of A x = b, least squares for the singular matrices'''
+    try :
+        return np.linalg.solve(A,b[...,None])[...,0]
+    except np.linalg.LinAlgError :
+        return (np.linalg.pinv(A)@b[...,None])[...,0]
+
+def _newton(SYS,p,x,tol,maxiter):
+    '''
+    Damped Newton iterations on intensiveRHS (x (3,Nx)) : the step is halved
+    until the residual decreases. Returns x, residual and iterations
+    '''
+    x   = np.array(x,dtype=float)
+    it  = np.zeros(x.shape[1],dtype=int)
+    with np.errstate(all='ignore'):
+        F   = SYS.intensiveRHS(x,p)
+        res = np.linalg.norm(F,axis=0)
+        active = np.isfinite(res) & (res>tol)
+        for _ in range(maxiter):
+            cols = np.nonzero(active)[0]
+            if not len(cols) : break
+            q    = Par.sliceParams(p,cols,x.shape[1])
+            dx   = _solve(SYS.jacobian(x[:,cols],q),-F[:,cols].T).T
+            step = np.ones(len(cols))
+            for _ in range(30):                             # backtracking
+                xn  = x[:,cols]+step*dx
+                Fn  = SYS.intensiveRHS(xn,q)
+                rn  = np.linalg.norm(Fn,axis=0)
+                bad = ~(rn<res[cols])
+                if not bad.any() : break
+                step[bad] /= 2
+            good = ~bad                                     # the others are stuck
+            c    = cols[good]
+            x[:,c],F[:,c],res[c] = xn[:,good],Fn[:,good],rn[good]
+            it[cols]    += 1
+            active[cols] = good & (rn>tol)
+    return x,res,it
+
+def _step(SYS,p,x,h,M=None):
+    '''rk4 step h ((Nx,) or scalar) of the intensive dynamics, and of the derivative M (Nx,3,3) of the flow'''
+    k1 = SYS.intensiveRHS(x,p)
+    k2 = SYS.intensiveRHS(x+h/2*k1,p)
+    k3 = SYS.intensiveRHS(x+h/2*k2,p)
+    k4 = SYS.intensiveRHS(x+h*k3,p)
+    if M is not None :
+        g  = np.reshape(h,(-1,1,1))
+        K1 = SYS.jacobian(x,p)@M
+        K2 = SYS.jacobian(x+h/2*k1,p)@(M+g/2*K1)
+        K3 = SYS.jacobian(x+h/2*k2,p)@(M+g/2*K2)
+        K4 = SYS.jacobian(x+h*k3,p)@(M+g*K3)
+        M  = M+g/6*(K1+2*K2+2*K3+K4)
+    return x+h/6*(k1+2*k2+2*k3+k4),M
+
+def _flow(SYS,p,x,T,nsteps):
+    '''State after T (nsteps rk4 steps), derivative of the flow, extrema along the way'''
+    n,Nx = x.shape
+    h    = T/nsteps
+    M    = np.broadcast_to(np.eye(n),(Nx,n,n)).copy()
+    lo,hi = x.copy(),x.copy()
+    for _ in range(nsteps):
+        x,M = _step(SYS,p,x,h,M)
+        np.fmin(lo,x,out=lo)
+        np.fmax(hi,x,out=hi)
+    return x,M,lo,hi
+
+def _shooting(SYS,p,x,T,nsteps,tol,maxiter,amin):
+    '''
+    Damped Newton iterations of the shooting on (x,T), every column at once :
+    the step (at most half of the period on T) is halved until the gap
+    |flow(x,T)-x| decreases
+    '''
+    x,T  = np.array(x,dtype=float),np.array(T,dtype=float)
+    n,Nx = x.shape
+    r    = {'x' : np.full_like(x,np.nan),'min' : np.full_like(x,np.nan),'max' : np.full_like(x,np.nan),
+            'period' : np.full(Nx,np.nan),'multipliers' : np.full((Nx,n-1),np.nan,dtype=complex),
+            'converged' : np.zeros(Nx,dtype=bool),'residual' : np.full(Nx,np.inf),
+            'iterations' : np.zeros(Nx,dtype=int),'reason' : np.full(Nx,'not converged',dtype=object)}
+    xa,Ta = x.copy(),T.copy()                               # last accepted point
+    dx,dT = np.zeros_like(x),np.zeros(Nx)                   # and its Newton step
+    step  = np.ones(Nx)
+    active = np.isfinite(x).all(axis=0) & (T>0)
+    r['reason'][~active] = 'diverged'
+    with np.errstate(all='ignore'):
+        for _ in range(maxiter):
+            cols = np.nonzero(active)[0]
+            if not len(cols) : break
+            q    = Par.sliceParams(p,cols,Nx)
+            xc,Tc = x[:,cols],T[cols]
+            xT,M,lo,hi = _flow(SYS,q,xc,Tc,nsteps)
+            gap  = xT-xc
+            res  = np.linalg.norm(gap,axis=0)
+            r['iterations'][cols] += 1
+            amp  = (hi-lo).max(axis=0)
+            ok   = res<r['residual'][cols]                   # NaN : rejected
+            conv = ok & (amp>amin) & (res<=tol*amp)
+            if conv.any():
+                c = cols[conv]
+                r['x'][:,c],r['period'][c] = xc[:,conv],Tc[conv]
+                r['min'][:,c],r['max'][:,c] = lo[:,conv],hi[:,conv]
+                r['multipliers'][c] = _floquet(M[conv])
+                r['converged'][c],r['residual'][c] = True,res[conv]
+                r['reason'][c] = 'converged'
+            acc  = ok & ~conv
+            if acc.any():                                    # new Newton step
+                c = cols[acc]
+                A = np.zeros((acc.sum(),n+1,n+1))
+                A[:,:n,:n] = M[acc]-np.eye(n)
+                A[:,:n, n] = SYS.intensiveRHS(xT[:,acc],Par.sliceParams(q,acc,len(cols))).T
+                A[:, n,:n] = SYS.intensiveRHS(xc[:,acc],Par.sliceParams(q,acc,len(cols))).T   # phase condition
+                d  = _solve(A,np.concatenate((-gap[:,acc],np.zeros((1,acc.sum())))).T)
+                xa[:,c],Ta[c],r['residual'][c] = xc[:,acc],Tc[acc],res[acc]
+                dx[:,c],dT[c] = d[:,:n].T,d[:,n]
+                step[c] = np.minimum(1,Ta[c]/2/np.abs(dT[c]))
+            rej  = cols[~ok]
+            step[rej] /= 2                                   # back towards the accepted point
+            x[:,cols] = xa[:,cols]+step[cols]*dx[:,cols]
+            T[cols]   = Ta[cols]+step[cols]*dT[cols]
+            small = acc & ~(amp>amin)                        # collapsed on an equilibrium
+            gone  = ~(T[cols]>0) | ~np.isfinite(x[:,cols]).all(axis=0)
+            fail  = small | gone | ~(step[cols]>1e-3)
+            r['reason'][cols[~conv & gone]]  = 'diverged'
+            r['reason'][cols[~conv & small]] = 'collapsed'
+            active[cols] = ~conv & ~fail
+    r['residual'][~np.isfinite(r['residual'])] = np.nan
+    return r
+
+def _floquet(M):
+    '''Multipliers of the monodromy matrices M (Nx,n,n) without the trivial one (closest to 1)'''
+    mu = np.linalg.eigvals(M)
+    mu = np.take_along_axis(mu,np.argsort(np.abs(mu-1),axis=1),axis=1)[:,1:]
+    return np.take_along_axis(mu,np.argsort(-np.abs(mu),axis=1),axis=1)
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+STORAGE OF THE TRAJECTORY
+
+The temporal loop hands every Tstore-th state to a store, chosen with
+parNum['StorageMode'] :
+*    'full'  : every stored state is kept in Y_s (Nvar, Ns, Nx)
+*    'last'  : only the last state is kept, Y_s is (Nvar, 1, Nx)
+*    'stats' : as 'last', plus running statistics over the stored states,
+               returned in info['stats']
+Whatever the mode, finalize gives back (Y_s, t_s) that expandY_simple can read.
+
+In 'full' mode, parNum['Output'] chooses where the trajectory goes :
+*    'memory' : a numpy array
+*    'memmap' : streamed by chunks of parNum['Chunk'] states into
+                parNum['OutputPath']/Y_s.npy, Y_s is a read-only np.memmap
+*    'hdf5'   : streamed into the HDF5 file parNum['OutputPath'] (needs h5py),
+                Y_s is the h5py dataset
+Only one chunk is in memory during the run, and the results read the file
+lazily : expandY_simple gives memmap views (Results.VariableView for HDF5),
+so plots and getperiods only load what they use. loadTrajectory reopens a stored run.
+
+The stores can be pickled (Checkpoint) : only the written part of a
+MemoryStore is saved, the file stores reopen their file.
+"""
+import os
+import numpy as np
+import Observers as Obs
+try :
+    import h5py
+except ImportError :
+    h5py = None
+
+
+def createStore(SYS,pN,info):
+    '''Store corresponding to pN['StorageMode'] (default 'full') and pN['Output']'''
+    mode   = pN.get('StorageMode','full')
+    output = pN.get('Output','memory')
+    dtype  = pN.get('dtype',float)                   # precision of Y_s, t_s stays float64
+    if mode=='full' and output=='memmap' :
+        return MemmapStore(SYS.Nvar,pN['Ns'],pN['Nx'],pN['OutputPath'],pN.get('Chunk',256),dtype)
+    if mode=='full' and output=='hdf5' :
+        return HDF5Store  (SYS.Nvar,pN['Ns'],pN['Nx'],pN['OutputPath'],pN.get('Chunk',256),dtype)
+    if mode=='full'  : return MemoryStore(SYS.Nvar,pN['Ns'],pN['Nx'],dtype)
+    if mode=='last'  : return LastStore  (SYS.Nvar,pN['Nx'],dtype)
+    if mode=='stats' : return StatsStore (SYS,pN['Nx'],info,dtype)
+    raise ValueError('Unknown StorageMode : '+str(mode))
+
+
+class MemoryStore():
+    '''Whole trajectory in memory'''
+    def __init__(self,Nvar,Ns,Nx,dtype=float):
+        self.Y_s = np.zeros((Nvar,Ns,Nx),dtype=dtype)
+        self.t_s = np.zeros(Ns)
+        self.Ns  = 0
+
+    def write(self,k,t,y):
+        self.Y_s[:,k,:] = y
+        self.t_s[k]     = t
+        self.Ns         = k+1
+
+    def finalize(self):
+        return self.Y_s[:,:self.Ns,:], self.t_s[:self.Ns]
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['shape'] = self.Y_s.shape
+        state['Y_s']   = self.Y_s[:,:self.Ns,:]
+        return state
+
+    def __setstate__(self,state):
+        Y_s = np.zeros(state.pop('shape'),dtype=state['Y_s'].dtype)
+        Y_s[:,:state['Ns'],:] = state['Y_s']
+        self.__dict__.update(state,Y_s=Y_s)
+
+
+class LastStore():
+    '''Only the most recent state'''
+    def __init__(self,Nvar,Nx,dtype=float):
+        self.Y_s = np.zeros((Nvar,1,Nx),dtype=dtype)
+        self.t_s = np.zeros(1)
+
+    def write(self,k,t,y):
+        self.Y_s[:,0,:] = y
+        self.t_s[0]     = t
+
+    def finalize(self):
+        return self.Y_s, self.t_s
+
+
+class StatsStore(LastStore):
+    '''
+    Last state, plus for each variable and column the running mean,
+    standard deviation (Welford), minimum and maximum over the stored states
+    '''
+    def __init__(self,SYS,Nx,info,dtype=float):
+        LastStore.__init__(self,SYS.Nvar,Nx,dtype)
+        self.variables = SYS.variables
+        self.info      = info
+        self.moments   = Obs.RunningMoments(SYS.variables)
+        self.envelope  = Obs.Envelope      (SYS.variables)
+
+    def write(self,k,t,y):
+        LastStore.write(self,k,t,y)
+        sample = {name : y[i] for i,name in enumerate(self.variables)}
+        self.moments .update(t,sample)
+        self.envelope.update(t,sample)
+
+    def finalize(self):
+        m,e = self.moments.result(),self.envelope.result()
+        self.info['stats']      = {name : dict(m[name],**e[name]) for name in self.variables}
+        self.info['stats']['Nsamples'] = m['Nsamples']
+        return LastStore.finalize(self)
+
+
+class ColumnStore():
+    '''
+    Writes the columns c0:c1 of an existing (Nvar,Ns,Nx) array, used by the
+    ensemble runner to fill a shared or memory-mapped trajectory. The state k
+    goes in Y_s[:,k0+k] (Checkpoint.Continue appends after k0 states)
+    '''
+    def __init__(self,Y_s,c0,c1,k0=0):
+        self.Y_s  = Y_s
+        self.cols = slice(c0,c1)
+        self.t_s  = np.zeros(Y_s.shape[1])
+        self.k0   = k0
+        self.Ns   = 0
+
+    def write(self,k,t,y):
+        self.Y_s[:,self.k0+k,self.cols] = y
+        self.t_s[self.k0+k]             = t
+        self.Ns                         = self.k0+k+1
+
+    def finalize(self):
+        return self.Y_s[:,:self.Ns,self.cols], self.t_s[:self.Ns]
+
+
+class ChunkedStore():
+    '''
+    Keeps Nchunk states in a buffer and flushes them to disk with _flush.
+    Children define _flush(k0,buffer) and finalize
+    '''
+    def __init__(self,Nvar,Ns,Nx,chunk,dtype=float):
+        self.buf = np.empty((Nvar,min(chunk,Ns),Nx),dtype=dtype)
+        self.t_s = np.zeros(Ns)
+        self.k0  = 0                                 # first index of the buffer
+        self.n   = 0                                 # states in the buffer
+
+    def write(self,k,t,y):
+        self.buf[:,self.n,:] = y
+        self.t_s[k]          = t
+        self.n              += 1
+        if self.n==self.buf.shape[1] : self.flush()
+
+    def flush(self):
+        if self.n : self._flush(self.k0,self.buf[:,:self.n,:])
+        self.k0 += self.n
+        self.n   = 0
+
+
+class MemmapStore(ChunkedStore):
+    '''Trajectory streamed to path/Y_s.npy, time to path/t_s.npy'''
+    def __init__(self,Nvar,Ns,Nx,path,chunk,dtype=float):
+        ChunkedStore.__init__(self,Nvar,Ns,Nx,chunk,dtype)
+        os.makedirs(path,exist_ok=True)
+        self.path = path
+        self.Y_s  = np.lib.format.open_memmap(os.path.join(path,'Y_s.npy'),mode='w+',
+                                              dtype=self.buf.dtype,shape=(Nvar,Ns,Nx))
+
+    def _flush(self,k0,buf):
+        self.Y_s[:,k0:k0+buf.shape[1],:] = buf
+        self.Y_s.flush()
+
+    def finalize(self):
+        self.flush()
+        np.save(os.path.join(self.path,'t_s.npy'),self.t_s[:self.k0])
+        del self.Y_s
+        Y_s,t_s = loadTrajectory(self.path)
+        return Y_s[:,:self.k0,:], t_s
+
+    def __getstate__(self):
+        self.Y_s.flush()
+        return {k : v for k,v in self.__dict__.items() if k!='Y_s'}
+
+    def __setstate__(self,state):
+        self.__dict__.update(state)
+        self.Y_s = np.load(os.path.join(self.path,'Y_s.npy'),mmap_mode='r+')
+
+
+class HDF5Store(ChunkedStore):
+    '''Trajectory streamed to the datasets Y_s and t_s of an HDF5 file'''
+    def __init__(self,Nvar,Ns,Nx,path,chunk,dtype=float):
+        if h5py is None : raise ImportError("Output='hdf5' needs h5py, use Output='memmap'")
+        ChunkedStore.__init__(self,Nvar,Ns,Nx,chunk,dtype)
+        self.path = path
+        self.file = h5py.File(path,'w')
+        self.Y_s  = self.file.create_dataset('Y_s',shape=(Nvar,Ns,Nx),maxshape=(Nvar,None,Nx),
+                                             chunks=(Nvar,self.buf.shape[1],min(Nx,4096)),
+                                             dtype=self.buf.dtype)
+
+    def _flush(self,k0,buf):
+        self.Y_s[:,k0:k0+buf.shape[1],:] = buf
+
+    def finalize(self):
+        self.flush()
+        self.Y_s.resize(self.k0,axis=1)
+        self.file.create_dataset('t_s',data=self.t_s[:self.k0])
+        self.file.close()
+        return loadTrajectory(self.path)
+
+    def __getstate__(self):
+        self.file.flush()
+        return {k : v for k,v in self.__dict__.items() if k not in ('file','Y_s')}
+
+    def __setstate__(self,state):
+        if h5py is None : raise ImportError('Reading an HDF5 trajectory needs h5py')
+        self.__dict__.update(state)
+        self.file = h5py.File(self.path,'r+')
+        self.Y_s  = self.file['Y_s']
+
+
+def loadTrajectory(path):
+    '''
+    Reopen (without reading it) a trajectory written by a MemmapStore (folder)
+    or a HDF5Store (file). Returns Y_s, t_s
+    '''
+    if os.path.isdir(path) :
+        return (np.load(os.path.join(path,'Y_s.npy'),mmap_mode='r'),
+                np.load(os.path.join(path,'t_s.npy')))
+    if h5py is None : raise ImportError('Reading an HDF5 trajectory needs h5py')
+    f = h5py.File(path,'r')
+    return f['Y_s'], f['t_s'][:]
@@ -67,6 +67,17 @@ def VariableDictionnary(result) :
         'd'     : {'name':'Relative debt', 
                    'type':'intensive',
                    'unit':'no'},
+
+        ### CLIMATE VARIABLES
+        'T'     : {'name':'Temperature anomaly', 
+                   'type':'intensive',
+                   'unit':'$^{\\circ}C$'},
+        'CO2at' : {'name':'Atmospheric carbon', 
+                   'type':'extensive',
+                   'unit':'GtC'},
+        'E'     : {'name':'CO2 emissions', 
+                   'type':'extensive',
+                   'unit':'GtC per year'},
         }
 
     Result_keys = result.keys()
@@ -156,37 +156,24 @@ def PeriodPlots(r,p,op,title='skp'):
     ax4=plt.subplot(234)
     ax5=plt.subplot(235)
     ax6=plt.subplot(236)
+    c = r['cycles']
+    growth = 'growth' in c                            # only measured by getperiods when the model has g
     for j in range(p['Nx']):
-        
-        Tv=[]
-        gv=[]
-        tv=[]
-        lm=[]
-        deltalamb=[]
-        for z in range(len(r['PeriodID'][j])-1):
-            id1 = r['PeriodID'][j][z]
-            id2 = r['PeriodID'][j][z+1]
-            
-            t2 = r['t'][id2]
-            t1 = r['t'][id1]
-    
-            T   =t2-t1        
-            gmoy=(np.sum(r['g'][id1:id2])*p['dt'])/T
-    
-            Tv.append(T)
-            gv.append(gmoy)
-            tv.append((t1+t2)/2)
-            lm.append(r['lambda'][id1,j])
-            deltalamb.append(r['lambda'][id1,j]-r['lambda'][id2,j])
-            #plt.plot((t1+t2)/2,T,'*')
-    
-            #plt.plot(T,gmoy,'*')
-        ax1.plot(Tv,gv       ,c=cm[j,:])
+        cyc = slice(c['offsets'][j],c['offsets'][j+1])
+        Tv  = c['period'][cyc]
+        tv  = c['tmid'][cyc]
+        lm  = c['lambdapeak'][cyc]
+        if growth :
+            gv  = c['growth'][cyc]
+            ax1.plot(Tv,gv       ,c=cm[j,:])
+            ax3.plot(tv,gv       ,c=cm[j,:])
+            ax5.plot(lm,gv       ,c=cm[j,:])
         ax2.plot(tv,Tv       ,c=cm[j,:])
-        ax3.plot(tv,gv       ,c=cm[j,:])
         ax4.plot(lm,Tv       ,c=cm[j,:])
-        ax5.plot(lm,gv       ,c=cm[j,:])
-        ax6.semilogy(tv,np.array(deltalamb)/np.array(Tv),c=cm[j,:])
+        ax6.semilogy(tv,c['deltalambda'][cyc]/Tv,c=cm[j,:])
+    if not growth :
+        for ax in (ax1,ax3,ax5):
+            ax.text(0.5,0.5,'no growth rate g\nin this model',ha='center',va='center',transform=ax.transAxes)
     
     #    ax6.plot(lm,gv,'-*',c=cm[j,:])
     ax1.set_xlabel('Period of a cycle')
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""The modules of the code are flat in the parent folder"""
+import os
+import sys
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import ClassesGoodwin as CG
+import Parameters as Par
+import Miscfunc as M
+
+
+def build(model='GK_Reduced',Nx=5,Tmax=10,Tstore=0.1,params=None,**parNum):
+    '''
+    System, parameters, numerical parameters, initial state and operators of a run.
+    model is a class name of ClassesGoodwin or a system instance, params updates
+    BasicParameters (k2 is spread on (15,25) by default) : a (lo,hi) tuple is spread
+    over the Nx columns. The other keywords update parnum.
+    '''
+    SYS = getattr(CG,model)() if isinstance(model,str) else model
+    p   = Par.BasicParameters()
+    p.update(dict({'k2' : (15,25)},**(params or {})))
+    for k,v in p.items() :
+        if isinstance(v,tuple) : p[k] = np.linspace(*v,Nx) if Nx>1 else np.mean(v)
+    pN  = Par.parnum()
+    pN.update(Nx=Nx,Tmax=Tmax,Tstore=Tstore,**parNum)
+    pN['Nt'] = int(round(Tmax/pN['dt']))
+    pN['Ns'] = int(round(Tmax/pN['Tstore']))+1
+    p['dt']  = pN['dt']
+    ic       = Par.initCond(p,pN)
+    ic['N']  = ic['Y']/ic['lambda']
+    return SYS,p,pN,SYS.initializeY(ic,pN),M.prepareOperators(pN)
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import os
+import numpy as np
+import pytest
+import Miscfunc as M
+import Checkpoint as Ckp
+from conftest import build
+
+
+def setup(Nx=20,Tmax=20,**kw):
+    return build('GK_Reduced',Nx,Tmax,**kw)
+
+def reference(**kw):
+    SYS,p,pN,y,op = setup(**kw)
+    Y_s,t_s = M.TemporalLoop(y,SYS,op,pN,p,{})
+    return np.array(Y_s),np.array(t_s)
+
+
+@pytest.mark.parametrize('output',['memory','memmap'])
+def test_resume_equals_uninterrupted_run(tmp_path,output):
+    kw = {'Output':output,'OutputPath':str(tmp_path/'traj')}
+    SYS,p,pN,y,op = setup(Checkpoint=str(tmp_path/'ckpt'),CheckpointEvery=700,**kw)
+    M.TemporalLoop(y,SYS,op,pN,p,{})                     # last checkpoint at step 1400 of 2000
+    assert Ckp.load(str(tmp_path/'ckpt'),SYS)['i']==1400
+    Y_s,t_s = Ckp.Resume(str(tmp_path/'ckpt'),SYS,op,{})
+    Y_r,t_r = reference(**dict(kw,OutputPath=str(tmp_path/'ref')))
+    assert np.array_equal(np.array(Y_s),Y_r)
+    assert np.array_equal(t_s,t_r)
+
+def test_checkpoint_does_not_hold_the_trajectory(tmp_path):
+    sizes = []
+    for every in (300,1500):                             # early and late last checkpoint
+        folder = str(tmp_path/str(every))
+        SYS,p,pN,y,op = setup(Checkpoint=folder,CheckpointEvery=every)
+        M.TemporalLoop(y,SYS,op,pN,p,{})
+        sizes.append(os.path.getsize(os.path.join(folder,Ckp.FILENAME)))
+    assert abs(sizes[1]-sizes[0]) < 100                  # 120 more stored states : 57 kB
+
+def test_checkpoint_refuses_jit_and_compaction(tmp_path):
+    for key in ('JIT','Compaction'):
+        SYS,p,pN,y,op = setup(Checkpoint=str(tmp_path),**{key:True})
+        with pytest.raises(ValueError):
+            M.TemporalLoop(y,SYS,op,pN,p,{})
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import ClassesGoodwin as CG
+import Parameters as Par
+import Miscfunc as M
+import Stability as Stab
+from conftest import build
+
+
+def run(Nx,Tmax,k2,r=(0.03,0.03),dt=0.01,**kw):
+    SYS,p,pN,y,op = build('GK_Reduced',Nx,Tmax,Tstore=1.,params={'k2' : k2, 'r' : r},dt=dt,**kw)
+    info     = {}
+    with np.errstate(all='ignore'):
+        Y_s,t_s = M.TemporalLoop(y,SYS,op,pN,p,info)
+    return np.asarray(Y_s),t_s,info,p
+
+
+def test_events_same_as_plain_run():
+    kw = dict(Nx=12,Tmax=100,k2=(5,40),r=(0.01,0.2),Events=Par.CrisisEvents())   # some debt crises
+    Y,t,info       = run(**kw)[:3]
+    Yc,tc,infoc    = run(Compaction=True,**kw)[:3]
+    assert np.array_equal(Yc,Y) and np.array_equal(tc,t)
+    for k in ('time','code','alive') :
+        assert np.array_equal(infoc['events'][k],info['events'][k],equal_nan=True)
+    frac = infoc['compaction']['active_fraction']
+    assert frac[0]==1 and (np.diff(frac)<0).all()
+    assert frac[-1]==info['events']['alive'].mean()
+    assert np.isnan(infoc['compaction']['converged_time']).all()
+
+def test_fixed_points():
+    tol,every,dt = 1e-6,100,0.05
+    kw = dict(Nx=6,Tmax=250,k2=(5,15),dt=dt)
+    Y,t,_,p     = run(**kw)
+    Yc,_,info,_ = run(Compaction=True,FixedPointTol=tol,CompactEvery=every,**kw)
+    tconv = info['compaction']['converged_time']
+    assert np.isfinite(tconv).all()
+    assert np.array_equal(np.sort(tconv),info['compaction']['t'][1:])
+    SYS   = CG.GK_Reduced()
+    pd    = dict(p,dt=1)
+    speed = np.array([np.max(np.abs(SYS.f(Y[:,k],{},pd))/(np.abs(Y[:,k])+1e-9),axis=0) for k in range(len(t))])
+    K     = int(round(every*dt/(t[1]-t[0])))                             # stored states between two checks
+    for j,tj in enumerate(tconv) :
+        k = np.searchsorted(t,tj)
+        assert np.isclose(t[k],tj) and speed[k,j]<tol and speed[k-K,j]>=tol       # first check below tol
+        assert np.array_equal(Yc[:,:k+1,j],Y[:,:k+1,j])
+    mu  = -Stab.Equilibria(SYS,p)['solow']['eigenvalues'].real.max(axis=1)
+    dev = np.abs(Yc-Y).max(axis=1).max(axis=0)
+    assert (dev <= tol*np.abs(Y[:,-1]).max(axis=0)/mu).all()
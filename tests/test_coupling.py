@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+import Miscfunc as M
+from conftest import build
+
+
+def run(model,Nx,Tmax=10,**par):
+    SYS,p,pN,y,op = build(model,Nx,Tmax,params=dict({'k2' : 20},**par))
+    y[1]*= np.linspace(0.95,1,Nx)                                # sites that differ
+    return M.TemporalLoop(y,SYS,op,pN,p,{})[0]
+
+
+@pytest.mark.parametrize('Nx',[1,2,3,7])
+def test_ring_operators(Nx):
+    op    = M.prepareOperators({'Nx' : Nx})
+    shift = lambda k : np.roll(np.eye(Nx),k,axis=1)             # value of the site i+k
+    assert np.array_equal(op['laplacian'].toarray(),shift(-1)-2*np.eye(Nx)+shift(1))
+    assert np.allclose(op['3diag'].toarray(),(shift(-1)+np.eye(Nx)+shift(1))/3,rtol=0,atol=1e-15)
+    assert np.array_equal(op['diff_cent'].toarray(),(shift(1)-shift(-1))/2)
+
+def test_one_site_ring_is_uncoupled():
+    assert np.array_equal(run('GK_Reduced_Coupled',1,g1=0.1,g2=0.1),run('GK_Reduced',1))
+
+def test_two_site_ring_diffuses():
+    Y0 = run('GK_Reduced_Coupled',2)
+    Y  = run('GK_Reduced_Coupled',2,g2=0.5)
+    assert np.isfinite(Y).all()
+    assert np.abs(np.diff(Y[1,-1])) < np.abs(np.diff(Y0[1,-1]))
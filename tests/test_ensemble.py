@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+import Parameters as Par
+import Miscfunc as M
+import Ensemble as Ens
+from conftest import build
+
+
+def run(loop,Nx=12,Tmax=60,k2=(5,40),r=(0.01,0.2),**kw):
+    SYS,p,pN,y,op = build('GK_Reduced',Nx,Tmax,params={'k2' : k2, 'r' : r},**kw)   # some columns end in a debt crisis
+    info     = {}
+    with np.errstate(all='ignore'):
+        Y_s,t_s = loop(y,SYS,op,pN,p,info)
+    return np.asarray(Y_s),t_s,info
+
+def same(a,b):
+    if isinstance(a,dict) :
+        return set(a)==set(b) and all(same(a[k],b[k]) for k in a)
+    return np.array_equal(np.asarray(a),np.asarray(b),equal_nan=np.asarray(a).dtype.kind in 'fc')
+
+
+@pytest.mark.parametrize('kw',[dict(Events=Par.CrisisEvents()),
+                               dict(Events=Par.CrisisEvents(),Compaction=True,CompactEvery=50,FixedPointTol=1e-3),
+                               dict(StorageMode='stats')])
+def test_same_as_serial(kw):
+    Y,t,info    = run(M.TemporalLoop,**kw)
+    Yp,tp,infop = run(lambda *a : Ens.ParallelTemporalLoop(*a,Nworkers=2),**kw)
+    assert len(infop.pop('shards'))==2
+    assert np.array_equal(Yp,Y) and np.array_equal(tp,t)
+    assert same(infop,info)
+    if 'Events' in kw : assert 0 < info['events']['alive'].sum() < len(info['events']['alive'])
+
+def test_every_column_terminated():
+    kw = dict(Events=Par.CrisisEvents(),Tmax=300,k2=(30,40),r=(0.15,0.2))
+    Y,t,info    = run(M.TemporalLoop,Nx=4,**kw)
+    _,_,infop   = run(lambda *a : Ens.ParallelTemporalLoop(*a,Nworkers=2),Nx=4,**kw)
+    assert 'Tend' in info and infop['Tend']==info['Tend']
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import warnings
+import numpy as np
+import pytest
+import Parameters as Par
+import Miscfunc as M
+import Checkpoint as Ckp
+from conftest import build
+
+
+def setup(model,**kw):
+    params = {'k2' : (5,40), 'r' : (0.01,0.2)}              # some columns end in a debt crisis
+    return build(model,40,Tmax=100,params=params,**kw)
+
+def run(model,**kw):
+    SYS,p,pN,y,op = setup(model,**kw)
+    info    = {}
+    Y_s,t_s = M.TemporalLoop(y,SYS,op,pN,p,info)
+    return np.array(Y_s),t_s,info
+
+
+@pytest.mark.parametrize('model',['GK_Reduced','GK_FULL'])
+def test_terminated_columns_are_not_integrated(model):
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')                           # no overflow in the frozen columns
+        Y_s,t_s,info = run(model,Events=Par.CrisisEvents())
+    ev   = info['events']
+    dead = np.nonzero(~ev['alive'])[0]
+    assert 0 < len(dead) < len(ev['alive'])
+    with np.errstate(all='ignore'):
+        free,_,_ = run(model)
+    alive = ev['alive']
+    assert np.array_equal(Y_s[:,:,alive],free[:,:,alive])
+    for j in dead :
+        k = np.searchsorted(t_s,ev['time'][j])+1                 # first state stored after the event
+        assert (Y_s[:,k:,j]==Y_s[:,-1:,j]).all()
+        assert np.array_equal(Y_s[:,:k-1,j],free[:,:k-1,j])
+
+def test_checkpoint_resume_with_events(tmp_path):
+    ref,t_ref,info = run('GK_Reduced',Events=Par.CrisisEvents())
+    SYS,p,pN,y,op  = setup('GK_Reduced',Events=Par.CrisisEvents(),Checkpoint=str(tmp_path),CheckpointEvery=4000)
+    M.TemporalLoop(y,SYS,op,pN,p,{})
+    res  = {}
+    Y_s,t_s = Ckp.Resume(str(tmp_path),SYS,op,res)
+    assert np.array_equal(np.array(Y_s),ref) and np.array_equal(t_s,t_ref)
+    assert np.array_equal(res['events']['time'],info['events']['time'],equal_nan=True)
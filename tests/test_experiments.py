@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import os
+import numpy as np
+import pytest
+import Miscfunc as M
+import Experiments as Exp
+from conftest import build
+
+
+@pytest.fixture
+def saved(tmp_path):
+    SYS,p,pN,y,op = build('GK_Reduced',6,Tmax=5,SaveChunk=4)       # two chunks : columns 0-3 and 4-5
+    Y_s,t_s  = M.TemporalLoop(y,SYS,op,pN,p,{})
+    store    = Exp.ExperimentStore(str(tmp_path/'Experiments'))
+    run      = store.save(SYS,Y_s,t_s,p,pN,tag='k2 sweep',dtype=np.float32)
+    return store,run,SYS,np.asarray(Y_s),t_s,p,pN
+
+
+def test_float32_round_trip(saved):
+    store,run,SYS,Y_s,t_s,p,pN = saved
+    Y,t = store.load(run)
+    assert Y.dtype==np.float32 and np.array_equal(Y,Y_s.astype(np.float32))
+    assert np.array_equal(t,t_s)
+    inf = store.info(run)
+    assert (inf['model'],inf['Nx'],inf['chunk'],inf['dtype'])==('GK_Reduced',6,4,'float32')
+    assert store.meta(run)['variables']==list(SYS.variables) and np.array_equal(store.meta(run)['params']['k2'],p['k2'])
+
+def test_load_columns_across_chunks(saved):
+    store,run,SYS,Y_s,t_s,p,pN = saved
+    i   = SYS.variables.index('lambda')
+    Y,_ = store.load(run,variables=['lambda'],cols=[4,1])
+    assert np.array_equal(Y,Y_s[[i]][:,:,[4,1]].astype(np.float32))
+    Y,_ = store.load(run,cols=np.arange(6)%2==1)
+    assert np.array_equal(Y,Y_s[:,:,1::2].astype(np.float32))
+    Y,_ = store.load(run,cols=slice(2,6))
+    assert np.array_equal(Y,Y_s[:,:,2:].astype(np.float32))
+
+def test_find(saved):
+    store,run,SYS,Y_s,t_s,p,pN = saved
+    other = store.save(SYS,Y_s,t_s,dict(p,k2=40.),pN,tag='other')
+    assert store.find(k2=20)==[run] and store.find(k2=40)==[other]
+    assert store.find(k2=30)==[]
+    assert store.find(k2=(24,50))==[run,other] and store.find(k2=(26,30))==[]
+    assert store.find(model='GK_Reduced',tag='k2 sweep',r=p['r'])==[run]
+    assert store.find(model='GK_FULL')==[]
+
+def test_results_columns(saved):
+    store,run,SYS,Y_s,t_s,p,pN = saved
+    full = store.results(run,SYS)
+    r    = store.results(run,SYS,cols=[4,1])
+    assert np.array_equal(r['lambda'],full['lambda'][:,[4,1]])
+    assert np.array_equal(r['kappa'],full['kappa'][:,[4,1]])         # depends on the sliced k2
+
+def test_delete(saved):
+    store,run,SYS,Y_s,t_s,p,pN = saved
+    other = store.save(SYS,Y_s,t_s,p,pN,tag='copy')
+    store.delete(run)
+    assert store.find()==[other] and not os.path.exists(store.folder(run))
+    with pytest.raises(KeyError):
+        store.info(run)
+    assert np.array_equal(store.load(other)[0],Y_s)
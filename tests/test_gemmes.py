@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import ClassesGoodwin as CG
+from conftest import build
+
+
+def setup(SYS,Nx=10):
+    SYS,p,pN,y,op = build(SYS,Nx)
+    return p,y
+
+
+def test_fused_rhs_is_f():
+    SYS  = CG.GEMMES()
+    p,y  = setup(SYS)
+    out  = np.empty_like(y)
+    assert SYS.fusedRHS(p)(y,None,p,out=out) is out
+    assert np.array_equal(out,SYS.f(y,None,p))
+    assert np.isfinite(out).all()
+
+def test_no_damage_is_gk_full():
+    SYS,GK = CG.GEMMES(),CG.GK_FULL()
+    p,y    = setup(SYS)
+    p.update(pi1=0.,pi2=0.,pi3=0.,fk=0.,n=0.)
+    eco    = [SYS.variables.index(v) for v in GK.variables]
+    assert np.array_equal(SYS.f(y,None,p)[eco],GK.f(y[eco],None,p))
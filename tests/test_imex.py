@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+import Miscfunc as M
+from conftest import build
+
+
+def run(method,dt,model='GK_Reduced_Coupled',Nx=20,Tmax=10,g2=0.5):
+    SYS,p,pN,y,op = build(model,Nx,Tmax,params={'k2' : 20, 'g2' : g2},dt=dt,method=method)
+    y[1]*= np.linspace(0.95,1,Nx)                                # sites that differ
+    return M.TemporalLoop(y,SYS,op,pN,p,{})[0]
+
+
+def test_second_order():
+    ref   = run('rk4',1e-3)
+    err   = [np.abs(run('imex',dt)-ref).max() for dt in (0.02,0.01,0.005)]
+    order = np.log2(np.array(err[:-1])/err[1:])
+    assert (order > 1.8).all(), err
+
+def test_stiff_diffusion():
+    Y = run('imex',0.05,g2=100.)                                 # rk4 is unstable at this dt
+    assert np.isfinite(Y).all()
+    assert np.ptp(Y[1,-1]) < 1e-3*np.ptp(Y[1,0])                 # the sites are synchronized
+    with np.errstate(all='ignore'):
+        assert not np.isfinite(run('rk4',0.05,g2=100.)).all()
+
+def test_model_without_implicit_part():
+    with pytest.raises(ValueError,match='implicit part'):
+        run('imex',0.01,model='GK_Reduced',Tmax=0.1)
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+import Miscfunc as M
+from conftest import build
+
+
+def run(Nx=5,Tmax=20,**kw):
+    SYS,p,pN,y,op = build('GK_Reduced',Nx,Tmax,**kw)
+    info     = {}
+    Y_s,t_s  = M.TemporalLoop(y,SYS,op,pN,p,info)
+    return np.array(Y_s),t_s,info
+
+
+@pytest.mark.parametrize('method',['dopri5','cashkarp'])
+def test_adaptive_agrees_with_rk4(method):
+    ref,t_ref,_ = run()
+    Y_s,t_s,info = run(method=method,rtol=1e-8,atol=1e-10)
+    assert Y_s.shape==ref.shape
+    assert np.allclose(t_s,t_ref,rtol=0,atol=1e-9)
+    assert np.abs(Y_s-ref).max() < 1e-5*np.abs(ref).max()
+    assert len(info['dt_steps']) < 2000/4                         # fewer steps than rk4 at dt=0.01
+    assert len(info['t_steps'])==len(info['dt_steps'])
+
+def test_tolerance_controls_the_error():
+    ref,_,_ = run()
+    err = [np.abs(run(method='dopri5',rtol=tol,atol=tol*1e-2)[0]-ref).max() for tol in (1e-4,1e-8)]
+    assert err[1] < err[0]
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        run(method='euler')
+
+def test_dtmin_stops_with_a_warning():
+    with pytest.warns(RuntimeWarning,match='dtmin'):
+        Y_s,t_s,info = run(method='dopri5',rtol=1e-8,atol=1e-10,dtmin=0.2)
+    assert 0 < info['Tend'] < t_s[-1]
+    k = np.searchsorted(t_s,info['Tend'],side='right')
+    assert np.isfinite(Y_s[:,:k]).all() and np.isnan(Y_s[:,k:]).all()
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+import Parameters as Par
+import Miscfunc as M
+import Storage as S
+import JIT as J
+from conftest import build
+
+
+def setup(model):
+    return build(model,8,Tmax=5,RHS='fused')[:4]
+
+def kernelRun(model,jit):
+    '''Trajectory of the kernel loop, written in a MemoryStore as TemporalLoop does'''
+    SYS,p,pN,y = setup(model)
+    p['dt'] = pN['dt']
+    store   = S.MemoryStore(SYS.Nvar,pN['Ns'],pN['Nx'])
+    store.write(0,0,y)
+    J.TemporalLoop(y,SYS,pN,p,store,M.storageStep(pN),jit=jit)
+    return store.finalize()
+
+def numpyRun(model):
+    SYS,p,pN,y = setup(model)
+    return M.TemporalLoop(y,SYS,M.prepareOperators(pN),pN,p,{})
+
+
+@pytest.mark.parametrize('model',sorted(J.KERNELS))
+def test_kernel_loop_matches_numpy_rk4(model):
+    Y_j,t_j = kernelRun(model,jit=False)                 # same loop, interpreted
+    Y_n,t_n = numpyRun(model)
+    assert np.array_equal(t_j,t_n)
+    assert np.array_equal(Y_j,Y_n)
+
+@pytest.mark.parametrize('model',sorted(J.KERNELS))
+def test_compiled_loop_matches_numpy_rk4(model):
+    pytest.importorskip('numba')
+    Y_j,t_j = kernelRun(model,jit=True)
+    Y_n,t_n = numpyRun(model)
+    assert np.array_equal(t_j,t_n)
+    np.testing.assert_allclose(Y_j,Y_n,rtol=1e-12,atol=0)   # the compiler may contract the operations
+
+def test_jit_is_opt_in():
+    SYS,p,pN,y = setup('GK_Reduced')
+    assert Par.parnum()['JIT'] is False
+    info = {}
+    M.TemporalLoop(y,SYS,{},pN,p,info)
+    assert info['backend']=='numpy'
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+import ClassesGoodwin as CG
+import ModelSpec as MS
+import Parameters as Par
+
+
+def state(Nx=50,dtype=float):
+    p   = Par.BasicParameters()
+    pN  = Par.parnum()
+    pN.update(Nx=Nx,dtype=dtype)
+    p['k2'] = np.linspace(15,25,Nx)
+    p['dt'] = pN['dt']
+    p   = Par.castParams(p,dtype)
+    y   = CG.GK_Reduced().initializeY(Par.initCond(p,pN),pN)
+    y  *= np.random.default_rng(0).uniform(0.9,1.1,y.shape).astype(dtype)
+    return p,pN,y
+
+
+@pytest.mark.parametrize('dtype',[np.float64,np.float32])
+def test_fused_rhs_is_f_in_place(dtype):
+    SYS    = MS.compileModel(MS.GK_REDUCED)
+    p,pN,y = state(dtype=dtype)
+    out    = np.empty_like(y)
+    rhs    = SYS.fusedRHS(p)
+    assert rhs(y,None,p,out=out) is out
+    assert np.array_equal(out,SYS.f(y,None,p))
+    assert np.array_equal(rhs(y,None,p),out)
+
+def test_spec_matches_the_class():
+    p,pN,y = state()
+    ref    = CG.GK_Reduced().f(y,None,p)
+    assert np.array_equal(MS.compileModel(MS.GK_REDUCED).fusedRHS(p)(y,None,p),ref)
+
+def test_constants_are_not_renamed():
+    spec = {'variables'      : {'x' : 'where(up, -x, x*a)', 'lambda' : '-lambda'},
+            'intermediaries' : {'up' : '(x > 1) == True'}}
+    SYS  = MS.compileModel(spec)
+    assert SYS.parameters==['a']
+    p    = {'a' : 2., 'dt' : 0.1}
+    y    = np.array([[0.5,2.],[1.,1.]])
+    dy   = np.array([[0.1,-0.2],[-0.1,-0.1]])
+    assert np.allclose(SYS.f(y,None,p),dy)
+    assert np.array_equal(SYS.fusedRHS(p)(y,None,p),SYS.f(y,None,p))
+    assert SYS.intermediaryfuncs['up']({'x' : y[0]},p).tolist()==[False,True]
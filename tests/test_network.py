@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import os
+import numpy as np
+import scipy.sparse as sp
+import Miscfunc as M
+import Network as Net
+import Parameters as Par
+
+
+def test_weighted_edge_list():
+    op = Net.networkOperators([[0,1,2.],[1,2,1.]],3)
+    assert np.array_equal(op['adjacency'].toarray(),[[0,2,0],[2,0,1],[0,1,0]])
+    assert np.allclose(op['average'].toarray(),[[0,1,0],[2/3,0,1/3],[0,1,0]])
+    assert np.allclose(op['laplacian'].toarray(),op['average'].toarray()-np.eye(3))
+    assert np.allclose(op['Mean'] @ np.arange(3.),1.)
+
+def test_edge_in_both_directions_counts_once():
+    op = Net.networkOperators([[0,1],[1,0],[1,2]],3)
+    assert np.array_equal(op['adjacency'].toarray(),[[0,1,0],[1,0,1],[0,1,0]])
+    assert np.allclose(op['average'].toarray()[1],[0.5,0,0.5])
+
+def test_symmetric_sparse_input(tmp_path):
+    A = sp.csr_matrix(np.array([[0,1,0],[1,0,2],[0,2,0]],dtype=float))
+    assert np.array_equal(Net.adjacency(A,3).toarray(),A.toarray())
+    sp.save_npz(str(tmp_path/'graph.npz'),A)
+    np.savetxt(str(tmp_path/'graph.txt'),[[0,1,1],[1,2,2]])
+    for f in ('graph.npz','graph.txt') :
+        assert np.array_equal(Net.adjacency(str(tmp_path/f),3).toarray(),A.toarray())
+
+def test_directed():
+    op = Net.networkOperators([[0,1,3.],[1,2,1.]],3,directed=True)
+    assert np.array_equal(op['adjacency'].toarray(),[[0,3,0],[0,0,1],[0,0,0]])
+    assert np.allclose(op['average'].toarray(),[[0,1,0],[0,0,1],[0,0,1]])   # 2 is influenced by nobody
+
+def test_isolated_nodes():
+    op = Net.networkOperators([[0,1],[1,1]],4)                               # self-loop dropped
+    assert np.allclose(op['average'].toarray(),[[0,1,0,0],[1,0,0,0],[0,0,1,0],[0,0,0,1]])
+    assert np.array_equal(op['laplacian'].toarray()[2:],np.zeros((2,4)))
+
+def test_cache_round_trip(tmp_path,monkeypatch):
+    graph = [[0,1,1.],[1,2,0.5],[2,3,2.],[3,0,1.]]
+    cache = str(tmp_path/'cache')
+    op    = Net.networkOperators(graph,4,cache)
+    files = sorted(os.listdir(cache))
+    assert len(files)==3
+    again = Net.networkOperators(graph,4,cache)
+    assert sorted(os.listdir(cache))==files
+    for n in ('adjacency','average','laplacian') :
+        assert (op[n]!=again[n]).nnz==0 and again[n].format=='csr'
+    monkeypatch.chdir(tmp_path)                                             # no cache by default
+    M.prepareOperators(dict(Par.parnum(),Nx=4,Network=graph))
+    assert sorted(os.listdir(tmp_path))==['cache']
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+import Miscfunc as M
+import Observers as Obs
+from conftest import build
+
+NAMES = ['lambda','omega','d','kappa']
+
+
+def run(mode):
+    SYS,p,pN,y,op = build('GK_Reduced',8,Tmax=100,StorageMode=mode)
+    obs      = [Obs.RunningMoments(NAMES),Obs.Envelope(NAMES),Obs.CrossSection(NAMES),Obs.PeakDetector()]
+    info     = {}
+    Y_s,t_s  = M.TemporalLoop(y,SYS,op,pN,p,info,observers=obs)
+    return SYS.expandY_simple(Y_s,t_s,op,p),pN,op,info['observers']
+
+@pytest.fixture(scope='module')
+def full():
+    return run('full')
+
+
+def test_accumulators(full):
+    r,pN,op,obs = full
+    assert obs['moments']['Nsamples']==pN['Ns']
+    for v in NAMES :
+        x = np.asarray(r[v])
+        assert np.allclose(obs['moments'][v]['mean'],x.mean(axis=0),rtol=1e-12,atol=0)
+        assert np.allclose(obs['moments'][v]['std'],x.std(axis=0),rtol=1e-9,atol=1e-15)
+        assert np.array_equal(obs['envelope'][v]['min'],x.min(axis=0))
+        assert np.array_equal(obs['envelope'][v]['max'],x.max(axis=0))
+        assert np.allclose(obs['crosssection'][v]['mean'],x.mean(axis=1),rtol=1e-12,atol=0)
+        assert np.allclose(obs['crosssection'][v]['std'],x.std(axis=1),rtol=1e-9,atol=1e-15)
+    assert np.array_equal(obs['crosssection']['t'],r['t'])
+
+def test_peaks_as_getperiods(full):
+    r,pN,op,obs = full
+    lam,t = np.asarray(r['lambda']),r['t']
+    ID    = M.getperiods(r,pN,op)['PeriodID']
+    pk    = obs['peaks']
+    assert pk['Npeaks'].tolist()==[len(i) for i in ID] and min(map(len,ID))>2
+    for j,i in enumerate(ID) :
+        assert pk['lastpeak'][j]==t[i[-1]] and pk['peak_last'][j]==lam[i[-1],j]
+        assert np.isclose(pk['period_last'][j],t[i[-1]]-t[i[-2]],rtol=1e-12)
+        assert np.isclose(pk['period_mean'][j],np.mean(np.diff(t[i])),rtol=1e-12)
+        assert pk['amplitude'][j]==lam[i[-1],j]-lam[i[-2]:i[-1]+1,j].min()
+
+def test_last_mode_gives_the_same_results(full):
+    r,pN,op,obs = full
+    rl,_,_,obsl = run('last')
+    assert np.asarray(rl['lambda']).shape[0]==1
+    assert np.array_equal(np.asarray(rl['lambda'])[-1],np.asarray(r['lambda'])[-1])
+    for name,res in obs.items() :
+        for k,v in res.items() :
+            if isinstance(v,dict) :
+                for kk in v : assert np.array_equal(obsl[name][k][kk],v[kk])
+            else : assert np.array_equal(obsl[name][k],v)
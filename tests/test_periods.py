@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+import Miscfunc as M
+
+
+def peaks(*series):
+    '''Peak indices found by getperiods on float64 series of the same length, one per column'''
+    lam = np.array(series,dtype=float).T
+    r   = {'t' : np.arange(len(lam))*0.1, 'lambda' : lam, 'omega' : lam, 'd' : lam}
+    return [i.tolist() for i in M.getperiods(r,{'Nx' : lam.shape[1]},None)['PeriodID']]
+
+
+@pytest.mark.parametrize('x,ID',[([0,1,0,2,0,1,0],[1,3,5]),             # strict maxima : unchanged
+                                 ([0,1,1,1,0,2,2],[1]),                 # flat top, flat end
+                                 ([0,1,1,2,1,1,0],[3]),                 # flat shoulder before the top
+                                 ([1,1,0,1,1,0,0],[3]),                 # flat start, flat bottom
+                                 ([0,2,2,1,1,2,0],[1,5])])
+def test_flat_tops(x,ID):
+    assert peaks(x)==[ID]
+
+def test_columns_are_independent():
+    x = [[0,1,1,0,1,0],[0,1,0,0,1,0],[3,3,3,3,3,3]]
+    assert peaks(*x)==[[1,4],[1,4],[]]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import pytest
+import ModelSpec as MS
+import Miscfunc as M
+import plots as plts
+from conftest import build
+
+
+def results(spec,Nx=4,Tmax=100):
+    SYS,p,pN,y,op = build(MS.compileModel(spec),Nx,Tmax)
+    Y_s,t_s  = M.TemporalLoop(y,SYS,op,pN,p,{})
+    return M.getperiods(SYS.expandY_simple(Y_s,t_s,op,p),pN,op),pN
+
+
+@pytest.mark.parametrize('growth',[True,False])
+def test_period_plots(growth):
+    spec = dict(MS.GK_REDUCED,intermediaries=dict(MS.GK_REDUCED['intermediaries']))
+    if not growth : del spec['intermediaries']['g']
+    r,pN = results(spec)
+    assert ('growth' in r['cycles'])==growth and len(r['cycles']['period'])
+    plts.PeriodPlots(r,pN,None,title='')
+    plt.close('all')
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import ClassesGoodwin as CG
+import Parameters as Par
+import Miscfunc as M
+import Observers as Obs
+import Precision as Prec
+from conftest import build
+
+
+def periods(lam,t):
+    '''getperiods on a plain dictionnary holding lambda (omega and d are not used for the peaks)'''
+    r = {'t' : t, 'lambda' : lam, 'omega' : lam, 'd' : lam}
+    return M.getperiods(r,{'Nx' : lam.shape[1]},None)['PeriodID']
+
+def detect(lam,t):
+    det = Obs.PeakDetector()
+    for k in range(len(t)) : det.update(t[k],{'lambda' : lam[k]})
+    return det.result()
+
+
+def test_flat_top_counts_once():
+    x   = np.array([0,1,2,2,2,1,0,1,3,3,2,2,3,4,4,4,4],dtype=float)    # ends on a flat part
+    lam = np.stack([x,-x,np.sin(np.arange(len(x)))],axis=1)
+    t   = np.arange(len(x))*0.5
+    ID  = periods(lam,t)
+    assert ID[0].tolist()==[2,8]
+    res = detect(lam,t)
+    assert res['Npeaks'].tolist()==[len(i) for i in ID]
+    for j,i in enumerate(ID) :
+        if len(i) : assert res['lastpeak'][j]==t[i[-1]] and res['peak_last'][j]==lam[i[-1],j]
+        if len(i)>1 : assert np.isclose(res['period_mean'][j],np.mean(np.diff(t[i])))
+    assert res['amplitude'][0]==3-0
+
+def test_float32_run():
+    SYS,p,pN,y,op = build('GK_Reduced',10,Tmax=50,Tstore=0.01,dtype=np.float32)
+    info    = {}
+    Y_s,t_s = M.TemporalLoop(y,SYS,op,pN,p,info,observers=[Obs.PeakDetector()])
+    assert Y_s.dtype==np.float32 and t_s.dtype==np.float64
+    ID      = periods(Y_s[1],t_s)
+    assert info['observers']['peaks']['Npeaks'].tolist()==[len(i) for i in ID]
+    assert min(len(i) for i in ID) > 1
+
+def test_float32_against_float64():
+    rep = Prec.Compare(CG.GK_Reduced(),Par.BasicParameters(),Par.parnum())
+    assert rep['safe'].sum() >= 20
+    assert np.nanmax(rep['error'][:,rep['safe']]) < 1e-3
+    assert rep['memory'][1]*2==rep['memory'][0]
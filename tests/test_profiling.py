@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+import ClassesGoodwin as CG
+import Miscfunc as M
+import Profiling as Prof
+from conftest import build
+
+
+def run(SYS,rhs='dict',Nt=100):
+    SYS,p,pN,y,op = build(SYS,5,Tmax=Nt*0.01,Tstore=0.01,params={'k2' : 20},RHS=rhs)
+    return M.TemporalLoop(y,SYS,op,pN,p,{})
+
+
+def test_intermediaries_called_by_f_are_timed():
+    SYS   = CG.GK_Reduced()
+    funcs = SYS.intermediaryfuncs
+    prof  = Prof.Profiler(True,intermediaries=True)
+    with prof :
+        ref = run(SYS)[0]
+    stats = prof.report()['intermediaries']
+    for name in ('pi','i','philips','kappa') : assert stats[name]['calls']==4*100
+    assert SYS.intermediaryfuncs is funcs and not set(vars(SYS)) & {'pi','i','philips','kappa'}
+    assert np.array_equal(run(SYS)[0],ref)
+
+def test_profiler_stops_on_error():
+    prof = Prof.Profiler(True,intermediaries=True)
+    SYS  = CG.GK_Reduced()
+    with pytest.raises(ZeroDivisionError):
+        with prof :
+            prof.instrument(SYS)
+            with prof.phase('integration') : 1/0
+    assert Prof.ACTIVE is None and 'pi' not in vars(SYS)
+    assert prof.report()['phases']['integration']['calls']==1
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+import Miscfunc as M
+import Results as Res
+from conftest import build
+
+
+@pytest.fixture
+def run():
+    SYS,p,pN,y,op = build('GK_Reduced',5,Tmax=5)
+    Y_s,t_s  = M.TemporalLoop(y,SYS,op,pN,p,{})
+    return SYS,Y_s,t_s,p
+
+
+def test_budget_evicts_least_recently_used(run):
+    SYS,Y_s,t_s,p = run
+    eager = SYS.expandY_simple(Y_s,t_s,None,p).compute()
+    r     = Res.Results(SYS,Y_s,t_s,p,budget=2*Y_s[0].nbytes)         # two intermediaries
+    r['pi'],r['i']
+    r['pi']                                                           # i is now the oldest
+    r['philips']
+    assert list(r.cache)==['pi','philips'] and r.nbytes==2*Y_s[0].nbytes
+    assert np.array_equal(r['i'],eager['i'])                          # calculated again
+    assert list(r.cache)==['philips','i']
+    r['kappa']                                                        # memoizes pi on the way
+    assert list(r.cache)==['pi','kappa'] and r.nbytes<=r.budget
+    for name in SYS.intermediaryfuncs : assert np.array_equal(r[name],eager[name])
+
+def test_window(run):
+    SYS,Y_s,t_s,p = run
+    eager = SYS.expandY_simple(Y_s,t_s,None,p).compute()
+    k     = (t_s>=1-1e-9) & (t_s<=3+1e-9)
+    for cols,ref in (([3,0],[3,0]),(slice(1,4),slice(1,4)),(np.arange(5)>2,[3,4]),(None,slice(None))) :
+        w = SYS.expandY_simple(Y_s,t_s,None,p).window(1,3,cols)
+        assert np.array_equal(w['t'],t_s[k])
+        for name,v in eager.items() :
+            if name!='t' : assert np.array_equal(w[name],v[k][:,ref]),name
+
+def test_delete(run):
+    SYS,Y_s,t_s,p = run
+    r = SYS.expandY_simple(Y_s,t_s,None,p)
+    r['periods'] = 1
+    del r['periods']
+    assert 'periods' not in r
+    kappa = r['kappa']
+    assert 'kappa' in r.cache
+    assert np.array_equal(r.pop('kappa'),kappa)                       # frees the memoized array
+    assert 'kappa' not in r.cache and 'kappa' in r
+    del r['g']                                                        # not memoized : nothing to free
+    assert np.array_equal(r['kappa'],kappa) and r.nbytes==sum(v.nbytes for v in r.cache.values())
+    r['lambda'] = 0                                                   # set by hand over the variable
+    del r['lambda']
+    assert np.array_equal(r['lambda'],Y_s[1])
+    for name in ('lambda','t') :
+        with pytest.raises(ValueError,match='cannot be deleted'):
+            del r[name]
+    with pytest.raises(KeyError):
+        del r['nothing']
+    r['periods'] = 1
+    r.clear()
+    assert 'periods' not in r and not r.cache and r.nbytes==0 and np.array_equal(r['t'],t_s)
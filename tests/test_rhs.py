@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+import Miscfunc as M
+from conftest import build
+
+
+@pytest.mark.parametrize('model',['GK_Reduced','GK_FULL'])
+@pytest.mark.parametrize('Nx',[1,50])
+def test_fused_rhs_is_f(model,Nx):
+    SYS,p,pN,y,op = build(model,Nx)
+    out = np.empty_like(y)
+    rhs = SYS.fusedRHS(p)
+    assert rhs(y,op,p,out=out) is out
+    assert np.array_equal(out,SYS.f(y,op,p))
+    assert np.array_equal(rhs(y,op,p),out)                       # allocates out when not given
+
+@pytest.mark.parametrize('model',['GK_Reduced','GK_FULL'])
+def test_fused_and_dict_trajectories(model):
+    Y = {}
+    for rhs in ('dict','fused') :
+        SYS,p,pN,y,op = build(model,20)
+        pN['RHS'] = rhs
+        Y[rhs],_  = M.TemporalLoop(y,SYS,op,pN,p,{})
+    assert np.array_equal(Y['dict'],Y['fused'])
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import tracemalloc
+import numpy as np
+import pytest
+import ClassesGoodwin as CG
+import ModelSpec as MS
+import Miscfunc as M
+from conftest import build
+
+MODELS = {'GK_Reduced'        : CG.GK_Reduced,
+          'GK_FULL'           : CG.GK_FULL,
+          'GK_Reduced_Coupled': CG.GK_Reduced_Coupled,
+          'GEMMES'            : CG.GEMMES,
+          'spec'              : lambda : MS.compileModel(MS.GK_REDUCED)}
+
+
+def setup(model,Nx,**kw):
+    return build(MODELS[model](),Nx,Tmax=5,**kw)
+
+
+@pytest.mark.parametrize('model',list(MODELS))
+@pytest.mark.parametrize('Nx',[1,50])
+def test_inplace_step_is_bit_identical(model,Nx):
+    SYS,p,pN,y,op = setup(model,Nx)
+    f   = M.getRHS(SYS,pN,p)
+    buf = M.rk4Buffers(SYS,pN,y)
+    for _ in range(20) :
+        dy = M.rk4(f,y,op,p)
+        assert M.rk4(f,y,op,p,buf) is buf[0]
+        assert np.array_equal(buf[0],dy)
+        y  = y+dy
+
+@pytest.mark.parametrize('model',['GK_Reduced','GK_FULL'])
+def test_inplace_step_does_not_allocate(model):
+    SYS,p,pN,y,op = setup(model,10**4)
+    f   = M.getRHS(SYS,pN,p)
+    buf = M.rk4Buffers(SYS,pN,y)
+    M.rk4(f,y,op,p,buf)                                          # buffers of the fused RHS
+    tracemalloc.start()
+    try :
+        M.rk4(f,y,op,p,buf)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally :
+        tracemalloc.stop()
+    assert peak < y.nbytes/10
+
+def test_dict_rhs_has_no_buffers():
+    SYS,p,pN,y,op = setup('GK_Reduced',5,RHS='dict')
+    assert M.rk4Buffers(SYS,pN,y) is None
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+import ClassesGoodwin as CG
+import ModelSpec as MS
+import Parameters as Par
+import Stability as Stab
+
+
+class Hopf():
+    '''Hopf normal form in (x0,x1), x2 decays : orbits of radius sqrt(mu) and period 2 pi'''
+    def intensiveRHS(self,x,p):
+        r2 = x[0]**2+x[1]**2
+        return np.array([p['mu']*x[0]-x[1]-x[0]*r2,x[0]+p['mu']*x[1]-x[1]*r2,-x[2]])
+
+    def jacobian(self,x,p):
+        u,v,w = x
+        mu    = np.broadcast_to(p['mu'],u.shape)
+        J     = np.zeros(u.shape+(3,3))
+        J[:,0,0],J[:,0,1] = mu-3*u**2-v**2,-1-2*u*v
+        J[:,1,0],J[:,1,1] = 1-2*u*v,mu-u**2-3*v**2
+        J[:,2,2] = -1
+        return J
+
+
+def sweep(Nx=8):
+    p = Par.BasicParameters()
+    p['k2'] = np.linspace(10,30,Nx)
+    return p
+
+
+@pytest.mark.parametrize('model',['GK_Reduced','GK_FULL'])
+def test_jacobian_finite_differences(model):
+    SYS = getattr(CG,model)()
+    p   = sweep()
+    x0  = SYS.equilibria(p)['solow']['x']
+    for x in (x0,x0*[[0.97],[0.99],[1.1]]) :                # at and off the equilibrium
+        J  = SYS.jacobian(x,p)
+        Jd = np.zeros_like(J)
+        for k in range(3):
+            h = 1e-6*np.maximum(np.abs(x[k]),1)
+            e = np.zeros_like(x) ; e[k] = h
+            Jd[:,:,k] = ((SYS.intensiveRHS(x+e,p)-SYS.intensiveRHS(x-e,p))/(2*h)).T
+        assert np.abs(J-Jd).max() < 1e-6*max(1,np.abs(J).max())
+
+@pytest.mark.parametrize('model',['GK_Reduced','GK_FULL'])
+def test_solow_equilibrium(model):
+    SYS = getattr(CG,model)()
+    p   = sweep()
+    eq  = Stab.Equilibria(SYS,p)['solow']
+    assert eq['exists'].all()
+    assert np.abs(SYS.intensiveRHS(eq['x'],p)).max() < 1e-12
+    eig = np.linalg.eigvals(SYS.jacobian(eq['x'],p))
+    assert np.allclose(np.sort_complex(eig),np.sort_complex(eq['eigenvalues']))
+    assert (np.diff(eq['eigenvalues'].real,axis=1)<=0).all()
+    assert np.array_equal(eq['stable'],(eq['eigenvalues'].real<-1e-10).all(axis=1))
+
+def test_classify():
+    eig = np.array([[-1,-2,-3],[-1+1j,-1-1j,-2],[1,-1,-2],[1+1j,1-1j,-1],
+                    [1,2,3],[1+1j,1-1j,2],[1j,-1j,-1],[0,-1,-2],[np.nan,-1,-2]])
+    assert Stab.classify(eig).tolist()==[1,2,3,3,4,5,6,6,0]
+    assert Stab.classify(np.array([[1e-12,-1,-2]])).tolist()==[6]         # within tol of 0
+    assert Stab.classify(np.array([[1e-12,-1,-2]]),tol=1e-14).tolist()==[3]
+
+def test_stability_map():
+    eq,sw = Stab.StabilityMap(CG.GK_Reduced(),Par.BasicParameters(),Par.parnum(),{'k2':[10,20,30],'r':[0.02,0.04]})
+    assert sorted(sw)==['k2','r'] and len(sw['k2'])==6
+    p = Par.BasicParameters()
+    p['k2'],p['r'] = sw['k2'],sw['r']
+    ref = Stab.Equilibria(CG.GK_Reduced(),p)
+    for name in ref :
+        assert np.array_equal(eq[name]['type'],ref[name]['type'])
+        assert np.allclose(eq[name]['x'],ref[name]['x'],equal_nan=True)
+    assert eq['solow']['typename'].tolist()==['stable focus']*6
+
+
+@pytest.mark.parametrize('SYS',[CG.GEMMES(),MS.compileModel(MS.GK_REDUCED)])
+def test_no_intensive_dynamics(SYS):
+    p = Par.BasicParameters()
+    for solver in (Stab.FixedPoints,Stab.LimitCycles):
+        with pytest.raises(ValueError,match='intensiveRHS'):
+            solver(SYS,p,x0=[0.8,0.9,1.])
+
+def test_reasons():
+    p   = {'mu' : np.array([0.1,-0.5,0.1,0.5])}
+    x0  = [np.array([0,0.3,0.3,0.3]),np.zeros(4),np.zeros(4)]         # 0 : on the equilibrium
+    lc  = Stab.LimitCycles(Hopf(),p,x0=x0,warm=False)
+    assert lc['reason'].tolist()==['no cycle','damped','converged','converged']
+    ok  = lc['converged']
+    assert np.allclose(lc['period'][ok],2*np.pi) and np.allclose(lc['amplitude'][0,ok],2*np.sqrt(p['mu'][ok]),rtol=1e-3)
+    lc  = Stab.LimitCycles(Hopf(),p,x0=x0,T0=2*np.pi,warm=False)    # shooting where there is no cycle
+    assert lc['reason'][0]=='collapsed' and lc['reason'][1]!='converged' and lc['converged'][2:].all()
+    assert set(lc['reason']) <= set(Stab.REASONS)
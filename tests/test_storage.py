@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+import ClassesGoodwin as CG
+import Parameters as Par
+import Miscfunc as M
+import Results as Res
+import Storage as S
+from conftest import build
+
+
+def run(Nx=5,Tmax=10,info=None,**kw):
+    SYS,p,pN,y,op = build('GK_Reduced',Nx,Tmax,**kw)
+    return M.TemporalLoop(y,SYS,op,pN,p,info)
+
+
+def test_tstore_decimates_the_trajectory():
+    Y_all,t_all = run(Tstore=0.01)
+    Y_s,t_s     = run(Tstore=0.1)
+    assert Y_s.shape==(3,101,5)
+    assert np.array_equal(Y_s,Y_all[:,::10])
+    assert np.allclose(t_s,np.arange(101)*0.1)
+
+def test_tstore_must_be_a_multiple_of_dt():
+    with pytest.raises(ValueError):
+        run(Tstore=0.015)
+
+def test_last_and_stats_modes():
+    Y_s,t_s = run()
+    Y_l,t_l = run(StorageMode='last')
+    assert np.array_equal(Y_l[:,0],Y_s[:,-1]) and t_l[0]==t_s[-1]
+    info    = {}
+    run(StorageMode='stats',info=info)
+    stats   = info['stats']
+    assert stats['Nsamples']==101
+    for i,name in enumerate(CG.GK_Reduced().variables) :
+        assert np.allclose(stats[name]['mean'],Y_s[i].mean(axis=0),rtol=1e-12)
+        assert np.allclose(stats[name]['std'] ,Y_s[i].std (axis=0),rtol=1e-9)
+        assert np.array_equal(stats[name]['min'],Y_s[i].min(axis=0))
+        assert np.array_equal(stats[name]['max'],Y_s[i].max(axis=0))
+
+
+@pytest.mark.parametrize('output',['memmap','hdf5'])
+def test_streamed_trajectory_round_trip(tmp_path,output):
+    if output=='hdf5' : pytest.importorskip('h5py')
+    path    = str(tmp_path/('traj' if output=='memmap' else 'traj.h5'))
+    Y_s,t_s = run()
+    Y_f,t_f = run(Output=output,OutputPath=path,Chunk=16)        # 101 states : the last chunk is partial
+    assert np.array_equal(np.asarray(Y_f),Y_s) and np.array_equal(t_f,t_s)
+    Y_l,t_l = S.loadTrajectory(path)
+    assert np.array_equal(np.asarray(Y_l),Y_s) and np.array_equal(t_l,t_s)
+
+@pytest.mark.parametrize('output',['memmap','hdf5'])
+def test_streamed_results_are_lazy(tmp_path,output):
+    if output=='hdf5' : pytest.importorskip('h5py')
+    path    = str(tmp_path/('traj' if output=='memmap' else 'traj.h5'))
+    SYS     = CG.GK_Reduced()
+    p       = dict(Par.BasicParameters(),k2=np.linspace(15,25,5))
+    Y_s,t_s = run()
+    Y_f,t_f = run(Output=output,OutputPath=path)
+    ref,r   = SYS.expandY_simple(Y_s,t_s,None,p),SYS.expandY_simple(Y_f,t_f,None,p)
+    assert not isinstance(r['lambda'],np.ndarray) or isinstance(r['lambda'],np.memmap)
+    for name in ('lambda','pi','kappa','g') :
+        assert np.array_equal(np.asarray(r[name]),ref[name])
+
+def test_variable_view():
+    Y = np.random.default_rng(0).random((3,600,4))
+    v = Res.VariableView(Y,1,chunk=256)
+    assert v.shape==(600,4) and len(v)==600
+    assert np.array_equal(v[:,1:3],Y[1,:,1:3]) and np.array_equal(v[-1],Y[1,-1])
+    assert np.array_equal(np.asarray(v),Y[1]) and np.array_equal(v.T,Y[1].T)
+    assert np.array_equal(1-v*2,1-Y[1]*2) and np.array_equal(np.exp(v),np.exp(Y[1]))
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+import Parameters as Par
+
+
+def sweep(grid,method='cartesian',**kw):
+    return Par.Sweep(Par.BasicParameters(),Par.parnum(),grid,method,**kw)
+
+
+def test_cartesian_shape_and_order():
+    p,pN,sw = sweep({'k2':[10,20,30],'r':[0.01,0.02]})
+    assert pN['Nx']==6 and list(sw)==['k2','r']
+    assert sw['k2'].tolist()==[10,10,20,20,30,30]                  # first parameter varies slowest
+    assert sw['r'].tolist()==[0.01,0.02]*3
+    assert p['k2'] is sw['k2'] and p['nu']==Par.BasicParameters()['nu']
+
+def test_inputs_untouched():
+    p0,pN0 = Par.BasicParameters(),Par.parnum()
+    Par.Sweep(p0,pN0,{'k2':[10,20]})
+    assert p0==Par.BasicParameters() and pN0['Nx']==Par.parnum()['Nx']
+
+def test_lhs_stratified():
+    N = 50
+    p,pN,sw = sweep({'k2':(10,30),'r':(0.01,0.05)},'lhs',N=N,seed=1)
+    assert pN['Nx']==N
+    for n,(lo,hi) in (('k2',(10,30)),('r',(0.01,0.05))) :
+        bins = np.floor((sw[n]-lo)/(hi-lo)*N).astype(int)
+        assert sorted(bins)==list(range(N))                        # one point per 1/N bin
+    assert np.array_equal(sweep({'k2':(10,30)},'lhs',N=N,seed=1)[2]['k2'],
+                          sweep({'k2':(10,30)},'lhs',N=N,seed=1)[2]['k2'])
+
+@pytest.mark.parametrize('N',[None,0])
+def test_lhs_needs_N(N):
+    with pytest.raises(ValueError,match='N'):
+        sweep({'k2':(10,30)},'lhs',N=N)
+
+def test_unknown_method():
+    with pytest.raises(ValueError,match='Unknown'):
+        sweep({'k2':[10]},'grid')
+
+def test_derived_per_column():
+    p,pN,sw = sweep({'phinul':[0.02,0.04,0.06],'nu':[2.5,3]})
+    for j in range(pN['Nx']) :
+        pj = Par.DerivedParameters(dict(Par.BasicParameters(),phinul=sw['phinul'][j],nu=sw['nu'][j]))
+        for n in ('omega0','phi0','phi1','lambdamin') :
+            assert np.shape(p[n])==(6,) and np.isclose(p[n][j],pj[n],rtol=1e-14,atol=0)
+    assert len(set(p['phi0']))==3 and len(set(p['omega0']))==2
+
+def test_swept_derived_are_kept():
+    p,pN,sw = sweep({'phi0':[0.03,0.05],'omega0':[0.7,0.8]})
+    assert np.array_equal(p['phi0'],sw['phi0']) and np.array_equal(p['omega0'],sw['omega0'])
+    ref = Par.BasicParameters()
+    assert p['phi1']==ref['phi1']                                 # phinul is not swept
+    assert np.allclose(p['lambdamin'],1-np.sqrt(ref['phi1']/(ref['alpha']+sw['phi0'])))